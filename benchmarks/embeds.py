@@ -0,0 +1,149 @@
+# embeds.py
+"""Allocation benchmark for the lowercased message parts of EmbedData in resources/embeds.py.
+
+Runs every embed_data.lower() lookup found in processing/ against sample game messages, once with the cached
+lower() and once the way the processors did it before (text(part).lower() on every check), and prints the amount
+of strings and bytes allocated and the time per message. Runs offline, no database needed.
+
+Usage (from the main folder): python -m benchmarks.embeds [--rounds 2000]
+"""
+
+import argparse
+import glob
+import os
+import re
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Tuple
+
+import discord
+
+from resources import embeds
+
+
+PROCESSING_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'processing')
+LOOKUP_PATTERN = re.compile(r"embed_data\.lower\('([\w.]+)'\)")
+
+LOOKUPS: Dict[str, Callable[[embeds.EmbedData, str], str]] = {
+    'cached': lambda embed_data, part: embed_data.lower(part),
+    'uncached': lambda embed_data, part: embed_data.text(part).lower(),
+}
+
+
+# Messages
+def _create_embed(author: str, description: str = '', fields: Tuple[Tuple[str, str], ...] = (),
+                  footer: str = '') -> discord.Embed:
+    """Returns an embed with the given parts"""
+    embed = discord.Embed(description=description or None)
+    embed.set_author(name=author)
+    for field_name, field_value in fields:
+        embed.add_field(name=field_name, value=field_value, inline=False)
+    if footer: embed.set_footer(text=footer)
+    return embed
+
+
+def get_sample_messages() -> List[SimpleNamespace]:
+    """Returns messages modeled on the game embeds the processors look at. EmbedData only reads content and embeds,
+    so these don't need to be discord.Message objects.
+    """
+    sample_embeds = [
+        _create_embed(
+            'Miriel — profile',
+            fields=(
+                ('**Stats**', '**Level**: 42 (12.5%)\n**Energy**: 87/120\n**Time travels**: 3'),
+                ('**Farm**', '**Farm level**: 18\n**Worker slots**: 6'),
+                ('**Clan**', '**Name**: Potato Farmers'),
+                ('**Items**', '**IDLUCKS**: 1,254,980\n**Diamonds**: 15'),
+            ),
+        ),
+        _create_embed(
+            'Miriel — daily reward',
+            description='**Miriel** got their daily reward!\n+3 <:energy:1>\n+25,000 <:idlucks:2>',
+            footer='Come back tomorrow for another reward',
+        ),
+        _create_embed(
+            'Miriel — worker roll',
+            fields=(('**Miriel** hired the <a:deluxeworker:3> **deluxe worker**!', 'Worker level: 12'),),
+        ),
+        _create_embed(
+            'Miriel — inventory',
+            fields=(
+                ('**Materials**', '<:wood:4> **Wood**: 12,500\n<:apple:5> **Apple**: 1,250'),
+                ('**Other**', '<:energydrink:6> **Energy drink**: 2'),
+            ),
+            footer='Page 1/2',
+        ),
+        _create_embed(
+            'Miriel — raid',
+            description='Miriel is raiding **Somebody**',
+            fields=(
+                ('**Somebody** farms', '<a:wiseworker:7> 100%\n<a:luckyworker:8> 74%'),
+                ('raidpoints', '**Raidpoints**: 1,200'),
+            ),
+            footer='Farms will be raided in order from top to bottom',
+        ),
+    ]
+    return [SimpleNamespace(content='', embeds=[embed]) for embed in sample_embeds]
+
+
+def get_processor_lookups() -> List[str]:
+    """Returns the message part of every embed_data.lower() lookup in processing/, with duplicates"""
+    parts = []
+    for file_name in sorted(glob.glob(os.path.join(PROCESSING_FOLDER, '*.py'))):
+        with open(file_name, encoding='utf-8') as source_file:
+            parts += LOOKUP_PATTERN.findall(source_file.read())
+    return parts
+
+
+# Benchmark
+def _measure_allocations(lookup: Callable[[embeds.EmbedData, str], str], messages: List[SimpleNamespace],
+                         parts: List[str]) -> Tuple[int, int]:
+    """Runs all lookups on every message and returns (strings allocated, bytes allocated).
+    All results are kept alive until the end, so every allocation shows up in the traced memory.
+    """
+    all_embed_data = [embeds.EmbedData(message) for message in messages]
+    for embed_data in all_embed_data: embed_data.key # Read all embed values before tracing
+    results = []
+    tracemalloc.start()
+    try:
+        for embed_data in all_embed_data:
+            for part in parts:
+                results.append(lookup(embed_data, part))
+        allocated_bytes, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (len({id(text) for text in results if text}), allocated_bytes)
+
+
+def _time_lookups(lookup: Callable[[embeds.EmbedData, str], str], messages: List[SimpleNamespace],
+                  parts: List[str], rounds: int) -> float:
+    """Returns the average time in seconds it takes to create the EmbedData of a message and run all lookups"""
+    start_time = time.perf_counter()
+    for _ in range(rounds):
+        for message in messages:
+            embed_data = embeds.EmbedData(message)
+            for part in parts:
+                lookup(embed_data, part)
+    return (time.perf_counter() - start_time) / (rounds * len(messages))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmarks the lowercased message parts of EmbedData.')
+    parser.add_argument('--rounds', type=int, default=2_000, help='Rounds over all sample messages for the timing')
+    args = parser.parse_args()
+    messages = get_sample_messages()
+    parts = get_processor_lookups()
+    print(f'{len(parts)} lookups on {len(set(parts))} message parts, {len(messages)} messages')
+    for label, lookup in LOOKUPS.items():
+        string_count, allocated_bytes = _measure_allocations(lookup, messages, parts)
+        average_time = _time_lookups(lookup, messages, parts, args.rounds)
+        print(
+            f'{label:<9} {string_count / len(messages):>8.1f} strings/message   '
+            f'{allocated_bytes / len(messages):>10,.0f} bytes/message   '
+            f'{average_time * 1_000_000:>8.1f}µs/message'
+        )
+
+
+if __name__ == '__main__':
+    main()
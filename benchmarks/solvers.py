@@ -0,0 +1,219 @@
+# solvers.py
+"""Benchmark and correctness check for the raid and teamraid solvers in resources/solvers.py.
+
+Generates reproducible random raids and teamraids from all raid worker types and levels, times the solvers and
+compares every result with a reference solver (the brute force raid solver and the original teamraid
+recommendation). Runs offline, no Discord objects or database needed.
+
+Usage (from the main folder): python -m benchmarks.solvers [--scenarios 2000] [--seed 1]
+Exits with code 1 if a solver returns a different result than the reference.
+"""
+
+import argparse
+import copy
+from itertools import combinations, permutations
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from resources import power, solvers, strings
+
+
+MAX_LEVEL = 60
+MAX_RAID_WORKERS = 6 # The raid helper only uses the 6 strongest workers
+MAX_ENEMY_FARMS = 6
+MAX_TEAMRAID_USERS = 4
+MAX_TEAMRAID_WORKERS = 4
+
+
+# Scenarios
+def generate_raid(rng: random.Random) -> Tuple[Dict[str, float], Dict[str, Tuple[float, int]]]:
+    """Returns a random raid as (workers_power, enemies_power), built the same way as in the raid helper"""
+    roster_types = rng.sample(strings.WORKER_TYPES_RAID, rng.randint(1, len(strings.WORKER_TYPES_RAID)))
+    workers_power = power.score_roster({worker_type: rng.randint(1, MAX_LEVEL) for worker_type in roster_types})
+    workers_power = dict(sorted(workers_power.items(), key=lambda x:x[1])[-MAX_RAID_WORKERS:])
+    enemies_power = {}
+    for enemy_type in rng.sample(strings.WORKER_TYPES_RAID, rng.randint(1, MAX_ENEMY_FARMS)):
+        enemy_hp = rng.choice((100, 100, 100, rng.randint(1, 100)))
+        enemy_power = power.get_power(enemy_type, rng.randint(1, MAX_LEVEL)) / 100 * enemy_hp
+        enemies_power[enemy_type] = (enemy_power, enemy_hp)
+    return (workers_power, enemies_power)
+
+
+def generate_teamraid(rng: random.Random) -> Tuple[Tuple[float, int], Dict[str, Dict[str, float]]]:
+    """Returns a random teamraid state as (next_enemy_power_hp, workers_still_alive)"""
+    next_enemy_type = rng.choice(strings.WORKER_TYPES_RAID)
+    next_enemy_power_hp = (power.get_power(next_enemy_type, rng.randint(1, MAX_LEVEL)), rng.randint(1, 100))
+    workers_still_alive = {}
+    for user_index in range(rng.randint(1, MAX_TEAMRAID_USERS)):
+        worker_types = rng.sample(strings.WORKER_TYPES_RAID, rng.randint(1, MAX_TEAMRAID_WORKERS))
+        workers_still_alive[f'user{user_index}'] = power.score_roster(
+            {worker_type: rng.randint(1, MAX_LEVEL) for worker_type in worker_types}
+        )
+    return (next_enemy_power_hp, workers_still_alive)
+
+
+# Reference solvers
+def solve_raid_brute_force(workers_power: Dict[str, float],
+                           enemies_power: Dict[str, Tuple[float, int]]) -> Tuple[int, int, Dict[str, float]]:
+    """The original raid solver. Tries every order of the workers."""
+    killed_enemies = 0
+    hp_left = 100
+    best_solution = []
+    for possible_solution in reversed(list(permutations(list(workers_power.keys())))):
+        enemies_powers_copy = copy.deepcopy(enemies_power)
+        used_workers = {}
+        for worker_name in possible_solution:
+            killed_enemies = 0
+            for enemy_name, enemy_power_hp in enemies_powers_copy.items():
+                enemy_power, enemy_hp = enemy_power_hp
+                if enemy_hp == 0: continue
+                worker_power = workers_power[worker_name]
+                worker_damage = round(85 * worker_power / enemies_power[enemy_name][0])
+                hp_remaining = enemy_hp - worker_damage
+                used_workers[worker_name] = worker_power
+                if hp_remaining < 0: hp_remaining = 0
+                power_remaining = enemies_power[enemy_name][0] / 100 * hp_remaining
+                enemies_powers_copy[enemy_name] = (power_remaining, hp_remaining)
+                break
+            for enemy_name, enemy_power_hp in enemies_powers_copy.items():
+                enemy_power, enemy_hp = enemy_power_hp
+                if enemy_hp == 0:
+                    killed_enemies += 1
+                    hp_left = 100
+                elif enemy_hp < enemies_power[enemy_name][1]:
+                    hp_left = enemy_hp
+            if killed_enemies >= len(enemies_powers_copy.keys()): break
+        if best_solution:
+            if killed_enemies > best_solution[0]:
+                best_solution = [killed_enemies, hp_left, possible_solution, used_workers]
+            if killed_enemies == best_solution[0]:
+                if hp_left < best_solution[1]:
+                    best_solution = [killed_enemies, hp_left, possible_solution, used_workers]
+                elif len(used_workers.keys()) < len(best_solution[3].keys()):
+                    best_solution = [killed_enemies, hp_left, possible_solution, used_workers]
+        else:
+            best_solution = [killed_enemies, hp_left, possible_solution, used_workers]
+    killed_enemies, hp_left, _, used_workers = best_solution
+    return (killed_enemies, hp_left, used_workers)
+
+
+def recommend_teamraid_worker_reference(next_enemy_power_hp: Tuple[float, int],
+                                        workers_still_alive: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """The original teamraid recommendation. Checks every worker, then every pair, then every triple."""
+    recommended_worker = {}
+    next_enemy_power, next_enemy_hp = next_enemy_power_hp
+    if len(list(workers_still_alive.keys())) == 1:
+        teamraid_user = list(workers_still_alive.keys())[0]
+        if len(list(workers_still_alive[teamraid_user].keys())) == 1:
+            return workers_still_alive
+    all_worker_powers = []
+    for teamraid_user, worker_data in workers_still_alive.items():
+        for worker_type, worker_power in worker_data.items():
+            worker_damage = round(100 * worker_power / next_enemy_power)
+            all_worker_powers.append((worker_power, worker_damage))
+            if next_enemy_hp - worker_damage <= 0:
+                if recommended_worker:
+                    recommended_worker_user = list(recommended_worker.keys())[0]
+                    recommended_worker_type = list(recommended_worker[recommended_worker_user].keys())[0]
+                    if worker_power >= recommended_worker[recommended_worker_user][recommended_worker_type]: continue
+                recommended_worker = {teamraid_user: {worker_type: worker_power}}
+    for combination_size in (2, 3):
+        if recommended_worker: break
+        best_combination = []
+        for combination in combinations(all_worker_powers, combination_size):
+            summed_damage = sum(worker_damage for _, worker_damage in combination)
+            if summed_damage >= next_enemy_hp:
+                if not best_combination or summed_damage < sum(worker_damage for _, worker_damage in best_combination):
+                    best_combination = combination
+        for teamraid_user, worker_data in workers_still_alive.items():
+            for worker_type, worker_power in worker_data.items():
+                for best_worker_power, _ in best_combination:
+                    if best_worker_power == worker_power:
+                        recommended_worker[teamraid_user] = {}
+                        recommended_worker[teamraid_user][worker_type] = worker_power
+    return recommended_worker
+
+
+# Benchmark
+BENCHMARKS = {
+    'raid': (generate_raid, solvers.solve_raid, solve_raid_brute_force),
+    'raid-cached': (generate_raid, solvers.solve_raid_cached, solve_raid_brute_force),
+    'teamraid': (generate_teamraid, solvers.recommend_teamraid_worker, recommend_teamraid_worker_reference),
+}
+
+
+def _get_percentile(values: List[float], percentile: float) -> float:
+    """Returns a percentile of a sorted list"""
+    if not values: return 0
+    return values[min(len(values) - 1, int(len(values) * percentile))]
+
+
+def _normalize_result(result: object) -> object:
+    """Converts dicts to item lists, so results only compare equal if the order of the workers is the same"""
+    if isinstance(result, dict):
+        return [(key, _normalize_result(value)) for key, value in result.items()]
+    if isinstance(result, tuple):
+        return tuple(_normalize_result(value) for value in result)
+    return result
+
+
+def _time_solver(solver: Callable, scenarios: List[tuple]) -> Tuple[List[float], List[object]]:
+    """Returns the sorted run times in seconds and the results of a solver for all scenarios"""
+    timings = []
+    results = []
+    for scenario in scenarios:
+        start_time = time.perf_counter()
+        result = solver(*scenario)
+        timings.append(time.perf_counter() - start_time)
+        results.append(result)
+    return (sorted(timings), results)
+
+
+def run_benchmark(name: str, scenario_count: int, seed: int, check: bool = True) -> int:
+    """Times a solver and its reference on the same scenarios and prints p50, p99 and ops/s.
+
+    Returns
+    -------
+    The amount of scenarios the solver got a different result than the reference for (0 if check is False).
+    """
+    generate, solver, reference = BENCHMARKS[name]
+    rng = random.Random(seed)
+    scenarios = [generate(rng) for _ in range(scenario_count)]
+    mismatches = 0
+    for label, function in (('solver', solver), ('reference', reference)):
+        if label == 'reference' and not check: continue
+        timings, results = _time_solver(function, scenarios)
+        print(
+            f'{name:<11} {label:<10} p50 {_get_percentile(timings, 0.5) * 1_000_000:>10.1f}µs   '
+            f'p99 {_get_percentile(timings, 0.99) * 1_000_000:>10.1f}µs   '
+            f'{len(timings) / sum(timings):>12,.0f} ops/s'
+        )
+        if label == 'solver':
+            solver_results = results
+        else:
+            for scenario, solver_result, reference_result in zip(scenarios, solver_results, results):
+                if _normalize_result(solver_result) == _normalize_result(reference_result): continue
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f'Mismatch in {name}: {scenario}\n  solver:    {solver_result}\n  reference: {reference_result}')
+    if check: print(f'{name:<11} {scenario_count:,} scenarios, {mismatches:,} mismatches')
+    return mismatches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmarks the raid and teamraid solvers.')
+    parser.add_argument('--scenarios', type=int, default=2_000, help='Scenarios per solver')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the scenario generator')
+    parser.add_argument('--solver', choices=tuple(BENCHMARKS.keys()), action='append', help='Only run this solver')
+    parser.add_argument('--no-check', action='store_true', help='Only time the solvers, skip the reference')
+    args = parser.parse_args()
+    mismatches = 0
+    for name in (args.solver or BENCHMARKS.keys()):
+        mismatches += run_benchmark(name, args.scenarios, args.seed, not args.no_check)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,12 +10,9 @@ from discord.ext import commands
 
 from database import errors, guilds
 from database import settings as settings_db
-from resources import functions, settings
+from resources import functions, router, settings
 
 
-startup_time = datetime.isoformat(utils.utcnow().replace(microsecond=0), sep=' ')
-functions.await_coroutine(settings_db.update_setting('startup_time', startup_time))
-
 intents = discord.Intents.none()
 intents.guilds = True   # for on_guild_join() and all guild objects
 intents.messages = True   # for command detection
@@ -33,6 +30,13 @@ else:
     bot = commands.AutoShardedBot(command_prefix=guilds.get_all_prefixes, help_command=None,
                                   case_insensitive=True, intents=intents, allowed_mentions=allowed_mentions,
                                   owner_id=settings.OWNER_ID, activiy=bot_activity)
+router.register_handler(router.ROUTE_COMMAND, bot.process_commands)
+
+
+@bot.event
+async def on_message(message: discord.Message) -> None:
+    """Single entry point for all messages. Replaces the default command processing, see resources.router."""
+    await router.route_message(bot, message)
 
 
 @bot.event
@@ -92,9 +96,11 @@ EXTENSIONS = [
     'cogs.workers',
 ]
 
+# The worker processes of the CPU pool (see resources.cpu) import this file as well, so nothing may start outside of
+# this block.
 if __name__ == '__main__':
+    startup_time = datetime.isoformat(utils.utcnow().replace(microsecond=0), sep=' ')
+    functions.await_coroutine(settings_db.update_setting('startup_time', startup_time))
     for extension in EXTENSIONS:
         bot.load_extension(extension)
-
-
-bot.run(settings.TOKEN)
\ No newline at end of file
+    bot.run(settings.TOKEN)
@@ -1,11 +1,27 @@
 # messages.py
-"""Contains the message cache and access to it. Cache is populated by cogs.cache."""
+"""Contains the message cache and access to it. Cache is populated by cogs.cache.
+
+Every channel has a deque with its last MAX_MESSAGES_PER_CHANNEL messages (newest first). Messages are also indexed
+by channel and author id and by channel and normalized author name, so lookups for a user only look at that user's
+messages. Content and author name are normalized once when a message is stored.
+If find_message doesn't find a message, it waits until a matching message is stored (up to WAIT_TIMEOUT seconds).
+
+Messages are stored as slim CachedMessage records instead of discord.Message objects. Records and the deques holding
+them are kept below MAX_CACHE_BYTES, if the cache grows larger, the oldest messages of the least recently active
+channels are evicted.
+
+Expiry is bucketed by time: every EXPIRY_BUCKET_SECONDS have a bucket with the channels that stored a message in that
+time, so delete_old_messages only looks at channels that actually have expiring messages.
+"""
 
 import asyncio
 from argparse import ArgumentError
-from datetime import timedelta
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
 import re
-from typing import Optional, Union
+import sys
+import time
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Set, Tuple, Union
 
 import discord
 from discord import utils
@@ -13,13 +29,128 @@ from discord import utils
 from resources import functions, logs, settings
 
 
-_MESSAGE_CACHE = {}
+MAX_MESSAGES_PER_CHANNEL = 50
+MAX_CACHE_BYTES = 32 * 1024 * 1024
+WAIT_TIMEOUT = 0.5 # Seconds find_message waits for a matching message if none is cached yet
+LATENCY_SAMPLE_SIZE = 1_000
+
+GAME_MENTION = re.compile(rf'<@!?{settings.GAME_ID}>')
+EXPIRY_BUCKET_SECONDS = 60
+
+
+class CachedMessage(NamedTuple):
+    """Slim, immutable copy of a cached message with everything find_message callers use.
+    author and mentions are the user objects from the discord.py cache, they are shared and not copied.
+    To reply to the message, use channel.get_partial_message(id).
+    """
+    id: int
+    channel_id: int
+    author: Union[discord.User, discord.Member]
+    author_name: str # Encoded and lowercased, see functions.encode_text
+    content: str
+    content_normalized: str # Lowercased, without mentions of the game bot
+    mentions: Tuple[Union[discord.User, discord.Member], ...]
+    created_at: datetime
+    size: int # Bytes used by the record itself (see _get_record_size)
+
+
+def _get_record_size(*values) -> int:
+    """Returns the bytes used by a record and the values it owns. Shared objects (users, small ints) are not counted."""
+    size = sys.getsizeof(tuple(values)) + sys.getsizeof(0)
+    for value in values:
+        if isinstance(value, (str, datetime)) or (isinstance(value, int) and value > 256):
+            size += sys.getsizeof(value)
+        elif isinstance(value, tuple):
+            size += sys.getsizeof(value)
+    return size
+
+
+# Channel id -> cached messages, newest first. Channels are ordered from least to most recently active.
+_MESSAGE_CACHE: 'OrderedDict[int, Deque[CachedMessage]]' = OrderedDict()
+_cache_bytes = 0 # Bytes used by all records and deques
+# Start of time bucket (timestamp in EXPIRY_BUCKET_SECONDS) -> channels that stored a message in that time, oldest first
+_EXPIRY_BUCKETS: Dict[int, Set[int]] = {}
+# (channel id, author id or normalized author name) -> messages of that author in that channel, newest first
+_AUTHOR_INDEX: Dict[Tuple[int, Union[int, str]], Deque[CachedMessage]] = {}
+# Channel id -> lookups that are waiting for a matching message
+_WAITERS: Dict[int, List[Tuple[Callable[[CachedMessage], bool], asyncio.Future]]] = {}
+
+_stats = {
+    'lookups': 0,
+    'hits': 0,
+    'hits_after_wait': 0,
+    'misses': 0,
+    'waits': 0,
+    'evicted': 0,
+    'latencies': deque(maxlen=LATENCY_SAMPLE_SIZE),
+}
+
+
+# --- Internal ---
+def _get_index_keys(channel_id: int, cached_message: CachedMessage) -> Tuple[Tuple[int, int], Tuple[int, str]]:
+    return ((channel_id, cached_message.author.id), (channel_id, cached_message.author_name))
+
+
+def _change_deque(messages: Deque[CachedMessage], operation: Callable, *args: Any) -> Any:
+    """Calls a method of a cache deque and adds the change of its size to the cache size.
+    Deques allocate and free memory in blocks, so the size is measured instead of calculated.
+    """
+    global _cache_bytes
+    size_before = sys.getsizeof(messages)
+    result = operation(*args)
+    _cache_bytes += sys.getsizeof(messages) - size_before
+    return result
+
+
+def _remove_oldest(channel_id: int, channel_messages: Deque[CachedMessage]) -> None:
+    """Removes the oldest message of a channel from the cache and the index. Removes the channel if it is empty."""
+    global _cache_bytes
+    cached_message = _change_deque(channel_messages, channel_messages.pop)
+    _cache_bytes -= cached_message.size
+    _unindex(channel_id, cached_message)
+    if not channel_messages:
+        del _MESSAGE_CACHE[channel_id]
+        _cache_bytes -= sys.getsizeof(channel_messages)
+
 
+def _unindex(channel_id: int, cached_message: CachedMessage) -> None:
+    """Removes a message from the author index"""
+    global _cache_bytes
+    for index_key in _get_index_keys(channel_id, cached_message):
+        author_messages = _AUTHOR_INDEX.get(index_key, None)
+        if author_messages is None: continue
+        if author_messages[-1] is cached_message: # Messages are usually removed oldest first
+            _change_deque(author_messages, author_messages.pop)
+        else:
+            try:
+                _change_deque(author_messages, author_messages.remove, cached_message)
+            except ValueError:
+                pass
+        if not author_messages:
+            del _AUTHOR_INDEX[index_key]
+            _cache_bytes -= sys.getsizeof(author_messages)
 
+
+def _find(channel_id: int, matches: Callable[[CachedMessage], bool], user: Optional[discord.User],
+          author_name: Optional[str]) -> Optional[CachedMessage]:
+    """Returns the newest cached message that matches. Only looks at the messages of the user if one is given."""
+    if user is not None:
+        candidates = _AUTHOR_INDEX.get((channel_id, user.id), ())
+    elif author_name is not None:
+        candidates = _AUTHOR_INDEX.get((channel_id, author_name), ())
+    else:
+        candidates = _MESSAGE_CACHE.get(channel_id, ())
+    for cached_message in candidates:
+        if matches(cached_message): return cached_message
+    return None
+
+
+# --- Access ---
 async def find_message(channel_id: int, regex: Union[str, re.Pattern] = None,
-                      user: Optional[discord.User] = None, user_name: Optional[str] = None) -> discord.Message:
+                      user: Optional[discord.User] = None, user_name: Optional[str] = None) -> Optional[CachedMessage]:
     """Looks through the last 50 messages in the channel history. If a message that matches regex is found, it returns
     the message. If user and/or user_name are defined, only messages from that user are returned.
+    If no message is found, waits up to WAIT_TIMEOUT seconds for a matching message to be stored.
 
     Arguments
     ---------
@@ -27,83 +158,153 @@ async def find_message(channel_id: int, regex: Union[str, re.Pattern] = None,
     regex: String with the regex the content has to match. If no regex is defined, the first message with the given user
     or user name is returned.
     user: User object the message author has to match.
-    user_name: User name the message author has to match. If user is also defined, this is ignored.
+    user_name: User name the message author has to match.
     If both user and user_name are None, this function returns the first message that matches the regex is not from a bot.
 
     Returns
     -------
-    The found message. Returns None if no matching message was found.
+    The found message as CachedMessage. Returns None if no matching message was found.
 
     Raises
     ------
     ArgumentError if regex, user AND user_name are None.
     """
-    attempts = 1
-    while attempts <= 2:
-        if regex is None and user is None and user_name is None:
-            raise ArgumentError('At least one of these arguments has to be defined: regex, user, user_name.')
-        channel_messages = _MESSAGE_CACHE.get(channel_id, None)
-        if channel_messages is None: return None
-        for message in channel_messages:
-            if user is not None and message.author != user: continue
-            if (user_name is not None
-                and await functions.encode_text(user_name.lower()) != await functions.encode_text(message.author.name.lower())):
-                """
-                try:
-                    logs.logger.info(
-                        f'User name not found in cache.\n'
-                        f'Looked for user name {user_name}\n'
-                        f'Compared it to user with:\n'
-                        f'- Name: {message.author.name}\n'
-                        f'- Display name: {message.author.display_name}\n'
-                        f'- Global name: {message.author.global_name}\n'
-                        f'- Discriminator: {message.author.discriminator}\n'
-                        f'Message content: {message.content}\n'
-                    )
-                except:
-                    pass
-                """
-                continue
-            if regex is None:
-                return message
-            else:
-                message_content = re.sub(rf'<@!?{settings.GAME_ID}>', '', message.content.lower())
-                match = re.search(regex, message_content)
-                if match: return message
-        await asyncio.sleep(0.5)
-        logs.logger.info('Required a second attempt for getting a message from the message cache.')
-        attempts += 1
-    return None
+    if regex is None and user is None and user_name is None:
+        raise ArgumentError('At least one of these arguments has to be defined: regex, user, user_name.')
+    start_time = time.monotonic()
+    _stats['lookups'] += 1
+    author_name = await functions.encode_text(user_name.lower()) if user_name is not None else None
 
+    def matches(cached_message: CachedMessage) -> bool:
+        if user is not None and cached_message.author != user: return False
+        if author_name is not None and cached_message.author_name != author_name: return False
+        return regex is None or re.search(regex, cached_message.content_normalized) is not None
 
-async def store_message(message: discord.Message) -> discord.Message:
+    if channel_id not in _MESSAGE_CACHE:
+        _stats['misses'] += 1
+        return None
+    message = _find(channel_id, matches, user, author_name)
+    if message is not None:
+        _stats['hits'] += 1
+        _stats['latencies'].append(time.monotonic() - start_time)
+        return message
+    _stats['waits'] += 1
+    waiter = (matches, asyncio.get_running_loop().create_future())
+    channel_waiters = _WAITERS.setdefault(channel_id, [])
+    channel_waiters.append(waiter)
+    try:
+        message = await asyncio.wait_for(waiter[1], timeout=WAIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        message = None
+    finally:
+        channel_waiters.remove(waiter)
+        if not channel_waiters and _WAITERS.get(channel_id) is channel_waiters: del _WAITERS[channel_id]
+    if message is None:
+        _stats['misses'] += 1
+        logs.logger.info('Message not found in the message cache after waiting for it.')
+    else:
+        _stats['hits_after_wait'] += 1
+    _stats['latencies'].append(time.monotonic() - start_time)
+    return message
+
+
+async def store_message(message: discord.Message) -> None:
     """Adds a message to the message cache.
-    Also keeps the maximum amount of messages stored per channel at 50."""
-    channel_message_list = _MESSAGE_CACHE.get(message.channel.id, None)
-    if channel_message_list is None:
-        channel_message_list = [message,]
+    Also keeps the maximum amount of messages stored per channel at MAX_MESSAGES_PER_CHANNEL and the size of the
+    cache below MAX_CACHE_BYTES."""
+    global _cache_bytes
+    channel_id = message.channel.id
+    values = (
+        message.id,
+        channel_id,
+        message.author,
+        await functions.encode_text(message.author.name.lower()),
+        message.content,
+        GAME_MENTION.sub('', message.content.lower()),
+        tuple(message.mentions),
+        message.created_at,
+    )
+    cached_message = CachedMessage(*values, _get_record_size(*values))
+    channel_messages = _MESSAGE_CACHE.get(channel_id, None)
+    if channel_messages is None:
+        channel_messages = _MESSAGE_CACHE[channel_id] = deque()
+        _cache_bytes += sys.getsizeof(channel_messages)
     else:
-        channel_message_list.insert(0, message)
-    if len(channel_message_list) > 50:
-        channel_message_list = channel_message_list[:50]
-    _MESSAGE_CACHE[message.channel.id] = channel_message_list
+        _MESSAGE_CACHE.move_to_end(channel_id)
+    if len(channel_messages) >= MAX_MESSAGES_PER_CHANNEL:
+        _remove_oldest(channel_id, channel_messages)
+    _change_deque(channel_messages, channel_messages.appendleft, cached_message)
+    _cache_bytes += cached_message.size
+    _EXPIRY_BUCKETS.setdefault(int(cached_message.created_at.timestamp()) // EXPIRY_BUCKET_SECONDS,
+                               set()).add(channel_id)
+    for index_key in _get_index_keys(channel_id, cached_message):
+        author_messages = _AUTHOR_INDEX.get(index_key, None)
+        if author_messages is None:
+            author_messages = _AUTHOR_INDEX[index_key] = deque()
+            _cache_bytes += sys.getsizeof(author_messages)
+        _change_deque(author_messages, author_messages.appendleft, cached_message)
+    while _cache_bytes > MAX_CACHE_BYTES and _MESSAGE_CACHE:
+        least_active_channel_id, least_active_messages = next(iter(_MESSAGE_CACHE.items()))
+        _remove_oldest(least_active_channel_id, least_active_messages)
+        _stats['evicted'] += 1
+    for matches, future in _WAITERS.get(channel_id, ()):
+        if not future.done() and matches(cached_message): future.set_result(cached_message)
 
 
 async def delete_old_messages(timespan: timedelta) -> int:
-    """Deletes messages older than the specified timeframe.
+    """Deletes messages older than the specified timeframe. Only looks at channels in expired time buckets, and only
+    at their expiring messages. Channels without messages are removed.
+    Doesn't await anything while changing the cache, so it is safe to run concurrently with store_message.
 
     Returns
     -------
     Amount of messages deleted: int
     """
-    current_time = utils.utcnow()
+    oldest_allowed = utils.utcnow() - timespan
+    oldest_bucket_allowed = int(oldest_allowed.timestamp()) // EXPIRY_BUCKET_SECONDS
     message_count = 0
-    for channel_id, channel_messages in _MESSAGE_CACHE.items():
-        for message in channel_messages:
-            if message.created_at < (current_time - timespan):
-                _MESSAGE_CACHE[channel_id].remove(message)
+    for bucket in [bucket for bucket in _EXPIRY_BUCKETS if bucket < oldest_bucket_allowed]:
+        for channel_id in _EXPIRY_BUCKETS.pop(bucket):
+            channel_messages = _MESSAGE_CACHE.get(channel_id, None)
+            while channel_messages and channel_messages[-1].created_at < oldest_allowed:
+                _remove_oldest(channel_id, channel_messages)
                 message_count += 1
-    if message_count > 0:
-        for key in list(_MESSAGE_CACHE.keys()):
-            if not _MESSAGE_CACHE[key]: del _MESSAGE_CACHE[key]
-    return message_count
\ No newline at end of file
+    return message_count
+
+
+def get_cache_size() -> Dict[str, int]:
+    """Returns the amount of cached channels and messages and the bytes used by the cache. Unlike sys.getsizeof on the
+    cache, this includes everything the cache owns: records, deques, dicts, index keys, expiry buckets and waiters.
+    """
+    dict_bytes = sys.getsizeof(_MESSAGE_CACHE) + sys.getsizeof(_AUTHOR_INDEX)
+    for index_key in _AUTHOR_INDEX:
+        dict_bytes += sys.getsizeof(index_key)
+        if isinstance(index_key[1], str): dict_bytes += sys.getsizeof(index_key[1])
+    dict_bytes += sys.getsizeof(_EXPIRY_BUCKETS)
+    for bucket_channel_ids in _EXPIRY_BUCKETS.values():
+        dict_bytes += sys.getsizeof(bucket_channel_ids)
+    dict_bytes += sys.getsizeof(_WAITERS)
+    for channel_waiters in _WAITERS.values():
+        dict_bytes += sys.getsizeof(channel_waiters) + sum(sys.getsizeof(waiter) for waiter in channel_waiters)
+    return {
+        'channels': len(_MESSAGE_CACHE),
+        'messages': sum(len(channel_messages) for channel_messages in _MESSAGE_CACHE.values()),
+        'budget_bytes': _cache_bytes,
+        'dict_bytes': dict_bytes,
+        'max_bytes': MAX_CACHE_BYTES,
+    }
+
+
+def get_stats() -> Dict[str, float]:
+    """Returns the lookup counters and lookup latencies (in seconds)"""
+    latencies = sorted(_stats['latencies'])
+    return {
+        'lookups': _stats['lookups'],
+        'hits': _stats['hits'],
+        'hits_after_wait': _stats['hits_after_wait'],
+        'misses': _stats['misses'],
+        'waits': _stats['waits'],
+        'evicted': _stats['evicted'],
+        'latency_p50': latencies[len(latencies) // 2] if latencies else 0,
+        'latency_p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0,
+    }
@@ -5,30 +5,18 @@ import discord
 from discord.ext import commands
 
 from cache import messages
-from resources import settings
+from resources import router
 
 
 class CacheCog(commands.Cog):
     """Cog that contains the cache commands"""
     def __init__(self, bot):
         self.bot = bot
+        router.register_handler(router.ROUTE_GAME_COMMAND, self.store_game_command)
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message) -> None:
-        """Runs when a message is sent in a channel."""
-        if message.author.bot: return
-        if message.embeds or message.content is None: return
-        correct_mention = False
-        if message.content.lower().startswith('idle ') or message.content.lower().startswith('testy '):
-            await messages.store_message(message)
-            return
-        if message.mentions:
-            for mentioned_user in message.mentions:
-                if mentioned_user.id == settings.GAME_ID:
-                    correct_mention = True
-                    break
-            if correct_mention:
-                await messages.store_message(message)
+    async def store_game_command(self, message: discord.Message) -> None:
+        """Stores game commands in the message cache. Called by the router for every game command."""
+        await messages.store_message(message)
 
 # Initialization
 def setup(bot):
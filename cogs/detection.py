@@ -1,193 +1,103 @@
 # detection.py
 """Collects and parses IDLE FARM messages"""
 
-import re
-from typing import Dict, Union
+from collections import OrderedDict
+from typing import FrozenSet, Optional, Union
 
 import discord
 from discord.ext import commands
 
-from database import clans, guilds, users
 from processing import activities, boosts, buy, claim, clan, daily, donate, events, halloween, inventory, minievent
 from processing import open, payday, profile, raid, request, shop, teamraid, upgrades, use, vote, workers, xmas
-from resources import exceptions, functions, regex, settings
+from resources import admission, dispatcher, embeds, functions, router, sessions, settings
+
+
+# All processors. Processors without an "after" run concurrently.
+# Processors that create or update reminders have the highest admission priority, see resources.admission.
+REMINDERS = admission.PRIORITY_REMINDERS
+HELPERS = admission.PRIORITY_HELPERS
+PROCESSORS = dispatcher.ProcessorRegistry((
+    dispatcher.register(raid),
+    dispatcher.register(claim, timeout=None, priority=REMINDERS),
+    dispatcher.register(daily, priority=REMINDERS),
+    dispatcher.register(shop, priority=REMINDERS),
+    dispatcher.register(use, priority=REMINDERS),
+    dispatcher.register(payday, priority=REMINDERS),
+    dispatcher.register(buy, priority=HELPERS),
+    dispatcher.register(events, ('bot', 'message', 'embed_data', 'guild_settings')),
+    dispatcher.register(upgrades),
+    dispatcher.register(open, dispatcher.CLAN_ARGUMENTS),
+    dispatcher.register(request, dispatcher.CLAN_ARGUMENTS),
+    dispatcher.register(vote, priority=REMINDERS),
+    dispatcher.register(workers, dispatcher.CLAN_ARGUMENTS),
+    dispatcher.register(clan, dispatcher.CLAN_ARGUMENTS, priority=REMINDERS),
+    # Both update the clan and share clan_settings
+    dispatcher.register(teamraid, dispatcher.CLAN_ARGUMENTS, after=('clan',), priority=REMINDERS),
+    dispatcher.register(donate),
+    dispatcher.register(profile, timeout=None, priority=REMINDERS),
+    dispatcher.register(boosts, priority=REMINDERS),
+    dispatcher.register(halloween, priority=REMINDERS),
+    dispatcher.register(xmas, priority=REMINDERS),
+    dispatcher.register(activities, priority=REMINDERS),
+    dispatcher.register(inventory),
+    dispatcher.register(minievent, priority=REMINDERS),
+))
+
+# Message id -> fingerprint of the last seen version of edited game messages (see embeds.get_fingerprint)
+FINGERPRINTS = OrderedDict()
+FINGERPRINT_CACHE_SIZE = 5_000
 
 
 class DetectionCog(commands.Cog):
     """Cog that contains the detection events"""
     def __init__(self, bot):
         self.bot = bot
+        router.register_handler(router.ROUTE_GAME, self.process_message)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent) -> None:
+        """Runs when any message is edited. Passes the edit to the helper session of the message, if there is one."""
+        sessions.route_edit(payload)
 
     @commands.Cog.listener()
     async def on_message_edit(self, message_before: discord.Message, message_after: discord.Message) -> None:
         """Runs when a message is edited in a channel."""
         if message_after.author.id not in [settings.GAME_ID, settings.TESTY_ID]: return
-        embed_data_before = await parse_embed(message_before)
+        fingerprint_before = FINGERPRINTS.pop(message_after.id, None)
+        if fingerprint_before is None: fingerprint_before = embeds.get_fingerprint(message_before)
+        fingerprint = FINGERPRINTS[message_after.id] = embeds.get_fingerprint(message_after)
+        if len(FINGERPRINTS) > FINGERPRINT_CACHE_SIZE: FINGERPRINTS.popitem(last=False)
+        changed_parts = embeds.get_changed_parts(fingerprint_before, fingerprint)
+        if not changed_parts: return
         embed_data = await parse_embed(message_after)
-        if (message_before.content == message_after.content and embed_data_before == embed_data
-            and message_before.components == message_after.components): return
         if await check_edited_message_never_allowed(message_before, message_after, embed_data): return
         if await check_edited_message_always_allowed(message_before, message_after, embed_data):
-            await self.on_message(message_after)
+            await self.process_message(message_after, embed_data, changed_parts)
             return
         if message_before.components and not message_after.components: return
         if await check_message_for_active_components(message_after):
-            await self.on_message(message_after)
+            await self.process_message(message_after, embed_data, changed_parts)
             return
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message) -> None:
-        """Runs when a message is sent in a channel."""
-        if message.author.id not in [settings.GAME_ID, settings.TESTY_ID]: return
-        user_settings = clan_settings = None
-        embed_data = await parse_embed(message)
-        embed_data['embed_user'] = None
-        embed_data['embed_user_settings'] = None
-        interaction_user = await functions.get_interaction_user(message)
-        user_id_match = re.search(regex.USER_ID_FROM_ICON_URL, embed_data['author']['icon_url'])
-        if user_id_match:
-            embed_data['embed_user'] = message.guild.get_member(int(user_id_match.group(1)))
-        if interaction_user is not None:
-            try:
-                user_settings: users.User = await users.get_user(interaction_user.id)
-            except exceptions.FirstTimeUserError:
-                return
-            if user_settings is not None:
-                if not user_settings.bot_enabled: return
-            try:
-                clan_settings: clans.Clan = await clans.get_clan_by_member_id(interaction_user.id)
-            except exceptions.NoDataFoundError:
-                pass
-        if embed_data['embed_user'] is not None:
-            if interaction_user is not None and embed_data['embed_user'] == interaction_user:
-                embed_user_settings = user_settings
-            else:
-                try:
-                    embed_user_settings: users.User = await users.get_user(embed_data['embed_user'].id)
-                except exceptions.FirstTimeUserError:
-                    embed_user_settings = None
-            embed_data['embed_user_settings'] = embed_user_settings
-        guild_settings = await guilds.get_guild(message.guild.id)
-        return_values = []
-        helper_context_enabled = getattr(user_settings, 'helper_context_enabled', True)
-        helper_profile_enabled = getattr(user_settings, 'helper_profile_enabled', True)
-        helper_raid_enabled = getattr(user_settings, 'helper_raid_enabled', True)
-        helper_upgrades_enabled = getattr(user_settings, 'helper_upgrades_enabled', True)
-        reminder_daily_enabled = getattr(getattr(user_settings, 'reminder_daily', None), 'enabled', True)
-        reminder_claim_enabled = getattr(getattr(user_settings, 'reminder_claim', None), 'enabled', True)
-        reminder_energy_enabled = getattr(getattr(user_settings, 'reminder_energy', None), 'enabled', True)
-        reminder_shop_enabled = getattr(getattr(user_settings, 'reminder_shop', None), 'enabled', True)
-        reminder_vote_enabled = getattr(getattr(user_settings, 'reminder_vote', None), 'enabled', True)
-        tracking_enabled = getattr(user_settings, 'tracking_enabled', True)
-        helper_teamraid_enabled = getattr(clan_settings, 'helper_teamraid_enabled', False)
-
-        # Raids
-        if tracking_enabled or helper_context_enabled or helper_raid_enabled or reminder_energy_enabled:
-            add_reaction = await raid.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-            return_values.append(add_reaction)
-
-        # Claim Reminder
-        add_reaction = await claim.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-        return_values.append(add_reaction)
-
-        # Daily Reminder
-        if reminder_daily_enabled:
-            add_reaction = await daily.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-            return_values.append(add_reaction)
-            
-        # Shop Reminder
-        if reminder_shop_enabled:
-            add_reaction = await shop.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-            return_values.append(add_reaction)
-
-        # Use items
-        add_reaction = await use.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-        return_values.append(add_reaction)
-        
-        # Payday
-        if helper_upgrades_enabled:
-            add_reaction = await payday.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-            return_values.append(add_reaction)
-        
-        # Buy items frop the shop
-        if helper_context_enabled:
-            add_reaction = await buy.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-            return_values.append(add_reaction)
-
-        # Event pings
-        if any([guild_settings.event_energy.enabled, guild_settings.event_hire.enabled,
-                guild_settings.event_lucky.enabled, guild_settings.event_packing.enabled]):
-            add_reaction = await events.process_message(self.bot, message, embed_data, guild_settings)
-            return_values.append(add_reaction)
-            
-        # Track upgrades
-        if helper_upgrades_enabled:
-            add_reaction = await upgrades.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-            return_values.append(add_reaction)
-
-        # Open    
-        if helper_raid_enabled or helper_teamraid_enabled:
-            add_reaction = await open.process_message(self.bot, message, embed_data, interaction_user, user_settings,
-                                                      clan_settings)
-            return_values.append(add_reaction)
-
-        # Request tracking
-        if helper_raid_enabled or helper_teamraid_enabled:
-            add_reaction = await request.process_message(self.bot, message, embed_data, interaction_user, user_settings,
-                                                         clan_settings)
-            return_values.append(add_reaction)
-
-        # Vote
-        if reminder_vote_enabled:
-            add_reaction = await vote.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-            return_values.append(add_reaction)
-            
-        # Worker tracking
-        add_reaction = await workers.process_message(self.bot, message, embed_data, interaction_user, user_settings,
-                                                        clan_settings)
-        return_values.append(add_reaction)
-
-        # Clan reminders & updates
-        add_reaction = await clan.process_message(self.bot, message, embed_data, interaction_user, user_settings,
-                                                  clan_settings)
-        return_values.append(add_reaction)
-        add_reaction = await teamraid.process_message(self.bot, message, embed_data, interaction_user, user_settings,
-                                                      clan_settings)
-        return_values.append(add_reaction)
-
-        # Update donor tier
-        add_reaction = await donate.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-        return_values.append(add_reaction)
-
-         # Energy Helper
-        add_reaction = await profile.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-        return_values.append(add_reaction)
-        
-         # Boost reminders
-        add_reaction = await boosts.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-        return_values.append(add_reaction)
-        
-         # Halloween
-        add_reaction = await halloween.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-        return_values.append(add_reaction)
-        
-         # Christmas
-        add_reaction = await xmas.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-        return_values.append(add_reaction)
-
-        # Activity list
-        add_reaction = await activities.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-        return_values.append(add_reaction)
-        
-        # Inventory
-        add_reaction = await inventory.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-        return_values.append(add_reaction)
-        
-        # Mini Event
-        add_reaction = await minievent.process_message(self.bot, message, embed_data, interaction_user, user_settings)
-        return_values.append(add_reaction)
-
-        if any(return_values): await functions.add_logo_reaction(message)
+    async def process_message(self, message: discord.Message, embed_data: Optional[embeds.EmbedData] = None,
+                              changed_parts: Optional[FrozenSet[str]] = None) -> None:
+        """Processes a game message. Called by the router for new game messages and by on_message_edit with the
+        already parsed embed and the parts that changed with the edit.
+        """
+        if embed_data is None: embed_data = await parse_embed(message)
+        matched_processors = PROCESSORS.classify(embed_data)
+        if not matched_processors: return
+        slot = await admission.acquire(min(processor.priority for processor in matched_processors))
+        if slot is None: return
+
+        async def add_logo_reaction() -> None:
+            if not admission.shed_reaction(): await functions.add_logo_reaction(message)
+
+        try:
+            context = dispatcher.MessageContext(self.bot, message, embed_data, changed_parts)
+            await dispatcher.run_processors(matched_processors, context, add_logo_reaction, slot.release)
+        finally:
+            slot.release()
 
 # Initialization
 def setup(bot):
@@ -195,70 +105,11 @@ def setup(bot):
 
 
 # Functions
-async def parse_embed(message: discord.Message) -> Dict[str, str]:
-    """Parses all data from an embed into a dictionary.
+async def parse_embed(message: discord.Message) -> embeds.EmbedData:
+    """Returns a read-only view on the embed and content of a message. See resources.embeds.EmbedData.
     All keys are guaranteed to exist and have an empty string as value if not set in the embed.
     """
-    embed_data = {
-        'author': {'icon_url': '', 'name': ''},
-        'description': '',
-        'field0': {'name': '', 'value': ''},
-        'field1': {'name': '', 'value': ''},
-        'field2': {'name': '', 'value': ''},
-        'field3': {'name': '', 'value': ''},
-        'field4': {'name': '', 'value': ''},
-        'field5': {'name': '', 'value': ''},
-        'footer': {'icon_url': '', 'text': ''},
-        'title': '',
-    }
-    if message.embeds:
-        embed = message.embeds[0]
-        if embed.author is not None:
-            if embed.author.icon_url is not None:
-                embed_data['author']['icon_url'] = embed.author.icon_url
-            if embed.author.name is not None:
-                embed_data['author']['name'] = embed.author.name
-        if embed.description is not None:
-            embed_data['description'] = embed.description
-        if embed.fields:
-            try:
-                embed_data['field0']['name'] = embed.fields[0].name
-                embed_data['field0']['value'] = embed.fields[0].value
-            except IndexError:
-                pass
-            try:
-                embed_data['field1']['name'] = embed.fields[1].name
-                embed_data['field1']['value'] = embed.fields[1].value
-            except IndexError:
-                pass
-            try:
-                embed_data['field2']['name'] = embed.fields[2].name
-                embed_data['field2']['value'] = embed.fields[2].value
-            except IndexError:
-                pass
-            try:
-                embed_data['field3']['name'] = embed.fields[3].name
-                embed_data['field3']['value'] = embed.fields[3].value
-            except IndexError:
-                pass
-            try:
-                embed_data['field4']['name'] = embed.fields[4].name
-                embed_data['field4']['value'] = embed.fields[4].value
-            except IndexError:
-                pass
-            try:
-                embed_data['field5']['name'] = embed.fields[5].name
-                embed_data['field5']['value'] = embed.fields[5].value
-            except IndexError:
-                pass
-        if embed.footer is not None:
-            if embed.footer.icon_url is not None:
-                embed_data['footer']['icon_url'] = embed.footer.icon_url
-            if embed.footer.text is not None:
-                embed_data['footer']['text'] = embed.footer.text
-        if embed.title is not None:
-            embed_data['title'] = embed.title
-    return embed_data
+    return embeds.EmbedData(message)
 
 
 async def check_message_for_active_components(message: discord.Message) -> Union[bool, None]:
@@ -280,7 +131,7 @@ async def check_message_for_active_components(message: discord.Message) -> Union
 
 
 async def check_edited_message_always_allowed(message_before: discord.Message,
-                                             message_after: discord.Message, embed_data: Dict) -> Union[bool, None]:
+                                             message_after: discord.Message, embed_data: embeds.EmbedData) -> Union[bool, None]:
     """Check if the edited message should be allowed to process regardless of its components.
 
     Returns
@@ -291,14 +142,14 @@ async def check_edited_message_always_allowed(message_before: discord.Message,
     search_strings =  [
         '— worker roll', #All languages
     ]
-    if any(search_string in embed_data['author']['name'].lower() for search_string in search_strings):
+    if any(search_string in embed_data.lower('author') for search_string in search_strings):
         if message_before.embeds[0].footer is not None:
             if message_before.embeds[0].footer.text != embed_data['footer']['text']: return True
     return False
 
 
 async def check_edited_message_never_allowed(message_before: discord.Message,
-                                             message_after: discord.Message, embed_data: Dict) -> Union[bool, None]:
+                                             message_after: discord.Message, embed_data: embeds.EmbedData) -> Union[bool, None]:
     """Check if the edited message should never be allowed to process.
 
     Returns
@@ -310,7 +161,7 @@ async def check_edited_message_never_allowed(message_before: discord.Message,
     search_strings =  [
         '— raid', #All languages
     ]
-    if any(search_string in embed_data['author']['name'].lower() for search_string in search_strings):
+    if any(search_string in embed_data.lower('author') for search_string in search_strings):
         return True
     """
     search_strings =  [
@@ -9,8 +9,9 @@ import discord
 from discord.commands import SlashCommandGroup, Option
 from discord.ext import commands
 
-from database import cooldowns
-from resources import emojis, exceptions, functions, logs, settings, views
+from cache import messages
+from database import cooldowns, workers
+from resources import admission, cpu, dispatcher, emojis, exceptions, functions, logs, outbound, router, sessions, settings, solvers, views
 
 
 EVENT_REDUCTION_TYPES = [
@@ -157,6 +158,7 @@ class DevCog(commands.Cog):
                                              view=None)
         elif view.value == 'confirm':
             await functions.edit_interaction(interaction, content='Byeeeee.', view=None)
+            cpu.shutdown()
             await self.bot.close()
         else:
             await functions.edit_interaction(interaction, content='Phew, seriously, stop scaring me.', view=None)
@@ -167,21 +169,25 @@ class DevCog(commands.Cog):
         if ctx.author.id not in settings.DEV_IDS:
             await ctx.respond(MSG_NOT_DEV, ephemeral=True)
             return
-        from cache import messages
-        cache_size = sys.getsizeof(messages._MESSAGE_CACHE)
-        channel_count = len(messages._MESSAGE_CACHE)
-        message_count = 0
-        for channel_messages in messages._MESSAGE_CACHE.values():
-            message_count += len(channel_messages)
-            cache_size += sys.getsizeof(channel_messages)
-            for message in channel_messages:
-                cache_size += sys.getsizeof(message)
+        cache_size = messages.get_cache_size()
+        total_bytes = cache_size['budget_bytes'] + cache_size['dict_bytes']
         await ctx.respond(
-            f'Cache size: {cache_size / 1024:,.2f} KB\n'
-            f'Channel count: {channel_count:,}\n'
-            f'Message count: {message_count:,}\n'
+            f'Cache size: {total_bytes / 1024:,.2f} KB '
+            f'(records and deques: {cache_size["budget_bytes"] / 1024:,.2f} KB of '
+            f'{cache_size["max_bytes"] / 1024:,.0f} KB budget, index: {cache_size["dict_bytes"] / 1024:,.2f} KB)\n'
+            f'Channel count: {cache_size["channels"]:,}\n'
+            f'Message count: {cache_size["messages"]:,}\n'
         )
 
+    @dev.command()
+    async def stats(self, ctx: discord.ApplicationContext):
+        """Shows performance stats"""
+        if ctx.author.id not in settings.DEV_IDS:
+            await ctx.respond(MSG_NOT_DEV, ephemeral=True)
+            return
+        embed = await embed_dev_stats()
+        await ctx.respond(embed=embed)
+
     @dev.command(name='server-list')
     async def server_list(self, ctx: discord.ApplicationContext):
         """Lists the servers the bot is in by name"""
@@ -269,4 +275,127 @@ async def embed_dev_event_reductions(all_cooldowns: List[cooldowns.Cooldown]) ->
     )
     embed.add_field(name='Slash commands', value=reductions_slash, inline=False)
     embed.add_field(name='Text & mention commands', value=reductions_text, inline=False)
-    return embed
\ No newline at end of file
+    return embed
+
+
+async def embed_dev_stats() -> discord.Embed:
+    """Performance stats embed"""
+    outbound_stats = outbound.get_stats()
+    field_outbound = (
+        f'{emojis.BP} Queue depth: `{outbound_stats["queue_depth"]:,}` in `{outbound_stats["active_channels"]:,}` '
+        f'channels (max. `{outbound_stats["max_queue_depth"]:,}`)\n'
+        f'{emojis.BP} Edits saved: `{outbound_stats["edits_skipped"]:,}` unchanged, '
+        f'`{outbound_stats["edits_debounced"]:,}` debounced'
+    )
+    for priority_name, priority_stats in outbound_stats['priorities'].items():
+        field_outbound = (
+            f'{field_outbound}\n'
+            f'{emojis.BP} {priority_name}: `{priority_stats["sent"]:,}` sent, `{priority_stats["failed"]:,}` failed, '
+            f'`{priority_stats["merged"]:,}` merged, `{priority_stats["dropped"]:,}` dropped, '
+            f'p50 `{priority_stats["latency_p50"]:.2f}`s, p99 `{priority_stats["latency_p99"]:.2f}`s'
+        )
+    processor_stats = sorted(dispatcher.get_stats().items(), key=lambda item: item[1]['latency_p99'], reverse=True)
+    field_processors = ''
+    for processor_name, stats in processor_stats[:10]:
+        processor_line = (
+            f'{processor_name}: `{stats["calls"]:,}` calls, `{stats["errors"]:,}` err, `{stats["timeouts"]:,}` t/o, '
+            f'`{stats["latency_p50"]:.2f}`/`{stats["latency_p99"]:.2f}`s'
+        )
+        # Embed field values are limited to 1024 characters
+        if len(field_processors) + len(processor_line) + 1 > 1024: break
+        field_processors = f'{field_processors}\n{processor_line}'
+    if not field_processors: field_processors = f'{emojis.BP} No messages processed yet'
+    cache_stats = functions.get_interaction_user_cache_stats()
+    cache_lookups = cache_stats['hits'] + cache_stats['misses']
+    cache_hit_rate = cache_stats['hits'] / cache_lookups * 100 if cache_lookups else 0
+    field_caches = (
+        f'{emojis.BP} Interaction users: `{cache_stats["size"]:,}` cached, `{cache_hit_rate:.1f}`% hit rate '
+        f'(`{cache_stats["hits"]:,}` hits, `{cache_stats["misses"]:,}` misses, `{cache_stats["fetches"]:,}` fetches)'
+    )
+    roster_cache_stats = workers.get_roster_cache_stats()
+    roster_lookups = roster_cache_stats['hits'] + roster_cache_stats['misses']
+    roster_hit_rate = roster_cache_stats['hits'] / roster_lookups * 100 if roster_lookups else 0
+    field_caches = (
+        f'{field_caches}\n'
+        f'{emojis.BP} Worker rosters: `{roster_cache_stats["size"]:,}` cached, `{roster_hit_rate:.1f}`% hit rate '
+        f'(`{roster_cache_stats["hits"]:,}` hits, `{roster_cache_stats["misses"]:,}` misses)'
+    )
+    solution_cache_stats = solvers.get_solution_cache_stats()
+    solution_lookups = (
+        solution_cache_stats['hits'] + solution_cache_stats['sub_solution_hits'] + solution_cache_stats['misses']
+    )
+    solution_hit_rate = (
+        (solution_cache_stats['hits'] + solution_cache_stats['sub_solution_hits']) / solution_lookups * 100
+        if solution_lookups else 0
+    )
+    field_caches = (
+        f'{field_caches}\n'
+        f'{emojis.BP} Raid solutions: `{solution_cache_stats["solutions"]:,}` solutions, '
+        f'`{solution_cache_stats["sub_solutions"]:,}` sub solutions, '
+        f'`{solution_cache_stats["bytes"] / 1024 / 1024:,.1f}` MB, `{solution_hit_rate:.1f}`% hit rate '
+        f'(`{solution_cache_stats["hits"]:,}` hits, `{solution_cache_stats["sub_solution_hits"]:,}` sub solution hits, '
+        f'`{solution_cache_stats["misses"]:,}` misses, `{solution_cache_stats["evicted"]:,}` evicted)'
+    )
+    message_cache_stats = messages.get_stats()
+    message_lookups = message_cache_stats['lookups']
+    message_wait_rate = message_cache_stats['waits'] / message_lookups * 100 if message_lookups else 0
+    field_caches = (
+        f'{field_caches}\n'
+        f'{emojis.BP} Message cache: `{message_lookups:,}` lookups, `{message_cache_stats["hits"]:,}` hits, '
+        f'`{message_cache_stats["hits_after_wait"]:,}` hits after waiting, `{message_cache_stats["misses"]:,}` misses, '
+        f'`{message_cache_stats["evicted"]:,}` evicted, `{message_wait_rate:.1f}`% waited, p50 `{message_cache_stats["latency_p50"] * 1000:.1f}`ms, '
+        f'p99 `{message_cache_stats["latency_p99"] * 1000:.1f}`ms'
+    )
+    router_stats = router.get_stats()
+    field_router = (
+        f'{emojis.BP} Routed: `{router_stats[router.ROUTE_GAME]:,}` game messages, '
+        f'`{router_stats[router.ROUTE_GAME_COMMAND]:,}` game commands, `{router_stats[router.ROUTE_COMMAND]:,}` commands, '
+        f'`{router_stats[router.ROUTE_MENTION]:,}` mentions\n'
+        f'{emojis.BP} Rejected: `{router_stats["rejected_bot"]:,}` bots, `{router_stats["rejected_private"]:,}` DMs, '
+        f'`{router_stats["rejected_empty"]:,}` empty, `{router_stats["rejected_no_prefix"]:,}` without prefix'
+    )
+    admission_stats = admission.get_stats()
+    field_admission = (
+        f'{emojis.BP} Active: `{admission_stats["active"]:,}` (max. `{admission.MAX_ACTIVE:,}`), queued: '
+        f'`{admission_stats["queue_depth"]:,}` (peak `{admission_stats["max_queue_depth"]:,}`, max. '
+        f'`{admission.MAX_QUEUED:,}`)\n'
+        f'{emojis.BP} Overloaded: `{"Yes" if admission_stats["overloaded"] else "No"}`, shed: '
+        f'`{admission_stats["shed_helpers"]:,}` helpers, `{admission_stats["shed_reactions"]:,}` reactions'
+    )
+    for priority_name, priority_stats in admission_stats['priorities'].items():
+        field_admission = (
+            f'{field_admission}\n'
+            f'{emojis.BP} {priority_name}: `{priority_stats["admitted"]:,}` admitted, '
+            f'`{priority_stats["queued"]:,}` queued, `{priority_stats["shed"]:,}` shed'
+        )
+    cpu_stats = cpu.get_stats()
+    field_cpu = (
+        f'{emojis.BP} Pool: `{"Running" if cpu_stats["running"] else "Stopped"}`, `{cpu_stats["workers"]}` workers, '
+        f'`{cpu_stats["pending"]:,}` pending (max. `{cpu.MAX_QUEUED:,}`)\n'
+        f'{emojis.BP} Jobs: `{cpu_stats["submitted"]:,}` submitted, `{cpu_stats["completed"]:,}` completed, '
+        f'`{cpu_stats["failed"]:,}` failed, `{cpu_stats["timeouts"]:,}` timeouts, `{cpu_stats["cancelled"]:,}` cancelled, '
+        f'`{cpu_stats["inline"]:,}` inline (`{cpu_stats["queue_full"]:,}` because the queue was full)\n'
+        f'{emojis.BP} Loop lag: p50 `{cpu_stats["loop_lag_p50"] * 1000:.1f}`ms, p99 `{cpu_stats["loop_lag_p99"] * 1000:.1f}`ms, '
+        f'max. `{cpu_stats["loop_lag_max"] * 1000:.1f}`ms, `{cpu_stats["loop_lag_over_budget"]:,}` stalls over '
+        f'`{cpu.LOOP_LAG_BUDGET * 1000:.0f}`ms'
+    )
+    session_stats = sessions.get_stats()
+    field_sessions = (
+        f'{emojis.BP} Active: `{session_stats["active"]:,}` (peak `{session_stats["peak"]:,}`, '
+        f'max. `{sessions.MAX_SESSIONS:,}`)\n'
+        f'{emojis.BP} `{session_stats["started"]:,}` started, `{session_stats["rejected"]:,}` rejected, '
+        f'`{session_stats["expired"]:,}` expired, `{session_stats["failed"]:,}` failed\n'
+        f'{emojis.BP} Edits: `{session_stats["edits_routed"]:,}` routed, `{session_stats["edits_dropped"]:,}` dropped'
+    )
+    embed = discord.Embed(
+        color = settings.EMBED_COLOR,
+        title = 'Performance stats',
+    )
+    embed.add_field(name='Message router', value=field_router, inline=False)
+    embed.add_field(name='Admission', value=field_admission, inline=False)
+    embed.add_field(name='Outbound queue', value=field_outbound, inline=False)
+    embed.add_field(name='Processors (slowest 10 by p99, latency p50/p99)', value=field_processors.strip(), inline=False)
+    embed.add_field(name='Helper sessions', value=field_sessions, inline=False)
+    embed.add_field(name='CPU pool', value=field_cpu, inline=False)
+    embed.add_field(name='Caches', value=field_caches, inline=False)
+    return embed
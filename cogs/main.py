@@ -9,13 +9,14 @@ from discord.commands import slash_command
 
 from content import main
 from database import errors, guilds
-from resources import exceptions, functions, logs, settings
+from resources import exceptions, functions, logs, router, settings
 
 
 class MainCog(commands.Cog):
     """Cog with events and help and about commands"""
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        router.register_handler(router.ROUTE_MENTION, self.prefix_help)
 
     # Commands
     @slash_command(name='event-reductions')
@@ -5,6 +5,8 @@ import asyncio
 from datetime import timedelta
 from humanfriendly import format_timespan
 import sqlite3
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 import discord
 from discord import utils
@@ -12,20 +14,34 @@ from discord.ext import commands, tasks
 
 from cache import messages
 from database import clans, errors, reminders, tracking, users
-from resources import exceptions, functions, logs, settings
+from resources import cpu, exceptions, functions, logs, outbound, settings
 
 
 running_tasks = {}
+pending_deliveries = {} # Reminder messages waiting to be sent, grouped by (user_id, channel_id)
+
+
+class ReminderPayload(NamedTuple):
+    """Everything a reminder task needs at end_time, resolved when the task is created"""
+    channel: discord.abc.Messageable
+    template: str
+    user: Optional[discord.User] # None for clan reminders
+    user_settings: Optional[users.User] # None for clan reminders
+    values: Dict[str, str] # Placeholder values for the template
 
 
 class TasksCog(commands.Cog):
     """Cog with tasks"""
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.startup_complete = False
 
     # Task management
-    async def background_task(self, reminder: reminders.Reminder) -> None:
-        """Background task for scheduling reminders"""
+    async def background_task(self, reminder: reminders.Reminder, payload: ReminderPayload) -> None:
+        """Background task for scheduling reminders.
+        Everything the reminder needs is resolved beforehand in prepare_reminders, so all that is left to do at
+        end_time is filling the template and sending it.
+        """
         current_time = utils.utcnow().replace(microsecond=0)
         def get_time_left() -> timedelta:
             time_left = reminder.end_time - current_time
@@ -33,97 +49,170 @@ class TasksCog(commands.Cog):
             return time_left
         
         try:
-            if reminder.activity != 'clan':
-                user = await functions.get_discord_user(self.bot, reminder.user_id)
-                user_settings = await users.get_user(user.id)
+            time_left = get_time_left()
+            try:
+                await asyncio.sleep(time_left.total_seconds())
+            except asyncio.CancelledError:
+                return
+            reminder_message = functions.format_template(payload.template, payload.values)
+            if reminder.activity == 'clan':
+                allowed_mentions = discord.AllowedMentions(roles=True)
+                await outbound.send(payload.channel, content=reminder_message, allowed_mentions=allowed_mentions)
+            else:
+                await self.deliver_reminder(payload.user, payload.user_settings, payload.channel, reminder_message)
+            running_tasks.pop(reminder.task_name, None)
+        except discord.errors.Forbidden:
+            return
+        except Exception as error:
+            await errors.log_error(error)
+
+    async def prepare_reminders(self, reminder_list: List[reminders.Reminder]) -> Dict[str, ReminderPayload]:
+        """Resolves everything the given reminders need to be sent. User settings are loaded in one query and
+        every Discord user and channel is resolved only once, no matter how many reminders need it.
+
+        Returns
+        -------
+        Dict with the task names as keys and the ReminderPayload as values. Reminders that can't be sent
+        (e.g. because the channel doesn't exist anymore) are not included.
+        """
+        user_ids = {reminder.user_id for reminder in reminder_list if reminder.activity != 'clan'}
+        clan_names = {reminder.clan_name for reminder in reminder_list if reminder.activity == 'clan'}
+        all_user_settings = {}
+        if user_ids:
+            try:
+                for user_settings in await users.get_users(user_ids):
+                    all_user_settings[user_settings.user_id] = user_settings
+            except exceptions.FirstTimeUserError:
+                pass
+        all_clan_settings = {}
+        for clan_name in clan_names:
+            try:
+                all_clan_settings[clan_name] = await clans.get_clan_by_clan_name(clan_name)
+            except exceptions.NoDataFoundError:
+                pass
+        channel_ids = {}
+        for reminder in reminder_list:
+            if reminder.activity == 'clan':
+                clan_settings = all_clan_settings.get(reminder.clan_name, None)
+                if clan_settings is not None: channel_ids[reminder.task_name] = clan_settings.reminder_channel_id
+            else:
+                user_settings = all_user_settings.get(reminder.user_id, None)
+                if user_settings is None: continue
                 if user_settings.reminder_channel_id is not None:
-                    channel_id = user_settings.reminder_channel_id
-                else:
-                    channel_id = reminder.channel_id
-                channel = await functions.get_discord_channel(self.bot, channel_id)
-                if channel is None: return
-                message_content = embed = None
-                if reminder.activity == 'custom':
-                    reminder_message = user_settings.reminder_custom.message.replace('{custom_reminder_text}', reminder.message)
-                else:
-                    reminder_message = reminder.message
-                if not user_settings.dnd_mode_enabled:
-                    if user_settings.reminders_as_embed:
-                        message_content = user.mention
-                        reminder_message = reminder_message.replace("{name}", user.display_name)
-                    else:
-                        reminder_message = reminder_message.replace("{name}", user.mention)
+                    channel_ids[reminder.task_name] = user_settings.reminder_channel_id
                 else:
-                    reminder_message = reminder_message.replace("{name}", user.display_name)
-                if reminder.activity == 'claim':
-                    reminder_message = reminder_message.replace(
-                        '{last_claim_time}',
-                        utils.format_dt(user_settings.last_claim_time, "R")
-                    )
-                    production_time = (
-                        reminder.end_time
-                        - user_settings.last_claim_time
-                        + (user_settings.time_speeders_used * timedelta(hours=2))
-                        + (user_settings.time_compressors_used * timedelta(hours=4))
-                        + (user_settings.time_dilators_used * timedelta(hours=8))
-                    )
-                    microseconds = production_time.microseconds
-                    production_time = production_time - timedelta(microseconds=production_time.microseconds)
-                    if microseconds >= 500_000: production_time += timedelta(seconds=1)
-                    reminder_message = reminder_message.replace('{production_time}', format_timespan(production_time))
-                if reminder.activity.startswith('energy'):
-                    reminder_message = (
-                        reminder_message
-                        .replace('{energy_amount}', reminder.activity[7:])
-                        .replace('{energy_full_time}', utils.format_dt(user_settings.energy_full_time, 'R'))
-                    )
-                if user_settings.reminders_as_embed:
+                    channel_ids[reminder.task_name] = reminder.channel_id
+        discord_users = dict(zip(
+            all_user_settings.keys(),
+            await asyncio.gather(*[functions.get_discord_user(self.bot, user_id) for user_id in all_user_settings],
+                                 return_exceptions=True)
+        ))
+        unique_channel_ids = set(channel_ids.values())
+        channels = dict(zip(
+            unique_channel_ids,
+            await asyncio.gather(*[functions.get_discord_channel(self.bot, channel_id) for channel_id in unique_channel_ids],
+                                 return_exceptions=True)
+        ))
+        payloads = {}
+        for reminder in reminder_list:
+            channel = channels.get(channel_ids.get(reminder.task_name, None), None)
+            if channel is None or isinstance(channel, Exception): continue
+            if reminder.activity == 'clan':
+                clan_settings = all_clan_settings[reminder.clan_name]
+                payloads[reminder.task_name] = ReminderPayload(
+                    channel, reminder.message, None, None, {'guild_role': f'<@&{clan_settings.reminder_role_id}>'}
+                )
+                continue
+            user = discord_users.get(reminder.user_id, None)
+            if user is None or isinstance(user, Exception): continue
+            user_settings = all_user_settings[reminder.user_id]
+            if reminder.activity == 'custom':
+                template = user_settings.reminder_custom.message.replace('{custom_reminder_text}', reminder.message)
+            else:
+                template = reminder.message
+            if user_settings.dnd_mode_enabled or user_settings.reminders_as_embed:
+                values = {'name': user.display_name}
+            else:
+                values = {'name': user.mention}
+            if reminder.activity == 'claim':
+                values['last_claim_time'] = utils.format_dt(user_settings.last_claim_time, "R")
+                production_time = (
+                    reminder.end_time
+                    - user_settings.last_claim_time
+                    + (user_settings.time_speeders_used * timedelta(hours=2))
+                    + (user_settings.time_compressors_used * timedelta(hours=4))
+                    + (user_settings.time_dilators_used * timedelta(hours=8))
+                )
+                microseconds = production_time.microseconds
+                production_time = production_time - timedelta(microseconds=production_time.microseconds)
+                if microseconds >= 500_000: production_time += timedelta(seconds=1)
+                values['production_time'] = format_timespan(production_time)
+            if reminder.activity.startswith('energy'):
+                values['energy_amount'] = reminder.activity[7:]
+                values['energy_full_time'] = utils.format_dt(user_settings.energy_full_time, 'R')
+            payloads[reminder.task_name] = ReminderPayload(channel, template, user, user_settings, values)
+        return payloads
+
+    async def deliver_reminder(self, user: discord.User, user_settings: users.User,
+                               channel: discord.abc.Messageable, reminder_message: str) -> None:
+        """Adds a due reminder message to the delivery queue of its user and channel.
+        The first message in a queue starts a delivery task that waits for settings.REMINDER_DELIVERY_WINDOW and
+        then sends all messages that arrived in the meantime together.
+        """
+        delivery_key = (user.id, channel.id)
+        reminder_messages = pending_deliveries.get(delivery_key, None)
+        if reminder_messages is None:
+            reminder_messages = pending_deliveries[delivery_key] = []
+            self.bot.loop.create_task(self.send_reminder_delivery(delivery_key, user, user_settings, channel))
+        reminder_messages.append(reminder_message)
+
+    async def send_reminder_delivery(self, delivery_key: Tuple[int, int], user: discord.User,
+                                     user_settings: users.User, channel: discord.abc.Messageable) -> None:
+        """Sends all queued reminder messages of a delivery key as one message.
+        Reminders as embeds are sent as one embed per reminder (10 per message), text reminders are joined into
+        as few messages as the message length allows.
+        """
+        await asyncio.sleep(settings.REMINDER_DELIVERY_WINDOW)
+        reminder_messages = pending_deliveries.pop(delivery_key, [])
+        if not reminder_messages: return
+        allowed_mentions = discord.AllowedMentions(users=[user,])
+        try:
+            if user_settings.reminders_as_embed:
+                message_content = None if user_settings.dnd_mode_enabled else user.mention
+                embeds = []
+                for reminder_message in reminder_messages:
+                    title, *lines = reminder_message.split('\n')
                     description = ''
-                    for index, line in enumerate(reminder_message.split('\n'), 1):
-                        if index == 1:
-                            title = line.strip()
-                        else:
-                            description = f'{description}\n{line}'
-                    embed = discord.Embed(
-                        color = settings.EMBED_COLOR,
-                        title = title,
-                        description = description
+                    for line in lines:
+                        description = f'{description}\n{line}'
+                    embeds.append(
+                        discord.Embed(
+                            color = settings.EMBED_COLOR,
+                            title = title.strip(),
+                            description = description
+                        )
                     )
-                else:
-                    message_content = reminder_message.strip()
-                time_left = get_time_left()
-                try:
-                    await asyncio.sleep(time_left.total_seconds())
-                    allowed_mentions = discord.AllowedMentions(users=[user,])
-                    await channel.send(content=message_content, embed=embed, allowed_mentions=allowed_mentions)
-                except asyncio.CancelledError:
-                    return
-                except discord.errors.Forbidden:
-                    return
-            if reminder.activity == 'clan':
-                clan_settings = await clans.get_clan_by_clan_name(reminder.clan_name)
-                channel = await functions.get_discord_channel(self.bot, clan_settings.reminder_channel_id)
-                if channel is None: return
-                reminder_message = reminder.message.replace('{guild_role}', f'<@&{clan_settings.reminder_role_id}>')
-                time_left = get_time_left()
-                try:
-                    await asyncio.sleep(time_left.total_seconds())
-                    allowed_mentions = discord.AllowedMentions(roles=True)
-                    await channel.send(reminder_message, allowed_mentions=allowed_mentions)
-                except asyncio.CancelledError:
-                    return
-                except discord.errors.Forbidden:
-                    return                
-            running_tasks.pop(reminder.task_name, None)
+                for index in range(0, len(embeds), 10):
+                    await outbound.send(channel, content=message_content, embeds=embeds[index:index+10],
+                                        allowed_mentions=allowed_mentions)
+            else:
+                message_content = ''
+                for reminder_message in reminder_messages:
+                    reminder_message = reminder_message.strip()
+                    if message_content and len(message_content) + len(reminder_message) + 1 > 2_000:
+                        await outbound.send(channel, content=message_content, allowed_mentions=allowed_mentions)
+                        message_content = ''
+                    message_content = f'{message_content}\n{reminder_message}'.strip()
+                await outbound.send(channel, content=message_content, allowed_mentions=allowed_mentions)
         except discord.errors.Forbidden:
             return
         except Exception as error:
             await errors.log_error(error)
 
-    async def create_task(self, reminder: reminders.Reminder) -> None:
+    async def create_task(self, reminder: reminders.Reminder, payload: ReminderPayload) -> None:
         """Creates a new background task"""
         await self.delete_task(reminder.task_name)
-        task = self.bot.loop.create_task(self.background_task(reminder))
+        task = self.bot.loop.create_task(self.background_task(reminder, payload))
         running_tasks[reminder.task_name] = task
 
     async def delete_task(self, task_name: str) -> None:
@@ -136,7 +225,18 @@ class TasksCog(commands.Cog):
     # Events
     @commands.Cog.listener()
     async def on_ready(self) -> None:
-        """Fires when bot has finished starting"""
+        """Fires when bot has finished starting. Also fires after reconnects, so the startup only runs once."""
+        if self.startup_complete: return
+        self.startup_complete = True
+        start_time = time.monotonic()
+        try:
+            reminder_count = await reminders.rehydrate_reminders()
+            logs.logger.info(
+                f'Rehydrated {reminder_count:,} pending reminders in {time.monotonic() - start_time:.3f} seconds.'
+            )
+        except Exception as error:
+            await errors.log_error(f'Error rehydrating reminders on startup: {error}')
+        cpu.start()
         reminders.schedule_reminders.start()
         self.delete_old_reminders.start()
         self.schedule_tasks.start()
@@ -148,14 +248,31 @@ class TasksCog(commands.Cog):
     @tasks.loop(seconds=0.5)
     async def schedule_tasks(self):
         """Task that creates or deletes tasks from scheduled reminders.
-        Reminders that fire at the same second for the same user in the same channel are combined into one task.
+        All reminders scheduled since the last run are prepared together (see prepare_reminders).
+        Reminders that fire within settings.REMINDER_DELIVERY_WINDOW for the same user in the same channel are
+        combined into one message (see deliver_reminder).
         """
         for reminder in reminders.scheduled_for_deletion.copy().values():
             reminders.scheduled_for_deletion.pop(reminder.task_name, None)
             await self.delete_task(reminder.task_name)
-        for reminder in reminders.scheduled_for_tasks.copy().values():
-            reminders.scheduled_for_tasks.pop(reminder.task_name, None)
-            await self.create_task(reminder)
+        if not reminders.scheduled_for_tasks: return
+        reminder_list = list(reminders.scheduled_for_tasks.values())
+        try:
+            payloads = await self.prepare_reminders(reminder_list)
+        except Exception as error:
+            # The reminders stay scheduled, so the next run tries again
+            await errors.log_error(error)
+            return
+        for reminder in reminder_list:
+            # Reminders that were scheduled again while preparing are kept for the next run
+            if reminders.scheduled_for_tasks.get(reminder.task_name, None) is reminder:
+                del reminders.scheduled_for_tasks[reminder.task_name]
+        for reminder in reminder_list:
+            payload = payloads.get(reminder.task_name, None)
+            if payload is not None:
+                await self.create_task(reminder, payload)
+            else:
+                await self.delete_task(reminder.task_name)
 
     @tasks.loop(minutes=2.0)
     async def delete_old_reminders(self) -> None:
@@ -183,19 +300,17 @@ class TasksCog(commands.Cog):
         """Task that consolidates tracking log entries older than 28 days into summaries"""
         start_time = utils.utcnow().replace(microsecond=0)
         if start_time.hour == 0 and start_time.minute == 0:
-            log_entry_count = 0
             try:
                 old_log_entries = await tracking.get_old_log_entries(28)
             except exceptions.NoDataFoundError:
                 logs.logger.info('Didn\'t find any log entries to consolidate.')
                 return
-            entries = {}
-            for log_entry in old_log_entries:
-                date_time = log_entry.date_time.replace(hour=23, minute=59, second=59, microsecond=999999)
-                key = (log_entry.user_id, log_entry.guild_id, log_entry.text, date_time)
-                amount = entries.get(key, 0)
-                entries[key] = amount + log_entry.amount
-                log_entry_count += 1
+            log_entries = [
+                (log_entry.user_id, log_entry.guild_id, log_entry.text, log_entry.date_time, log_entry.amount)
+                for log_entry in old_log_entries
+            ]
+            log_entry_count = len(log_entries)
+            entries = await cpu.run(tracking.summarize_log_entries, log_entries, timeout=300)
             for key, amount in entries.items():
                 user_id, guild_id, command, date_time = key
                 summary_log_entry = await tracking.insert_log_summary(user_id, guild_id, command, date_time, amount)
@@ -217,9 +332,10 @@ class TasksCog(commands.Cog):
             time_passed = end_time - start_time
             logs.logger.info(f'Consolidated {log_entry_count:,} log entries in {format_timespan(time_passed)}.')
 
-    @tasks.loop(minutes=10)
+    @tasks.loop(minutes=1)
     async def delete_old_messages_from_cache(self) -> None:
-        """Task that deletes messages from the message cache that are older than 10 minutes"""
+        """Task that deletes messages from the message cache that are older than 10 minutes.
+        Runs every minute, as a run only costs as much as the messages that expire."""
         deleted_messages_count = await messages.delete_old_messages(timedelta(minutes=10))
         if settings.DEBUG_MODE:
             logs.logger.debug(f'Deleted {deleted_messages_count} messages from message cache.')
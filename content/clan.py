@@ -2,14 +2,17 @@
 """Contains clan commands"""
 
 from datetime import datetime, timezone
-from typing import Optional, Tuple, Union
+from typing import Dict, Optional, Tuple, Union
 
 import discord
 from discord import utils
 from discord.ext import commands
 
 from database import clans, users, upgrades, workers
-from resources import emojis, exceptions, settings, strings, views
+from resources import cpu, emojis, exceptions, settings, strings, views
+
+
+INLINE_CLAN_MEMBERS = 100 # Bigger member lists are built in the CPU pool
 
 
 # --- Commands ---
@@ -68,19 +71,10 @@ async def embeds_clan_members(clan_settings: clans.Clan, current_view: Optional[
                 members_no_upgrades.append(clan_member)
                 continue
             try:
-                member_workers = await workers.get_user_workers(clan_member.user_id)
+                workers_power = await workers.get_user_workers_power(clan_member.user_id)
             except exceptions.NoDataFoundError:
                 members_no_workers.append(clan_member)
                 continue
-            worker_levels = {member_worker.worker_name: member_worker.worker_level for member_worker in member_workers}
-            workers_power = {}
-            for worker_name, worker_level in worker_levels.items():
-                worker_power = (
-                    ((strings.WORKER_STATS[worker_name]['speed'] + strings.WORKER_STATS[worker_name]['strength']
-                        + strings.WORKER_STATS[worker_name]['intelligence']))
-                    * (1 + (strings.WORKER_STATS[worker_name]['tier']) / 2.5) * (1 + worker_level / 1.25)
-                )
-                workers_power[worker_name] = worker_power
             workers_by_power = dict(sorted(workers_power.items(), key=lambda x:x[1], reverse=True))
             top_3_count = 1
             top_3_power = 0
@@ -148,35 +142,9 @@ async def embeds_clan_members(clan_settings: clans.Clan, current_view: Optional[
     if overview is not None:
         embed.add_field(name='Overview', value=overview)
     if members:
-        members = dict(sorted(members.items(), key=lambda x:x[1][sort_key], reverse=True))
-        for member_id, member_data in members.items():
-            index = (
-                f'{list(members.keys()).index(member_id) + 1}.'.rjust(3,'0')
-            )
-            if current_view == 0:
-                member_power_str = f' {round(member_data["top_3_power"],2):,g}'.rjust(8)
-                member_teamfarm_life_level_str = f' {member_data["teamfarm_life"]}'
-                field_value = (
-                    f'`{index}`| **`{member_power_str}`**💥 `Lv{member_teamfarm_life_level_str}`{emojis.IDLONS} <@{member_id}>'
-                )
-            elif current_view == 1:
-                guild_seals_inventory_str = f' {member_data["guild_seals_inventory"]:,}'.rjust(5)
-                guild_seals_contributed_str = f' {member_data["guild_seals_contributed"]:,}'.rjust(5)
-                field_value = (
-                    f'`{index}`| **`{guild_seals_contributed_str}`**{emojis.GUILD_SEAL_CONTRIBUTED} '
-                    f'**`{guild_seals_inventory_str}`**{emojis.GUILD_SEAL_INVENTORY} <@{member_id}>'
-                )
-            elif current_view == 2:
-                last_claim_time_timestamp = 'Never'
-                if member_data['last_claim_time'] > datetime(1970, 1, 1, tzinfo=timezone.utc):
-                    last_claim_time_timestamp = utils.format_dt(member_data['last_claim_time'], 'R')
-                field_value = (
-                    f'`{index}`| {last_claim_time_timestamp} <@{member_id}>'
-                )    
-            if len(fields_members[field_no]) + len(field_value) > 1020:
-                field_no += 1
-                fields_members[field_no] = ''
-            fields_members[field_no] = f'{fields_members[field_no]}\n{field_value}'
+        fields_members = await cpu.run(
+            get_member_fields, members, sort_key, current_view, inline=len(members) <= INLINE_CLAN_MEMBERS
+        )
     else:
         embed.add_field(name='Members', value='_No registered members found._', inline=False)
     for field_no, field in fields_members.items():
@@ -293,4 +261,53 @@ async def embeds_clan_members(clan_settings: clans.Clan, current_view: Optional[
         for embed in embeds:
             embed.set_image(url=image_url)
 
-    return embeds
\ No newline at end of file
+    return embeds
+
+
+# --- Functions ---
+def get_member_fields(members: Dict[int, Dict], sort_key: str, current_view: int) -> Dict[int, str]:
+    """Returns the member list of a clan, split into fields of at most 1020 characters. Only takes and returns plain
+    data, so it can run in the CPU pool (see resources.cpu).
+
+    Arguments
+    ---------
+    members: Dict[user_id: member_data]
+    sort_key: The key in member_data the list is sorted by (descending)
+    current_view: 0 for top 3 power, 1 for guild seals, 2 for last claim time
+
+    Returns
+    -------
+    Dict[field_no: field_value], starting at 1
+    """
+    field_no = 1
+    fields_members = {field_no: ''}
+    members = sorted(members.items(), key=lambda x:x[1][sort_key], reverse=True)
+    for member_index, (member_id, member_data) in enumerate(members):
+        index = (
+            f'{member_index + 1}.'.rjust(3,'0')
+        )
+        if current_view == 0:
+            member_power_str = f' {round(member_data["top_3_power"],2):,g}'.rjust(8)
+            member_teamfarm_life_level_str = f' {member_data["teamfarm_life"]}'
+            field_value = (
+                f'`{index}`| **`{member_power_str}`**💥 `Lv{member_teamfarm_life_level_str}`{emojis.IDLONS} <@{member_id}>'
+            )
+        elif current_view == 1:
+            guild_seals_inventory_str = f' {member_data["guild_seals_inventory"]:,}'.rjust(5)
+            guild_seals_contributed_str = f' {member_data["guild_seals_contributed"]:,}'.rjust(5)
+            field_value = (
+                f'`{index}`| **`{guild_seals_contributed_str}`**{emojis.GUILD_SEAL_CONTRIBUTED} '
+                f'**`{guild_seals_inventory_str}`**{emojis.GUILD_SEAL_INVENTORY} <@{member_id}>'
+            )
+        elif current_view == 2:
+            last_claim_time_timestamp = 'Never'
+            if member_data['last_claim_time'] > datetime(1970, 1, 1, tzinfo=timezone.utc):
+                last_claim_time_timestamp = utils.format_dt(member_data['last_claim_time'], 'R')
+            field_value = (
+                f'`{index}`| {last_claim_time_timestamp} <@{member_id}>'
+            )    
+        if len(fields_members[field_no]) + len(field_value) > 1020:
+            field_no += 1
+            fields_members[field_no] = ''
+        fields_members[field_no] = f'{fields_members[field_no]}\n{field_value}'
+    return fields_members
@@ -9,7 +9,7 @@ from typing import List, Optional
 import discord
 from discord import utils
 
-from database import clans, guilds, reminders, tracking, users
+from database import clans, guilds, reminders, tracking, users, workers
 from resources import emojis, exceptions, functions, settings, strings, views
 
 
@@ -195,7 +195,7 @@ async def command_purge_data(bot: discord.Bot, ctx: discord.ApplicationContext)
                 interaction, content='Purging worker data...',
                 view=None
             )
-            cur.execute('DELETE FROM user_workers WHERE user_id=?', (ctx.author.id,))
+            await workers.delete_user_workers(ctx.author.id)
             await asyncio.sleep(1)
             await functions.edit_interaction(
                 interaction, content='Purging upgrade data...',
@@ -7,7 +7,7 @@ import discord
 from discord.ext import commands
 
 from database import users, workers
-from resources import emojis, exceptions, functions, settings, strings
+from resources import emojis, exceptions, functions, power, settings, strings
 
 
 # --- Commands ---
@@ -52,14 +52,7 @@ async def embed_workers_list(ctx: Union[discord.ApplicationContext, commands.Con
                              user_workers: List[workers.UserWorker]) -> discord.Embed:
     """Workers list embed"""
     worker_levels = {user_worker.worker_name: user_worker.worker_level for user_worker in user_workers}
-    workers_power = {}
-    for worker_name, worker_level in worker_levels.items():
-        worker_power = (
-            ((strings.WORKER_STATS[worker_name]['speed'] + strings.WORKER_STATS[worker_name]['strength']
-                + strings.WORKER_STATS[worker_name]['intelligence']))
-            * (1 + (strings.WORKER_STATS[worker_name]['tier']) / 2.5) * (1 + worker_level / 1.25)
-        )
-        workers_power[worker_name] = worker_power
+    workers_power = power.score_roster(worker_levels)
     workers_by_type = {}
     for worker_type in strings.WORKER_TYPES:
         if worker_type in workers_power:
@@ -5,7 +5,7 @@
 from dataclasses import dataclass
 import itertools
 import sqlite3
-from typing import List, Tuple, Union
+from typing import Dict, List, Tuple, Union
 
 import discord
 from discord.ext import commands
@@ -15,6 +15,11 @@ from database import errors
 from resources import exceptions, settings, strings
 
 
+# Guild id -> prefix. The prefix is needed for every user message, so it is only read from the database once per guild
+# and then kept up to date by _update_guild.
+_prefix_cache: Dict[int, str] = {}
+
+
 # Containers
 class EventPing(NamedTuple):
     name: str
@@ -139,33 +144,44 @@ async def get_all_prefixes(bot: commands.Bot, ctx: commands.Context) -> Tuple:
     ------
     sqlite3.Error if something happened within the database.  Also logs this error to the database.
     """
+    prefix = await get_prefix(ctx.guild.id)
+    prefixes = await _get_mixed_case_prefixes(prefix)
+    return commands.when_mentioned_or(*prefixes)(bot, ctx)
+
+
+async def get_prefix(guild_id: int) -> str:
+    """Gets the prefix of a guild. The prefix is cached after the first call. If no prefix is found, a record for the
+    guild is created with the default prefix.
+
+    Returns
+    -------
+    The prefix: str
+
+    Raises
+    ------
+    sqlite3.Error if something happened within the database.  Also logs this error to the database.
+    """
+    prefix = _prefix_cache.get(guild_id, None)
+    if prefix is not None: return prefix
     table = 'guilds'
-    function_name = 'get_all_prefixes'
+    function_name = 'get_prefix'
     sql = f'SELECT prefix FROM {table} WHERE guild_id=?'
-    guild_id = ctx.guild.id    
     try:
         cur = settings.DATABASE.cursor()
         cur.execute(sql, (guild_id,))
         record = cur.fetchone()
-        prefixes = []
-        if record:
-            prefix_db = record['prefix'].replace('"','')
-            prefix_db_mixed_case = await _get_mixed_case_prefixes(prefix_db)
-            for prefix in prefix_db_mixed_case:
-                prefixes.append(prefix)
-        else:
-            await insert_guild(guild_id)
-            prefix_default_mixed_case = await _get_mixed_case_prefixes(settings.DEFAULT_PREFIX)
-            for prefix in prefix_default_mixed_case:
-                prefixes.append(prefix)
     except sqlite3.Error as error:
         await errors.log_error(
-            strings.INTERNAL_ERROR_SQLITE3.format(error=error, table=table, function=function_name, sql=sql),
-            ctx
+            strings.INTERNAL_ERROR_SQLITE3.format(error=error, table=table, function=function_name, sql=sql)
         )
         raise
-
-    return commands.when_mentioned_or(*prefixes)(bot, ctx)
+    if record:
+        prefix = record['prefix'].replace('"','')
+    else:
+        await insert_guild(guild_id)
+        prefix = settings.DEFAULT_PREFIX
+    _prefix_cache[guild_id] = prefix
+    return prefix
 
 
 async def get_guild(guild_id: int) -> Guild:
@@ -245,6 +261,7 @@ async def _update_guild(guild_id: int, **kwargs) -> None:
             strings.INTERNAL_ERROR_SQLITE3.format(error=error, table=table, function=function_name, sql=sql)
         )
         raise
+    if 'prefix' in kwargs: _prefix_cache[guild_id] = kwargs['prefix'].replace('"','')
 
 
 async def insert_guild(guild_id: int) -> Guild:
@@ -118,6 +118,48 @@ async def schedule_reminders():
         )
 
 
+async def rehydrate_reminders() -> int:
+    """Schedules all reminders that were missed within the last settings.REMINDER_REHYDRATION_GRACE seconds or are
+    due within the scheduling horizon, plus the triggered reminders that are not due yet.
+    Reminders that were triggered before a restart had their task die with the old process, so this needs to run
+    once on startup, before schedule_reminders starts. Triggered reminders that are already overdue are not sent
+    again, as they may have been sent before the restart.
+
+    Returns
+    -------
+    Amount of scheduled reminders: int
+
+    Raises
+    ------
+    sqlite3.Error if something happened within the database.
+    LookupError if something goes wrong reading the dict.
+    Also logs all errors to the database.
+    """
+    try:
+        pending_reminders = await get_pending_reminders(settings.REMINDER_REHYDRATION_GRACE)
+    except exceptions.NoDataFoundError:
+        return 0
+    function_name = 'rehydrate_reminders'
+    current_time = utils.utcnow().replace(microsecond=0)
+    start_time_str = (current_time - timedelta(seconds=settings.REMINDER_REHYDRATION_GRACE)).isoformat(sep=' ')
+    end_time_str = (current_time + timedelta(seconds=15)).isoformat(sep=' ')
+    for table in ('user_reminders', 'clan_reminders'):
+        sql = f'UPDATE {table} SET triggered=? WHERE triggered=? AND end_time BETWEEN ? AND ?'
+        try:
+            cur = settings.DATABASE.cursor()
+            cur.execute(sql, (True, False, start_time_str, end_time_str))
+        except sqlite3.Error as error:
+            await errors.log_error(
+                strings.INTERNAL_ERROR_SQLITE3.format(error=error, table=table, function=function_name, sql=sql)
+            )
+            raise
+    for reminder in pending_reminders:
+        reminder.triggered = True
+        scheduled_for_tasks[reminder.task_name] = reminder
+
+    return len(pending_reminders)
+
+
 # Miscellaneous functions
 async def _dict_to_reminder(record: dict) -> Reminder:
     """Creates a Reminder object from a database record
@@ -410,6 +452,68 @@ async def get_due_clan_reminders(clan_name: Optional[str] = None) -> Tuple[Remin
     return tuple(reminders)
 
 
+async def get_pending_reminders(grace: int) -> Tuple[Reminder]:
+    """Gets all user and clan reminders in one query that are not triggered and have an end time between "grace"
+    seconds in the past and 15 seconds in the future. Unlike get_due_user_reminders and get_due_clan_reminders, this
+    also includes triggered reminders with an end time in the future, as these can't have been sent yet.
+
+    Arguments
+    ---------
+    grace: Amount of seconds an end time can be in the past.
+
+    Returns
+    -------
+    Tuple[Reminder]
+
+    Raises
+    ------
+    sqlite3.Error if something happened within the database.
+    exceptions.NoDataFoundError if no reminder was found.
+    LookupError if something goes wrong reading the dict.
+    Also logs all errors to the database.
+    """
+    table = 'user_reminders, clan_reminders'
+    function_name = 'get_pending_reminders'
+    condition = (
+        '(triggered = 0 AND end_time BETWEEN :start_time AND :end_time) '
+        'OR (triggered = 1 AND end_time BETWEEN :current_time AND :end_time)'
+    )
+    sql = (
+        'SELECT user_id, activity, channel_id, custom_id, NULL AS clan_name, end_time, message, triggered '
+        f'FROM user_reminders WHERE {condition} '
+        'UNION ALL '
+        'SELECT NULL, \'clan\', NULL, NULL, clan_name, end_time, message, triggered '
+        f'FROM clan_reminders WHERE {condition}'
+    )
+    try:
+        cur = settings.DATABASE.cursor()
+        current_time = utils.utcnow().replace(microsecond=0)
+        start_time = current_time - timedelta(seconds=grace)
+        end_time = current_time + timedelta(seconds=15)
+        cur.execute(
+            sql,
+            {
+                'start_time': start_time.isoformat(sep=' '),
+                'current_time': current_time.isoformat(sep=' '),
+                'end_time': end_time.isoformat(sep=' '),
+            }
+        )
+        records = cur.fetchall()
+    except sqlite3.Error as error:
+        await errors.log_error(
+            strings.INTERNAL_ERROR_SQLITE3.format(error=error, table=table, function=function_name, sql=sql)
+        )
+        raise
+    if not records:
+        raise exceptions.NoDataFoundError('No pending reminders found in database.')
+    reminders = []
+    for record in records:
+        reminder = await _dict_to_reminder(dict(record))
+        reminders.append(reminder)
+
+    return tuple(reminders)
+
+
 async def get_old_user_reminders(user_id: Optional[int] = None) -> Tuple[Reminder]:
     """Gets all reminders for all users or - if the argument user_id is set - for one user that are have an end time
     more than 20 seconds in the past.
@@ -5,7 +5,7 @@
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 import sqlite3
-from typing import NamedTuple, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 from discord import utils
 
@@ -118,6 +118,27 @@ async def _dict_to_log_entry(record: dict) -> LogEntry:
     return log_entry
 
 
+def summarize_log_entries(log_entries: List[Tuple[int, int, str, datetime, int]]
+                          ) -> Dict[Tuple[int, int, str, datetime], int]:
+    """Sums up log entries per user, guild, text and day. Only takes and returns plain data, so it can run in the CPU
+    pool (see resources.cpu).
+
+    Arguments
+    ---------
+    log_entries: List[Tuple[user_id, guild_id, text, date_time, amount]]
+
+    Returns
+    -------
+    Dict[Tuple[user_id, guild_id, text, end of day]: amount]
+    """
+    entries = {}
+    for user_id, guild_id, text, date_time, amount in log_entries:
+        date_time = date_time.replace(hour=23, minute=59, second=59, microsecond=999999)
+        key = (user_id, guild_id, text, date_time)
+        entries[key] = entries.get(key, 0) + amount
+    return entries
+
+
 # Read Data
 async def get_log_entry(user_id: int, guild_id: int, text: str, date_time: datetime,
                         entry_type: Optional[str] = 'single') -> LogEntry:
@@ -3,7 +3,7 @@
 
 from dataclasses import dataclass
 import sqlite3
-from typing import Tuple
+from typing import Dict, Tuple
 
 from database import errors
 from resources import exceptions, settings, strings
@@ -244,4 +244,44 @@ async def insert_upgrade(user_id: int, name: str, level: int, sort_index: int) -
         raise
     upgrade = await get_upgrade(user_id, name)
 
-    return upgrade
\ No newline at end of file
+    return upgrade
+
+
+async def upsert_upgrades(user_id: int, user_upgrades: Dict[str, Tuple[int, int]]) -> int:
+    """Inserts or updates all given upgrades of a user in one transaction. Upgrades that didn't change aren't written.
+
+    Arguments
+    ---------
+    user_id: int
+    user_upgrades: Dict[name: (level, sort_index)]
+
+    Returns
+    -------
+    The amount of upgrades that were inserted or changed.
+
+    Raises
+    ------
+    sqlite3.Error if something happened within the database. Nothing is written in that case.
+    Also logs all errors to the database.
+    """
+    function_name = 'upsert_upgrades'
+    table = 'user_upgrades'
+    sql = (
+        f'INSERT INTO {table} (user_id, name, level, sort_index) VALUES (?, ?, ?, ?) '
+        f'ON CONFLICT (user_id, name) DO UPDATE SET level = excluded.level, sort_index = excluded.sort_index '
+        f'WHERE level != excluded.level OR sort_index != excluded.sort_index'
+    )
+    records = [(user_id, name, level, sort_index) for name, (level, sort_index) in user_upgrades.items()]
+    try:
+        cur = settings.DATABASE.cursor()
+        cur.execute('BEGIN')
+        cur.executemany(sql, records)
+        changed_upgrades = cur.rowcount
+        cur.execute('COMMIT')
+    except sqlite3.Error as error:
+        if settings.DATABASE.in_transaction: settings.DATABASE.rollback()
+        await errors.log_error(
+            strings.INTERNAL_ERROR_SQLITE3.format(error=error, table=table, function=function_name, sql=sql)
+        )
+        raise
+    return changed_upgrades
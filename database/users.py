@@ -4,7 +4,7 @@
 from dataclasses import dataclass
 from datetime import datetime
 import sqlite3
-from typing import NamedTuple, Tuple
+from typing import Iterable, NamedTuple, Tuple
 
 from database import errors
 from resources import exceptions, settings, strings
@@ -291,6 +291,50 @@ async def get_all_users() -> Tuple[User]:
     return tuple(users)
 
 
+async def get_users(user_ids: Iterable[int]) -> Tuple[User]:
+    """Gets the user settings of multiple users in as few queries as possible.
+
+    Arguments
+    ---------
+    user_ids: IDs of the users to load. Users without a record are not included in the result.
+
+    Returns
+    -------
+    Tuple with User objects
+
+    Raises
+    ------
+    sqlite3.Error if something happened within the database.
+    exceptions.FirstTimeUserError if none of the users was found.
+    LookupError if something goes wrong reading the dict.
+    Also logs all errors to the database.
+    """
+    table = 'users'
+    function_name = 'get_users'
+    user_ids = list(set(user_ids))
+    records = []
+    for index in range(0, len(user_ids), 500):
+        user_ids_chunk = user_ids[index:index+500]
+        sql = f'SELECT * FROM {table} WHERE user_id IN ({",".join("?" * len(user_ids_chunk))})'
+        try:
+            cur = settings.DATABASE.cursor()
+            cur.execute(sql, user_ids_chunk)
+            records += cur.fetchall()
+        except sqlite3.Error as error:
+            await errors.log_error(
+                strings.INTERNAL_ERROR_SQLITE3.format(error=error, table=table, function=function_name, sql=sql)
+            )
+            raise
+    if not records:
+        raise exceptions.FirstTimeUserError(f'No user data found in database for users "{user_ids}".')
+    users = []
+    for record in records:
+        user = await _dict_to_user(dict(record))
+        users.append(user)
+
+    return tuple(users)
+
+
 async def get_user_count() -> int:
     """Gets the amount of users in the table "users".
 
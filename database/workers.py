@@ -2,12 +2,20 @@
 """Provides access to the tables "user_workers" and "worker_levels" in the database"""
 
 from argparse import ArgumentError
+from collections import OrderedDict
 from dataclasses import dataclass
 import sqlite3
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 
 from database import errors
-from resources import exceptions, settings, strings
+from resources import exceptions, power, settings, strings
+
+
+# User id -> power of all workers of the user (Dict[worker_name: worker_power]). Entries are removed when a worker of
+# the user is updated, inserted or deleted.
+_ROSTER_CACHE = OrderedDict()
+_ROSTER_CACHE_SIZE = 10_000
+_roster_cache_stats = {'hits': 0, 'misses': 0}
 
 
 # Containers
@@ -218,6 +226,45 @@ async def get_user_workers(user_id: int) -> Tuple[UserWorker]:
     return tuple(user_workers)
 
 
+async def get_user_workers_power(user_id: int) -> Dict[str, float]:
+    """Gets the power of all workers of a user. Rosters are cached until a worker of the user changes.
+
+    Arguments
+    ---------
+    user_id: int
+
+    Returns
+    -------
+    Dict[worker_name: worker_power]. This is a copy, changing it doesn't change the cache.
+
+    Raises
+    ------
+    sqlite3.Error if something happened within the database.
+    exceptions.NoDataFoundError if no worker was found.
+    LookupError if something goes wrong reading the dict.
+    Also logs all errors to the database.
+    """
+    workers_power = _ROSTER_CACHE.get(user_id, None)
+    if workers_power is not None:
+        _roster_cache_stats['hits'] += 1
+        _ROSTER_CACHE.move_to_end(user_id)
+        return dict(workers_power)
+    _roster_cache_stats['misses'] += 1
+    user_workers = await get_user_workers(user_id)
+    workers_power = power.score_roster(
+        {user_worker.worker_name: user_worker.worker_level for user_worker in user_workers}
+    )
+    _ROSTER_CACHE[user_id] = workers_power
+    while len(_ROSTER_CACHE) > _ROSTER_CACHE_SIZE:
+        _ROSTER_CACHE.popitem(last=False)
+    return dict(workers_power)
+
+
+def get_roster_cache_stats() -> Dict[str, int]:
+    """Returns the size of the roster cache and its hits and misses"""
+    return {'size': len(_ROSTER_CACHE), **_roster_cache_stats}
+
+
 async def get_worker_level(level: Optional[int] = None, workers_required: Optional[int] = None) -> WorkerLevel:
     """Gets worker level data for a worker level.
 
@@ -342,6 +389,7 @@ async def _update_user_worker(user_worker: UserWorker, **kwargs) -> None:
             strings.INTERNAL_ERROR_SQLITE3.format(error=error, table=table, function=function_name, sql=sql)
         )
         raise
+    _ROSTER_CACHE.pop(user_worker.user_id, None)
 
 
 async def _update_worker_level(worker_level: WorkerLevel, **kwargs) -> None:
@@ -422,11 +470,125 @@ async def insert_user_worker(user_id: int, worker_name: str, worker_level: int,
             strings.INTERNAL_ERROR_SQLITE3.format(error=error, table=table, function=function_name, sql=sql)
         )
         raise
+    _ROSTER_CACHE.pop(user_id, None)
     user_worker = await get_user_worker(user_id, worker_name)
 
     return user_worker
 
 
+async def delete_user_workers(user_id: int) -> None:
+    """Deletes all workers of a user.
+
+    Arguments
+    ---------
+    user_id: int
+
+    Raises
+    ------
+    sqlite3.Error if something happened within the database.
+    Also logs all errors to the database.
+    """
+    function_name = 'delete_user_workers'
+    table = 'user_workers'
+    sql = f'DELETE FROM {table} WHERE user_id=?'
+    try:
+        cur = settings.DATABASE.cursor()
+        cur.execute(sql, (user_id,))
+    except sqlite3.Error as error:
+        await errors.log_error(
+            strings.INTERNAL_ERROR_SQLITE3.format(error=error, table=table, function=function_name, sql=sql)
+        )
+        raise
+    _ROSTER_CACHE.pop(user_id, None)
+
+
+async def upsert_user_workers(user_id: int, user_workers: Dict[str, Tuple[int, int]]) -> int:
+    """Inserts or updates all given workers of a user in one transaction. Workers that didn't change aren't written.
+
+    Arguments
+    ---------
+    user_id: int
+    user_workers: Dict[worker_name: (worker_level, worker_amount)]
+
+    Returns
+    -------
+    The amount of workers that were inserted or changed.
+
+    Raises
+    ------
+    sqlite3.Error if something happened within the database. Nothing is written in that case.
+    Also logs all errors to the database.
+    """
+    function_name = 'upsert_user_workers'
+    table = 'user_workers'
+    sql = (
+        f'INSERT INTO {table} (user_id, worker_name, worker_level, worker_amount) VALUES (?, ?, ?, ?) '
+        f'ON CONFLICT (user_id, worker_name) DO UPDATE SET '
+        f'worker_level = excluded.worker_level, worker_amount = excluded.worker_amount '
+        f'WHERE worker_level != excluded.worker_level OR worker_amount != excluded.worker_amount'
+    )
+    records = [
+        (user_id, worker_name, worker_level, worker_amount)
+        for worker_name, (worker_level, worker_amount) in user_workers.items()
+    ]
+    try:
+        cur = settings.DATABASE.cursor()
+        cur.execute('BEGIN')
+        cur.executemany(sql, records)
+        changed_workers = cur.rowcount
+        cur.execute('COMMIT')
+    except sqlite3.Error as error:
+        if settings.DATABASE.in_transaction: settings.DATABASE.rollback()
+        await errors.log_error(
+            strings.INTERNAL_ERROR_SQLITE3.format(error=error, table=table, function=function_name, sql=sql)
+        )
+        raise
+    if changed_workers > 0: _ROSTER_CACHE.pop(user_id, None)
+    return changed_workers
+
+
+async def upsert_worker_levels(worker_levels: Dict[int, int]) -> None:
+    """Inserts or updates worker levels in one transaction. Levels that didn't change aren't written.
+
+    Arguments
+    ---------
+    worker_levels: Dict[level: workers_required]
+
+    Raises
+    ------
+    sqlite3.Error if something happened within the database. Nothing is written in that case.
+    Also logs all errors to the database.
+    """
+    function_name = 'upsert_worker_levels'
+    table = 'worker_levels'
+    # The table has no unique index on level, so this can't use ON CONFLICT
+    sql_update = f'UPDATE {table} SET workers_required = ? WHERE level = ? AND workers_required != ?'
+    sql_insert = (
+        f'INSERT INTO {table} (level, workers_required) '
+        f'SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE level = ?)'
+    )
+    sql = sql_update
+    try:
+        cur = settings.DATABASE.cursor()
+        cur.execute('BEGIN')
+        cur.executemany(
+            sql_update,
+            [(workers_required, level, workers_required) for level, workers_required in worker_levels.items()]
+        )
+        sql = sql_insert
+        cur.executemany(
+            sql_insert,
+            [(level, workers_required, level) for level, workers_required in worker_levels.items()]
+        )
+        cur.execute('COMMIT')
+    except sqlite3.Error as error:
+        if settings.DATABASE.in_transaction: settings.DATABASE.rollback()
+        await errors.log_error(
+            strings.INTERNAL_ERROR_SQLITE3.format(error=error, table=table, function=function_name, sql=sql)
+        )
+        raise
+
+
 async def insert_worker_level(level: int, workers_required: int) -> WorkerLevel:
     """Inserts an worker level record.
 
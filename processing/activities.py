@@ -9,7 +9,13 @@ import discord
 
 from cache import messages
 from database import reminders,  users
-from resources import exceptions, functions, regex
+from resources import dispatcher, exceptions, functions, regex
+
+
+SIGNATURES = (
+    dispatcher.Signature('author', ('— cooldowns',)),
+)
+SETTINGS = ()
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -39,7 +45,7 @@ async def update_reminders_from_activities_list(message: discord.Message, embed_
     search_strings = [
         '— cooldowns',
     ]
-    if any(search_string in embed_data['author']['name'].lower() for search_string in search_strings):
+    if any(search_string in embed_data.lower('author') for search_string in search_strings):
         if interaction_user is None:
             user_command_message = (
                 await messages.find_message(message.channel.id, regex.COMMAND_ACTIVITIES)
@@ -56,7 +62,7 @@ async def update_reminders_from_activities_list(message: discord.Message, embed_
         cooldowns = []
         ready_commands = []
         if user_settings.reminder_daily.enabled:
-            timestring_match = re.search(r"daily`\*\* \(\*\*(.+?)\*\*", embed_data['field0']['value'].lower())
+            timestring_match = re.search(r"daily`\*\* \(\*\*(.+?)\*\*", embed_data.lower('field0.value'))
             if timestring_match:
                 user_command = await functions.get_game_command(user_settings, 'daily')
                 reminder_message = user_settings.reminder_daily.message.replace('{command}', user_command)
@@ -64,7 +70,7 @@ async def update_reminders_from_activities_list(message: discord.Message, embed_
             else:
                 ready_commands.append('daily')
         if user_settings.reminder_vote.enabled:
-            timestring_match = re.search(r"vote`\*\* \(\*\*(.+?)\*\*", embed_data['field0']['value'].lower())
+            timestring_match = re.search(r"vote`\*\* \(\*\*(.+?)\*\*", embed_data.lower('field0.value'))
             if timestring_match:
                 user_command = await functions.get_game_command(user_settings, 'vote')
                 reminder_message = user_settings.reminder_vote.message.replace('{command}', user_command)
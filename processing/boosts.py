@@ -9,7 +9,13 @@ from discord import utils
 
 from cache import messages
 from database import clans, reminders, upgrades, users
-from resources import emojis, exceptions, functions, regex, settings, strings, views
+from resources import dispatcher, emojis, exceptions, functions, regex, settings, strings, views
+
+
+SIGNATURES = (
+    dispatcher.Signature('description', ('these are your active boosts',)),
+)
+SETTINGS = ()
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -41,7 +47,7 @@ async def create_reminders_from_boosts(bot: discord.Bot, message: discord.Messag
     search_strings = [
         'these are your active boosts', #English
     ]
-    if any(search_string in embed_data['description'].lower() for search_string in search_strings):
+    if any(search_string in embed_data.lower('description') for search_string in search_strings):
         if user is None:
             user_command_message = (
                 await messages.find_message(message.channel.id, regex.COMMAND_BOOSTS)
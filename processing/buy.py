@@ -6,7 +6,13 @@ from typing import Dict, Optional
 import discord
 
 from database import users
-from resources import exceptions, strings
+from resources import admission, dispatcher, exceptions, strings
+
+
+SIGNATURES = (
+    dispatcher.Signature('content', ('successfully bought',)),
+)
+SETTINGS = ('user.helper_context_enabled',)
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -38,6 +44,7 @@ async def call_context_helper(message: discord.Message, embed_data: Dict, user:
     ]
     if (any(search_string in message.content.lower() for search_string in search_strings)
         and 'idlecoin' in message.content.lower()):
+        if admission.shed_helper(): return add_reaction
         if user is None: user = message.mentions[0]
         if user_settings is None:
             try:
@@ -9,7 +9,13 @@ from discord import utils
 
 from cache import messages
 from database import users
-from resources import exceptions, functions, regex, settings, strings, views
+from resources import dispatcher, exceptions, functions, regex, settings, strings, views
+
+
+SIGNATURES = (
+    dispatcher.Signature('author', ('— claim',)),
+)
+SETTINGS = ()
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User] = None,
@@ -39,11 +45,11 @@ async def process_claim_message(bot: discord.Bot, message: discord.Message, embe
     search_strings = [
         '— claim', #English
     ]
-    if any(search_string in embed_data['author']['name'].lower() for search_string in search_strings):
+    if any(search_string in embed_data.lower('author') for search_string in search_strings):
         if user is None:
             if embed_data['embed_user'] is not None:
                 user = embed_data['embed_user']
-                user_settings = embed_data['embed_user_settings']
+                user_settings = await embed_data['context'].get_embed_user_settings()
             else:
                 user_name_match = re.search(regex.USERNAME_FROM_EMBED_AUTHOR, embed_data['author']['name'])
                 user_name = user_name_match.group(1)
@@ -11,7 +11,14 @@ import pendulum
 
 from cache import messages
 from database import clans, errors, reminders, users
-from resources import exceptions, functions, regex, strings
+from resources import dispatcher, exceptions, functions, regex, strings
+
+
+SIGNATURES = (
+    dispatcher.Signature('footer', ('your guild was raided', 'owner:')),
+    dispatcher.Signature('content', ('successfully contributed to **', '** joined **', 'successfully kicked from **')),
+)
+SETTINGS = ()
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User] = None,
@@ -43,13 +50,13 @@ async def create_clan_reminder(message: discord.Message, embed_data: Dict, clan_
     search_strings = [
         'your guild was raided', #English
     ]
-    if any(search_string in embed_data['footer']['text'].lower() for search_string in search_strings):
+    if any(search_string in embed_data.lower('footer') for search_string in search_strings):
         if clan_settings is None:
             try:
                 clan_settings: clans.Clan = await clans.get_clan_by_clan_name(embed_data['field0']['name'])
             except exceptions.NoDataFoundError:
                 return add_reaction
-        player_count_match = re.search(r'players\*\*: (\d+)\/', embed_data['field0']['value'].lower())
+        player_count_match = re.search(r'players\*\*: (\d+)\/', embed_data.lower('field0.value'))
         player_count = int(player_count_match.group(1))
         if len(clan_settings.members) != player_count:
             await message.reply(
@@ -88,12 +95,12 @@ async def update_clan(bot: discord.Bot, message: discord.Message, embed_data: Di
     search_strings_footer = [
         'owner:', #English
     ]
-    if (any(search_string in embed_data['field0']['name'].lower() for search_string in search_strings_field_name)
-        and any(search_string in embed_data['footer']['text'].lower() for search_string in search_strings_footer)):
+    if (any(search_string in embed_data.lower('field0.name') for search_string in search_strings_field_name)
+        and any(search_string in embed_data.lower('footer') for search_string in search_strings_footer)):
         if user is None:
             if embed_data['embed_user'] is not None:
                 user = embed_data['embed_user']
-                user_settings = embed_data['embed_user_settings']
+                user_settings = await embed_data['context'].get_embed_user_settings()
             else:
                 user_command_message = (
                     await messages.find_message(message.channel.id, regex.COMMAND_CLAN_LIST)
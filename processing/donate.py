@@ -7,7 +7,13 @@ import discord
 
 from cache import messages
 from database import users
-from resources import exceptions, regex, strings
+from resources import dispatcher, exceptions, regex, strings
+
+
+SIGNATURES = (
+    dispatcher.Signature('description', ('if you want to support',)),
+)
+SETTINGS = ()
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -37,7 +43,7 @@ async def update_donor_tier(message: discord.Message, embed_data: Dict, user: Op
     search_strings = [
         'if you want to support', #English
     ]
-    if any(search_string in embed_data['description'].lower() for search_string in search_strings):
+    if any(search_string in embed_data.lower('description') for search_string in search_strings):
         if user is None:
             user_command_message = (
                 await messages.find_message(message.channel.id, regex.COMMAND_DONATE)
@@ -53,7 +59,7 @@ async def update_donor_tier(message: discord.Message, embed_data: Dict, user: Op
         if embed_data['field0']['name'] == '':
             donor_tier = 0
         else:
-            donor_tier_match = re.search(r'\| (.+?) donator', embed_data['field0']['name'].lower())
+            donor_tier_match = re.search(r'\| (.+?) donator', embed_data.lower('field0.name'))
             donor_tier = list(strings.DONOR_TIER_ENERGY_MULTIPLIERS.keys()).index(donor_tier_match.group(1).lower())
         await user_settings.update(donor_tier=donor_tier)
         if user_settings.reactions_enabled: add_reaction = True
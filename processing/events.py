@@ -5,6 +5,18 @@ from typing import Dict
 import discord
 
 from database import guilds
+from resources import dispatcher
+
+
+SIGNATURES = (
+    dispatcher.Signature('field0.name', ('say ohmmm', 'fired from its farm', 'lucky reward!', 'quatrillion of items')),
+)
+SETTINGS = (
+    'guild.event_energy.enabled',
+    'guild.event_hire.enabled',
+    'guild.event_lucky.enabled',
+    'guild.event_packing.enabled',
+)
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, guild_settings: guilds.Guild) -> bool:
@@ -41,10 +53,10 @@ async def send_event_ping(message: discord.Message, embed_data: Dict, guild_sett
         'a lucky reward will be given to one of the players who joins!', #English
         'help to make boxes and get packing xp!', #English
     )
-    if (any(search_string in embed_data['field0']['name'].lower() for search_string in search_strings_name.keys())
-        and any(search_string in embed_data['field0']['value'].lower()for search_string in search_strings_value)):
+    if (any(search_string in embed_data.lower('field0.name') for search_string in search_strings_name.keys())
+        and any(search_string in embed_data.lower('field0.value')for search_string in search_strings_value)):
         for string, event_name in search_strings_name.items():
-            if string in embed_data['field0']['name'].lower():
+            if string in embed_data.lower('field0.name'):
                 event = event_name
                 break
         event_settings = getattr(guild_settings, f'event_{event}', None)
@@ -8,7 +8,13 @@ import discord
 
 from cache import messages
 from database import reminders, users
-from resources import emojis, exceptions, functions, regex, settings, strings
+from resources import dispatcher, emojis, exceptions, functions, regex, settings, strings
+
+
+SIGNATURES = (
+    dispatcher.Signature('content', ('** spooked **', '**candy apple** to **')),
+)
+SETTINGS = ()
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
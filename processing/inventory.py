@@ -7,7 +7,13 @@ import discord
 
 from cache import messages
 from database import users
-from resources import exceptions, regex
+from resources import dispatcher, exceptions, regex
+
+
+SIGNATURES = (
+    dispatcher.Signature('author', ('— inventory',)),
+)
+SETTINGS = ()
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -41,9 +47,9 @@ async def update_inventory(message: discord.Message, embed_data: Dict, interacti
         'wood', #Materials
         '⚠', #Materials in debt
     ]
-    if (any(search_string in embed_data['author']['name'].lower() for search_string in search_strings_author)
-        and any(search_string in embed_data['field0']['name'].lower() for search_string in search_strings_items)
-        and 'page 1' in embed_data['footer']['text'].lower()):
+    if (any(search_string in embed_data.lower('author') for search_string in search_strings_author)
+        and any(search_string in embed_data.lower('field0.name') for search_string in search_strings_items)
+        and 'page 1' in embed_data.lower('footer')):
         if interaction_user is None:
             user_command_message = (
                 await messages.find_message(message.channel.id, regex.COMMAND_INVENTORY)
@@ -60,7 +66,7 @@ async def update_inventory(message: discord.Message, embed_data: Dict, interacti
         inventory_fields = ''
         for field in message.embeds[0].fields:
             inventory_fields = f'{inventory_fields}\n{field.value}'.strip()
-        item_debt = True if '⚠' in embed_data['field0']['name'].lower() else False
+        item_debt = True if '⚠' in embed_data.lower('field0.name') else False
         if 'guild seal' not in inventory_fields.lower():
             if item_debt and user_settings.inventory.guild_seal < 0:
                 guild_seal_count = 0
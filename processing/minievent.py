@@ -9,7 +9,15 @@ import discord
 from cache import messages
 from database import reminders, users
 from database import settings as settings_db
-from resources import emojis, exceptions, functions, regex, strings
+from resources import dispatcher, emojis, exceptions, functions, regex, strings
+
+
+SIGNATURES = (
+    dispatcher.Signature('content', ('successfully bought',)),
+    dispatcher.Signature('field0.name', ('no seasonal event active',)),
+    dispatcher.Signature('field1.value', ('mini events happen 2 times per month',)),
+)
+SETTINGS = ()
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -94,9 +102,9 @@ async def update_minievent_multiplier(embed_data: Dict) -> bool:
     search_strings_value = [
         'mini events happen 2 times per month', #Englishs
     ]
-    if ((any(search_string in embed_data['field0']['name'].lower() for search_string in search_strings_name))
-        or any(search_string in embed_data['field1']['value'].lower() for search_string in search_strings_value)):
-        new_multiplier = 1.2 if 'energy fest' in embed_data['description'].lower() else 1.0
+    if ((any(search_string in embed_data.lower('field0.name') for search_string in search_strings_name))
+        or any(search_string in embed_data.lower('field1.value') for search_string in search_strings_value)):
+        new_multiplier = 1.2 if 'energy fest' in embed_data.lower('description') else 1.0
         all_settings = await settings_db.get_settings()
         if float(all_settings['minievent_energy_multiplier']) != new_multiplier:
             await settings_db.update_setting('minievent_energy_multiplier', str(new_multiplier))
@@ -7,7 +7,16 @@ import discord
 
 from cache import messages
 from database import clans,users, workers, workers
-from resources import exceptions, regex
+from resources import dispatcher, exceptions, regex
+
+
+SIGNATURES = (
+    dispatcher.Signature('author', ('— lootbox',)),
+)
+SETTINGS = (
+    'user.helper_raid_enabled',
+    'clan.helper_teamraid_enabled',
+)
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -37,11 +46,11 @@ async def track_workers_from_lootboxes(message: discord.Message, embed_data: Dic
     search_strings = [
         '— lootbox', #All languages
     ]
-    if any(search_string in embed_data['author']['name'].lower() for search_string in search_strings):
+    if any(search_string in embed_data.lower('author') for search_string in search_strings):
         if user is None:
             if embed_data['embed_user'] is not None:
                 user = embed_data['embed_user']
-                user_settings = embed_data['embed_user_settings']
+                user_settings = await embed_data['context'].get_embed_user_settings()
             else:
                 user_name_match = re.search(regex.USERNAME_FROM_EMBED_AUTHOR, embed_data['author']['name'])
                 user_name = user_name_match.group(1)
@@ -9,7 +9,7 @@ from discord import utils
 
 from cache import messages
 from database import reminders, upgrades, users
-from resources import emojis, exceptions, functions, regex, settings
+from resources import admission, dispatcher, emojis, exceptions, functions, regex, settings
 
 
 UPGRADES_COST = {
@@ -45,6 +45,13 @@ UPGRADES_BONUSES = {
 }
 
 
+SIGNATURES = (
+    dispatcher.Signature('author', ('— payday',)),
+    dispatcher.Signature('description', ("it's payday!",)),
+)
+SETTINGS = ('user.helper_upgrades_enabled',)
+
+
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
                           user_settings: Optional[users.User]) -> bool:
     """Processes the message for all /shop buy related actions.
@@ -76,12 +83,13 @@ async def call_upgrades_helper(message: discord.Message, embed_data: Dict, user:
     search_strings_excluded = [
         'need to progress more', #All languages
     ]
-    if (any(search_string in embed_data['author']['name'].lower() for search_string in search_strings)
-        and all(search_string not in embed_data['description'].lower() for search_string in search_strings_excluded)):
+    if (any(search_string in embed_data.lower('author') for search_string in search_strings)
+        and all(search_string not in embed_data.lower('description') for search_string in search_strings_excluded)):
+        if admission.shed_helper(): return add_reaction
         if user is None:
             if embed_data['embed_user'] is not None:
                 user = embed_data['embed_user']
-                user_settings = embed_data['embed_user_settings']
+                user_settings = await embed_data['context'].get_embed_user_settings()
             else:
                 user_name_match = re.search(regex.USERNAME_FROM_EMBED_AUTHOR, embed_data['author']['name'])
                 user_name = user_name_match.group(1)
@@ -95,7 +103,7 @@ async def call_upgrades_helper(message: discord.Message, embed_data: Dict, user:
             except exceptions.FirstTimeUserError:
                 return add_reaction
         if not user_settings.bot_enabled or not user_settings.helper_upgrades_enabled: return add_reaction
-        idlucks_match = re.search(r'^• ([0-9,]+?) <', embed_data['field1']['value'].lower())
+        idlucks_match = re.search(r'^• ([0-9,]+?) <', embed_data.lower('field1.value'))
         idlucks = int(re.sub(r'\D','', idlucks_match.group(1)))
         idlucks_after_payday = user_settings.idlucks + idlucks
         description = (
@@ -148,7 +156,7 @@ async def update_idlucks_and_raid_shield_on_payday(message: discord.Message, emb
     search_strings = [
         'it\'s payday!', #English
     ]
-    if any(search_string in embed_data['description'].lower() for search_string in search_strings):
+    if any(search_string in embed_data.lower('description') for search_string in search_strings):
         if user is None:
             user_command_message = (
                 await messages.find_message(message.channel.id, regex.COMMAND_PAYDAY)
@@ -159,7 +167,7 @@ async def update_idlucks_and_raid_shield_on_payday(message: discord.Message, emb
         except exceptions.FirstTimeUserError:
             return add_reaction
         if not user_settings.bot_enabled: return add_reaction
-        idlucks_match = re.search(r'got ([0-9,]+?) <', embed_data['description'].lower())
+        idlucks_match = re.search(r'got ([0-9,]+?) <', embed_data.lower('description'))
         idlucks = int(re.sub(r'\D','', idlucks_match.group(1)))
         await user_settings.update(idlucks=idlucks)
         if user_settings.reminder_boosts.enabled:
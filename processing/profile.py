@@ -10,7 +10,13 @@ from discord import utils
 from cache import messages
 from database import clans, reminders, upgrades, users
 from database import settings as settings_db
-from resources import emojis, exceptions, functions, regex, settings, strings, views
+from resources import dispatcher, emojis, exceptions, functions, outbound, regex, settings, strings, views
+
+
+SIGNATURES = (
+    dispatcher.Signature('author', ('— profile',)),
+)
+SETTINGS = ()
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -42,7 +48,7 @@ async def call_profile_timers_and_update_idlucks(bot: discord.Bot, message: disc
     search_strings = [
         '— profile', #English
     ]
-    if any(search_string in embed_data['author']['name'].lower() for search_string in search_strings):
+    if any(search_string in embed_data.lower('author') for search_string in search_strings):
         if interaction_user is None:
             user_command_message = (
                 await messages.find_message(message.channel.id, regex.COMMAND_PROFILE)
@@ -57,7 +63,7 @@ async def call_profile_timers_and_update_idlucks(bot: discord.Bot, message: disc
                 return add_reaction
         if not user_settings.bot_enabled: return add_reaction
         if user_settings.helper_upgrades_enabled:
-            idlucks_match = re.search(r'idlucks\*\*: ([0-9,]+?)\n', embed_data['field3']['value'].lower())
+            idlucks_match = re.search(r'idlucks\*\*: ([0-9,]+?)\n', embed_data.lower('field3.value'))
             idlucks = int(re.sub(r'\D','', idlucks_match.group(1)))
             await user_settings.update(idlucks=idlucks)
         energy_match = re.search(r'> ([0-9,]+)/([0-9,]+)\n', embed_data['field0']['value'])
@@ -218,11 +224,11 @@ async def call_profile_timers_and_update_idlucks(bot: discord.Bot, message: disc
             )
             if user_settings.reminder_energy.enabled:
                 view = views.ProfileTimersView(bot, message, interaction_user, user_settings)
-                interaction = await message.reply(embed=embed, view=view)
+                interaction = await outbound.reply(message, embed=embed, view=view)
                 view.interaction = interaction
                 await view.wait()
             else:
-                await message.reply(embed=embed)
+                await outbound.reply(message, embed=embed)
         if (not user_settings.helper_profile_enabled
             and (user_settings.helper_upgrades_enabled or user_settings.reminder_energy.enabled)):
             add_reaction = True
@@ -1,7 +1,6 @@
 # raid.py
 
 import copy
-import itertools
 import re
 from typing import Dict, Optional, Tuple
 
@@ -10,7 +9,20 @@ from discord import utils
 
 from cache import messages
 from database import users, tracking, workers
-from resources import emojis, exceptions, functions, logs, regex, settings, strings
+from resources import admission, cpu, dispatcher, emojis, exceptions, functions, logs, outbound, power, regex, sessions, settings, solvers, strings
+
+
+SIGNATURES = (
+    dispatcher.Signature('content', ('you need at least',)),
+    dispatcher.Signature('footer', ('farms will be raided in order',)),
+    dispatcher.Signature('description', ('estimated raid worth',)),
+)
+SETTINGS = (
+    'user.tracking_enabled',
+    'user.helper_context_enabled',
+    'user.helper_raid_enabled',
+    'user.reminder_energy.enabled',
+)
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -47,6 +59,7 @@ async def call_context_helper_on_empty_energy(message: discord.Message, embed_da
     ]
     if (any(search_string in message.content.lower() for search_string in search_strings_1)
         and any(search_string in message.content.lower() for search_string in search_strings_2)):
+        if admission.shed_helper(): return add_reaction
         if user is None:
             user = message.mentions[0]
         if user_settings is None:
@@ -94,10 +107,7 @@ async def call_raid_helper(bot: discord.Bot, message: discord.Message, embed_dat
                 enemy_hp_current = int(enemy_data_match.group(3))
                 enemy_hp_max = int(enemy_data_match.group(4))
                 enemy_power = (
-                    (strings.WORKER_STATS[enemy_name]['speed'] + strings.WORKER_STATS[enemy_name]['strength']
-                     + strings.WORKER_STATS[enemy_name]['intelligence'])
-                    * (1 + (strings.WORKER_STATS[enemy_name]['tier']) / 2.5)
-                    * (1 + enemy_level / 1.25) * (enemy_hp_max / 100) / enemy_hp_max * enemy_hp_current
+                    power.get_power(enemy_name, enemy_level) * (enemy_hp_max / 100) / enemy_hp_max * enemy_hp_current
                 )
                 if (enemy_power - 0.5).is_integer():
                     logs.logger.info(f'Worker {enemy_name} at level {enemy_level} has a power of {enemy_power}')
@@ -107,8 +117,7 @@ async def call_raid_helper(bot: discord.Bot, message: discord.Message, embed_dat
 
     async def calculate_best_solution(workers_power: Dict[str, int], enemies_power: Dict[str, int], empty_farms_found: int) -> Tuple[int, Dict[str, int]]:
             """Calculates the best solution for a raid and returns a dictionary with the worker names and their power.
-            The calculation returns the first solution that kills all enemies as there is no point in checking other
-            solutions after that.
+            Solutions are cached (see solvers.solve_raid_cached), raids that aren't cached yet are solved in the CPU pool.
 
             Arguments
             ---------
@@ -121,52 +130,15 @@ async def call_raid_helper(bot: discord.Bot, message: discord.Message, embed_dat
             Tuple with the amount of killed enemies (int) and the solution (Dict[worker_name: worker_power])
 
             """
-            remaining_workers = copy.deepcopy(workers_power)
-            used_workers = {}
-            possible_solutions = []
-            killed_enemies = 0
-            hp_left = 100
-            possible_solutions = list(itertools.permutations(list(remaining_workers.keys())))
-            """
-            for permutation in permutations:
-                possible_solutions.append(list(used_workers.keys()) + list(permutation))
-            """
-            best_solution = []
-            for possible_solution in reversed(possible_solutions):
-                enemies_powers_copy = copy.deepcopy(enemies_power)
-                used_workers = {}
-                for worker_name in possible_solution:
-                    killed_enemies = 0
-                    for enemy_name, enemy_power_hp in enemies_powers_copy.items():
-                        enemy_power, enemy_hp = enemy_power_hp
-                        if enemy_hp == 0: continue
-                        worker_power = workers_power[worker_name]
-                        worker_damage = round(85 * worker_power / enemies_power[enemy_name][0])
-                        hp_remaining = enemy_hp - worker_damage
-                        used_workers[worker_name] = worker_power
-                        if hp_remaining < 0: hp_remaining = 0
-                        power_remaining = enemies_power[enemy_name][0] / 100 * hp_remaining
-                        enemies_powers_copy[enemy_name] = (power_remaining, hp_remaining)
-                        break
-                    for enemy_name, enemy_power_hp in enemies_powers_copy.items():
-                        enemy_power, enemy_hp = enemy_power_hp
-                        if enemy_hp == 0:
-                            killed_enemies += 1
-                            hp_left = 100
-                        elif enemy_hp < enemies_power[enemy_name][1]:
-                            hp_left = enemy_hp
-                    if killed_enemies >= len(enemies_powers_copy.keys()): break
-                if best_solution:
-                    if killed_enemies > best_solution[0]:
-                        best_solution = [killed_enemies, hp_left, possible_solution, used_workers]
-                    if killed_enemies == best_solution[0]:
-                        if hp_left < best_solution[1]:
-                            best_solution = [killed_enemies, hp_left, possible_solution, used_workers]
-                        elif len(used_workers.keys()) < len(best_solution[3].keys()):
-                            best_solution = [killed_enemies, hp_left, possible_solution, used_workers]
-                else:
-                    best_solution = [killed_enemies, hp_left, possible_solution, used_workers]
-            killed_enemies, hp_left, _, used_workers = best_solution
+            fingerprint = solvers.get_raid_fingerprint(workers_power, enemies_power)
+            raid_solution = solvers.get_cached_solution(fingerprint)
+            if raid_solution is None:
+                raid_solution, sub_solutions = await cpu.run(
+                    solvers.solve_raid_with_sub_solutions, workers_power, enemies_power
+                )
+                solvers.add_solutions(fingerprint, raid_solution, sub_solutions)
+            killed_enemies, hp_left, solution = raid_solution
+            used_workers = {worker_name: workers_power[worker_name] for worker_name in solution}
             if empty_farms_found and len(used_workers) < len(workers_power):
                     for worker_name, worker_power in workers_power.items():
                         if worker_name not in used_workers:
@@ -178,12 +150,13 @@ async def call_raid_helper(bot: discord.Bot, message: discord.Message, embed_dat
     search_strings = [
         'farms will be raided in order', #English
     ]
-    if (any(search_string in embed_data['footer']['text'].lower() for search_string in search_strings)
+    if (any(search_string in embed_data.lower('footer') for search_string in search_strings)
         and 'raidpoints' in embed_data['field0']['name']):
+        if admission.shed_helper(): return add_reaction
         if user is None:
             if embed_data['embed_user'] is not None:
                 user = embed_data['embed_user']
-                user_settings = embed_data['embed_user_settings']
+                user_settings = await embed_data['context'].get_embed_user_settings()
             else:
                 user_name_match = re.search(regex.USERNAME_FROM_EMBED_AUTHOR, embed_data['author']['name'])
                 user_name = user_name_match.group(1)
@@ -199,7 +172,7 @@ async def call_raid_helper(bot: discord.Bot, message: discord.Message, embed_dat
         if not user_settings.bot_enabled: return add_reaction
         if user_settings.reminder_energy.enabled:
             try:
-                energy_match = re.search (r'-(\d+) <', embed_data['description'].lower())
+                energy_match = re.search (r'-(\d+) <', embed_data.lower('description'))
                 energy_lost = int(energy_match.group(1))
                 await functions.change_user_energy(user_settings, energy_lost * -1)
                 if user_settings.reactions_enabled: add_reaction = True
@@ -207,14 +180,9 @@ async def call_raid_helper(bot: discord.Bot, message: discord.Message, embed_dat
                 pass
         if not user_settings.helper_raid_enabled: return add_reaction
 
-        def raid_message_check(payload: discord.RawMessageUpdateEvent):
-            try:
-                author_name = payload.data['embeds'][0]['author']['name']
-                components = payload.data['components']
-                return author_name == message.embeds[0].author.name # Temporary workaround for that weird issue
-            except:
-                return False
-        
+        def raid_edit_check(payload: discord.RawMessageUpdateEvent) -> bool:
+            return 'components' in payload.data
+
         embed = discord.Embed(color=settings.EMBED_COLOR)
         msg_error_workers_outdated = (
                 f'Sorry, I can\'t provide any guidance because I don\'t know all of your workers. Please use '
@@ -222,39 +190,30 @@ async def call_raid_helper(bot: discord.Bot, message: discord.Message, embed_dat
                 f'raid.'
             )
         try:
-            user_workers = list(await workers.get_user_workers(user.id))
+            user_workers_power = await workers.get_user_workers_power(user.id)
         except exceptions.NoDataFoundError:
             await message.reply(msg_error_workers_outdated)
             return add_reaction
-        for user_worker in user_workers:
-            if user_worker.worker_name not in strings.WORKER_TYPES_RAID:
-                user_workers.remove(user_worker)
+        for worker_name in user_workers_power:
+            if worker_name not in strings.WORKER_TYPES_RAID:
+                del user_workers_power[worker_name]
                 break
-        worker_levels = {user_worker.worker_name: user_worker.worker_level for user_worker in user_workers}
-        worker_levels_sorted = {}
+        workers_power_sorted = {}
         for worker_type in strings.WORKER_TYPES:
-            if worker_type in worker_levels:
-                worker_levels_sorted[worker_type] = worker_levels[worker_type]
+            if worker_type in user_workers_power:
+                workers_power_sorted[worker_type] = user_workers_power[worker_type]
         workers_found = []
         for row in message.components:
             for button in row.children:
                 worker_name_match = re.search(r'^(.+?)worker', button.emoji.name.lower())
-                if worker_name_match.group(1) not in worker_levels_sorted:
+                if worker_name_match.group(1) not in workers_power_sorted:
                     await message.reply(msg_error_workers_outdated)
                     return add_reaction
                 workers_found.append(worker_name_match.group(1))
-        for worker_name in list(worker_levels_sorted.keys()).copy():
+        for worker_name in list(workers_power_sorted.keys()).copy():
             if worker_name not in workers_found:
-                del worker_levels_sorted[worker_name]
-        workers_power = {}
-        for worker_name, worker_level in worker_levels_sorted.items():
-            worker_power = (
-                ((strings.WORKER_STATS[worker_name]['speed'] + strings.WORKER_STATS[worker_name]['strength']
-                  + strings.WORKER_STATS[worker_name]['intelligence']))
-                * (1 + (strings.WORKER_STATS[worker_name]['tier']) / 2.5) * (1 + worker_level / 1.25)
-            )
-            workers_power[worker_name] = worker_power
-        workers_power = dict(sorted(workers_power.items(), key=lambda x:x[1]))
+                del workers_power_sorted[worker_name]
+        workers_power = dict(sorted(workers_power_sorted.items(), key=lambda x:x[1]))
         workers_power_copy = copy.deepcopy(workers_power)
         if len(workers_power) > 6:
             workers_power = {}
@@ -292,7 +251,7 @@ async def call_raid_helper(bot: discord.Bot, message: discord.Message, embed_dat
             )
         killed_enemies, hp_left, worker_solution = await calculate_best_solution(workers_power, enemies_power, empty_farms_found)
         worker_emojis = {}
-        for worker_name, power in worker_solution.items():
+        for worker_name in worker_solution:
             worker_emojis[worker_name] = getattr(emojis, f'WORKER_{worker_name}_S'.upper(), emojis.WARNING)
         killed_enemies = 'all farms' if killed_enemies >= len(enemies_power.keys()) else f'`{round(killed_enemies,2):g}` farms'
         if hp_left < 100: killed_enemies = f'{killed_enemies} (next at `{hp_left}` HP)'
@@ -314,7 +273,7 @@ async def call_raid_helper(bot: discord.Bot, message: discord.Message, embed_dat
             value = f'{field_solution.strip()}\n_You can kill {killed_enemies}._',
             inline = False
         )
-        message_helper = await message.reply(embed=embed)
+        message_helper = await outbound.reply(message, embed=embed)
         logs.logger.info(
             f'--- Raid guide log ---\n'
             f'User: {user_settings.user_id}\n'
@@ -324,81 +283,85 @@ async def call_raid_helper(bot: discord.Bot, message: discord.Message, embed_dat
             f'Kills: {killed_enemies}\n'
         )
 
-        while True:
-            try:
-                payload = await bot.wait_for('raw_message_edit', check=raid_message_check,
-                                             timeout=settings.INTERACTION_TIMEOUT)
-            except TimeoutError:
+        async def update_raid_guide(session: sessions.Session) -> None:
+            nonlocal empty_farms_found, enemies_power, hp_left, killed_enemies, worker_solution
+            nonlocal worker_solution_remaining, workers_power
+            while True:
+                try:
+                    payload = await session.wait_for_edit()
+                except TimeoutError:
+                    embed.remove_field(0)
+                    embed.insert_field_at(
+                        0,
+                        name = 'Raid guide',
+                        value = '_Timed out._',
+                        inline = False
+                    )
+                    await outbound.edit(message_helper, embed=embed)
+                    break
+                active_component = False
+                message_components = payload.data['components']
+                disabled_workers = []
+                for row in message_components:
+                    for component in row['components']:
+                        disabled = component.get('disabled', False)
+                        if disabled:
+                            worker_name_match = re.search(r'^(.+?)worker', component['emoji']['name'].lower())
+                            disabled_workers.append(worker_name_match.group(1))
+                        else:
+                            active_component = True
+                        
+                solution_still_valid = True
+                workers_still_alive = list(workers_power.keys())
                 embed.remove_field(0)
-                embed.insert_field_at(
-                    0,
-                    name = 'Raid guide',
-                    value = '_Timed out._',
-                    inline = False
-                )
-                await message_helper.edit(embed=embed)
-                break
-            active_component = False
-            message_components = payload.data['components']
-            disabled_workers = []
-            for row in message_components:
-                for component in row['components']:
-                    disabled = component.get('disabled', False)
-                    if disabled:
-                        worker_name_match = re.search(r'^(.+?)worker', component['emoji']['name'].lower())
-                        disabled_workers.append(worker_name_match.group(1))
+                if active_component:
+                    for worker_name in disabled_workers:
+                        if worker_name in workers_still_alive: workers_still_alive.remove(worker_name)
+                        worker_emojis[worker_name] = getattr(emojis, f'WORKER_{worker_name}_DEAD'.upper(), emojis.WARNING)
+                        if (worker_name in worker_solution_remaining and worker_name != worker_solution_remaining[0]) or worker_name not in worker_solution:
+                            solution_still_valid = False
+                    if not solution_still_valid:
+                        workers_power = {worker_name: worker_power for worker_name, worker_power in workers_power.items() if worker_name in workers_still_alive}
+                        empty_farms_found, enemies_power = await read_enemy_farms(message)
+                        killed_enemies, hp_left, worker_solution = await calculate_best_solution(workers_power, enemies_power, empty_farms_found)
+                        worker_solution_remaining = list(worker_solution.keys())
+                        for worker_name, worker_emoji in worker_emojis.copy().items():
+                            if not '_x' in worker_emoji: del worker_emojis[worker_name]
+                        for worker_name in worker_solution:
+                            worker_emojis[worker_name] = getattr(emojis, f'WORKER_{worker_name}_S'.upper(), emojis.WARNING)
+                        killed_enemies = 'all farms' if killed_enemies >= len(enemies_power.keys()) else f'`{round(killed_enemies,2):g}` farms'
+                        if hp_left < 100: killed_enemies = f'{killed_enemies} (next at `{hp_left}` HP)'
                     else:
-                        active_component = True
-                        
-            solution_still_valid = True
-            workers_still_alive = list(workers_power.keys())
-            embed.remove_field(0)
-            if active_component:
-                for worker_name in disabled_workers:
-                    if worker_name in workers_still_alive: workers_still_alive.remove(worker_name)
-                    worker_emojis[worker_name] = getattr(emojis, f'WORKER_{worker_name}_DEAD'.upper(), emojis.WARNING)
-                    if (worker_name in worker_solution_remaining and worker_name != worker_solution_remaining[0]) or worker_name not in worker_solution:
-                        solution_still_valid = False
-                if not solution_still_valid:
-                    workers_power = {worker_name: worker_power for worker_name, worker_power in workers_power.items() if worker_name in workers_still_alive}
-                    empty_farms_found, enemies_power = await read_enemy_farms(message)
-                    killed_enemies, hp_left, worker_solution = await calculate_best_solution(workers_power, enemies_power, empty_farms_found)
-                    worker_solution_remaining = list(worker_solution.keys())
-                    for worker_name, worker_emoji in worker_emojis.copy().items():
-                        if not '_x' in worker_emoji: del worker_emojis[worker_name]
-                    for worker_name, power in worker_solution.items():
-                        worker_emojis[worker_name] = getattr(emojis, f'WORKER_{worker_name}_S'.upper(), emojis.WARNING)
-                    killed_enemies = 'all farms' if killed_enemies >= len(enemies_power.keys()) else f'`{round(killed_enemies,2):g}` farms'
-                    if hp_left < 100: killed_enemies = f'{killed_enemies} (next at `{hp_left}` HP)'
-                else:
-                    if worker_solution_remaining: del worker_solution_remaining[0]
-                field_solution = ''
-                numbering = 0
-                for worker_name, emoji in worker_emojis.items():
-                    if user_settings.helper_raid_names_enabled:
-                        worker_name_str = f'~~{worker_name.capitalize()}~~' if '_x' in emoji.lower() else worker_name.capitalize()
-                        if field_solution == '':
-                            field_solution = f'{numbering}. {emoji} {worker_name_str}'
+                        if worker_solution_remaining: del worker_solution_remaining[0]
+                    field_solution = ''
+                    numbering = 0
+                    for worker_name, emoji in worker_emojis.items():
+                        if user_settings.helper_raid_names_enabled:
+                            worker_name_str = f'~~{worker_name.capitalize()}~~' if '_x' in emoji.lower() else worker_name.capitalize()
+                            if field_solution == '':
+                                field_solution = f'{numbering}. {emoji} {worker_name_str}'
+                            else:
+                                field_solution = f'{field_solution}\n{numbering}. {emoji} {worker_name_str}'
+                            numbering += 1
                         else:
-                            field_solution = f'{field_solution}\n{numbering}. {emoji} {worker_name_str}'
-                        numbering += 1
-                    else:
-                        field_solution = emoji if field_solution == '' else f'{field_solution} ➜ {emoji}'
-                embed.insert_field_at(
-                    0,
-                    name = f'Raid guide',
-                    value = f'{field_solution.strip()}\n_You can kill {killed_enemies}._',
-                    inline = False
-                )
-            if not active_component:
-                embed.insert_field_at(
-                    0,
-                    name = 'Raid guide',
-                    value = '_Raid completed._',
-                    inline = False
-                )
-            await message_helper.edit(embed=embed)
-            if not active_component: break
+                            field_solution = emoji if field_solution == '' else f'{field_solution} ➜ {emoji}'
+                    embed.insert_field_at(
+                        0,
+                        name = f'Raid guide',
+                        value = f'{field_solution.strip()}\n_You can kill {killed_enemies}._',
+                        inline = False
+                    )
+                if not active_component:
+                    embed.insert_field_at(
+                        0,
+                        name = 'Raid guide',
+                        value = '_Raid completed._',
+                        inline = False
+                    )
+                await outbound.edit(message_helper, embed=embed)
+                if not active_component: break
+
+        sessions.start_session(message, update_raid_guide, raid_edit_check)
 
 
 async def track_raid(message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -426,9 +389,9 @@ async def track_raid(message: discord.Message, embed_data: Dict, user: Optional[
         f"{embed_data['field4']['value']}\n"
         f"{embed_data['field5']['value']}"
     )
-    if (any(search_string in embed_data['description'].lower() for search_string in search_strings)
+    if (any(search_string in embed_data.lower('description') for search_string in search_strings)
         and all(search_string not in field_values.lower() for search_string in search_strings_excluded)
-        and not 'extra items' in embed_data['description'].lower()):
+        and not 'extra items' in embed_data.lower('description')):
         user_name_amount_match = None
         for line in field_values.split('\n'):
             user_name_amount_match = re.search(r'^\*\*(.+?)\*\*: (.+?) <:', line)
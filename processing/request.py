@@ -7,7 +7,16 @@ import discord
 
 from cache import messages
 from database import clans, users, workers
-from resources import exceptions, functions, regex
+from resources import dispatcher, exceptions, functions, regex
+
+
+SIGNATURES = (
+    dispatcher.Signature('description', ('** got ',)),
+)
+SETTINGS = (
+    'user.helper_raid_enabled',
+    'clan.helper_teamraid_enabled',
+)
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -40,8 +49,8 @@ async def update_workers_and_idlucks(message: discord.Message, embed_data: Dict,
     if await functions.get_match_from_patterns(search_patterns, embed_data['description']) is not None:
         supplier_settings = None
         user_name_match = re.search(regex.NAME_FROM_MESSAGE_START, embed_data['description'])
-        worker_amount_name_match = re.search(r'got (\d+)/.+<a:(.+?)worker:', embed_data['description'].lower())
-        supplier_idlucks_match = re.search(r'^(.+?) —.+\(\+(\d+) <', embed_data['description'].split('\n')[1].lower())
+        worker_amount_name_match = re.search(r'got (\d+)/.+<a:(.+?)worker:', embed_data.lower('description'))
+        supplier_idlucks_match = re.search(r'^(.+?) —.+\(\+(\d+) <', embed_data.lower('description').split('\n')[1])
         user_name = user_name_match.group(1)
         worker_amount = int(worker_amount_name_match.group(1))
         worker_name = worker_amount_name_match.group(2)
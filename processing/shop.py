@@ -10,7 +10,14 @@ from discord import utils
 
 from cache import messages
 from database import reminders, users
-from resources import exceptions, functions, regex, strings
+from resources import dispatcher, exceptions, functions, regex, strings
+
+
+SIGNATURES = (
+    dispatcher.Signature('content', ('maxed the purchases',)),
+    dispatcher.Signature('description', ('buy anything with `idle shop buy [item]`',)),
+)
+SETTINGS = ('user.reminder_shop.enabled',)
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -97,7 +104,7 @@ async def create_reminder_from_list(message: discord.Message, embed_data: Dict,
     search_strings = [
         'buy anything with `idle shop buy [item]`', #All languages
     ]
-    if (any(search_string in embed_data['description'].lower() for search_string in search_strings)
+    if (any(search_string in embed_data.lower('description') for search_string in search_strings)
         and message.embeds):
         if user is None:
             user_command_message = (
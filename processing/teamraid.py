@@ -1,19 +1,24 @@
 # teamraid.py
 """Contains commands related to teamraids"""
 
-import copy
 from datetime import timedelta
-from itertools import combinations
 import random
 import re
-from typing import Dict, Optional, Tuple, Union
+from typing import Dict, Optional, Union
 
 import discord
 from discord import utils
 
 from cache import messages
 from database import clans, reminders, users, workers
-from resources import emojis, exceptions, functions, logs, regex, settings, strings
+from resources import admission, dispatcher, emojis, exceptions, functions, logs, outbound, power, regex, sessions, settings, solvers, strings
+
+
+SIGNATURES = (
+    dispatcher.Signature('footer', ('farms will be raided in order',)),
+    dispatcher.Signature('description', ('estimated raid worth',)),
+)
+SETTINGS = ()
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -67,87 +72,17 @@ async def call_teamraid_helper(bot: discord.Bot, message: discord.Message, embed
                 enemy_level = int(re.sub(r'\D','',enemy_data_match.group(2)))
                 enemy_hp_current = int(enemy_data_match.group(3))
                 enemy_hp_max = int(enemy_data_match.group(4))
-                enemy_power = (
-                    (strings.WORKER_STATS[enemy_type]['speed'] + strings.WORKER_STATS[enemy_type]['strength']
-                    + strings.WORKER_STATS[enemy_type]['intelligence'])
-                    * (1 + (strings.WORKER_STATS[enemy_type]['tier']) / 2.5) * (1 + enemy_level / 1.25)
-                )
+                enemy_power = power.get_power(enemy_type, enemy_level)
                 enemies_power[f'{enemy_type}{field_index}'] = (enemy_power, enemy_hp_current)
         return enemies_power
 
-    async def get_recommended_worker(next_enemy_power_hp: Tuple[int, int],
-                                     workers_still_alive: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
-        """Returns the next recommended worker.
-
-        Returns
-        -------
-        Dict with the next recommended worker (Dict[user_name: Dict[enemy_name: enemy_power]])
-        """
-        recommended_worker = {}
-        next_enemy_power, next_enemy_hp = next_enemy_power_hp
-        if len(list(workers_still_alive.keys())) == 1:
-            teamraid_user = list(workers_still_alive.keys())[0]
-            if len(list(workers_still_alive[teamraid_user].keys())) == 1:
-                return workers_still_alive
-        for teamraid_user, worker_data in workers_still_alive.items():
-            for worker_type, worker_power in worker_data.items():
-                worker_damage = round(100 * worker_power / next_enemy_power)
-                hp_remaining = next_enemy_hp - worker_damage
-                if hp_remaining <= 0:
-                    if not recommended_worker:
-                        recommended_worker[teamraid_user] = {}
-                        recommended_worker[teamraid_user][worker_type] = worker_power
-                        continue
-                    recommended_worker_user = list(recommended_worker.keys())[0]
-                    recommended_worker_type = list(recommended_worker[recommended_worker_user].keys())[0]
-                    recommended_worker_power = recommended_worker[recommended_worker_user][recommended_worker_type]
-                    if worker_power < recommended_worker_power:
-                        recommended_worker = {}
-                        recommended_worker[teamraid_user] = {}
-                        recommended_worker[teamraid_user][worker_type] = worker_power
-        if not recommended_worker:
-            all_worker_powers = []
-            for teamraid_user, worker_data in workers_still_alive.items():
-                for worker_type, worker_power in worker_data.items():
-                    worker_damage = round(100 * worker_power / next_enemy_power)
-                    all_worker_powers.append((worker_power, worker_damage))
-            best_combination = []
-            for combination in combinations(all_worker_powers, 2):
-                summed_damage = combination[0][1] + combination[1][1]
-                if summed_damage >= next_enemy_hp:
-                    if not best_combination:
-                        best_combination = combination
-                    elif summed_damage < best_combination[0][1] + best_combination[1][1]:
-                        best_combination = combination
-            for teamraid_user, worker_data in workers_still_alive.items():
-                for worker_type, worker_power in worker_data.items():
-                    for best_worker_power, best_worker_damage in best_combination:
-                        if best_worker_power == worker_power:
-                            recommended_worker[teamraid_user] = {}
-                            recommended_worker[teamraid_user][worker_type] = worker_power
-        if not recommended_worker:
-            best_combination = []
-            for combination in combinations(all_worker_powers, 3):
-                summed_damage = combination[0][1] + combination[1][1] + combination[2][1]
-                if summed_damage >= next_enemy_hp:
-                    if not best_combination:
-                        best_combination = combination
-                    elif summed_damage < best_combination[0][1] + best_combination[1][1] + best_combination[2][1]:
-                        best_combination = combination
-            for teamraid_user, worker_data in workers_still_alive.items():
-                for worker_type, worker_power in worker_data.items():
-                    for best_worker_power, best_worker_damage in best_combination:
-                        if best_worker_power == worker_power:
-                            recommended_worker[teamraid_user] = {}
-                            recommended_worker[teamraid_user][worker_type] = worker_power
-        return recommended_worker
-
     add_reaction = False
     search_strings = [
         'farms will be raided in order', #English
     ]
-    if (any(search_string in embed_data['footer']['text'].lower() for search_string in search_strings)
+    if (any(search_string in embed_data.lower('footer') for search_string in search_strings)
         and not 'raidpoints' in embed_data['field0']['name']):
+        if admission.shed_helper(): return add_reaction
         teamraid_users_workers = {}
         workers_incomplete = False
         for row in message.components:
@@ -158,13 +93,15 @@ async def call_teamraid_helper(bot: discord.Bot, message: discord.Message, embed
             teamraid_users_workers[button.label] = found_workers
         if user is not None:
             teamraid_users = [user,]
+            guild_members = (
+                await functions.get_guild_members_by_names(message.guild, list(teamraid_users_workers.keys()))
+            )
             for teamraid_user_name in teamraid_users_workers.keys():
-                guild_members = await functions.get_guild_member_by_name(message.guild, teamraid_user_name)
-                teamraid_users.append(guild_members[0])
+                teamraid_users.append(guild_members[teamraid_user_name][0])
         else:
             if embed_data['embed_user'] is not None:
                 user = embed_data['embed_user']
-                user_settings = embed_data['embed_user_settings']
+                user_settings = await embed_data['context'].get_embed_user_settings()
             user_name_match = re.search(regex.USERNAME_FROM_EMBED_AUTHOR, embed_data['author']['name'])
             user_name = user_name_match.group(1)
             user_command_message = (
@@ -179,15 +116,13 @@ async def call_teamraid_helper(bot: discord.Bot, message: discord.Message, embed
                 return add_reaction
         if not clan_settings.helper_teamraid_enabled: return add_reaction
 
-        def raid_message_check(payload: discord.RawMessageUpdateEvent):
-            #return message_after.id == message.id
+        def teamraid_edit_check(payload: discord.RawMessageUpdateEvent) -> bool:
             try:
-                author_name = payload.data['embeds'][0]['author']['name']
-                return author_name == message.embeds[0].author.name and payload.data['embeds'][0]['fields'][0]['name'].count('farm') >= 4 # Temporary workaround for that weird issue
-            except:
+                return payload.data['embeds'][0]['fields'][0]['name'].count('farm') >= 4
+            except Exception:
                 return False
 
-        enemy_name_match = re.search(r'\*\*(.+?) farms', embed_data['field0']['name'].lower())
+        enemy_name_match = re.search(r'\*\*(.+?) farms', embed_data.lower('field0.name'))
         enemy_name = enemy_name_match.group(1).upper()
         embed = discord.Embed(color=settings.EMBED_COLOR)
         user_workers_power = {}
@@ -197,10 +132,10 @@ async def call_teamraid_helper(bot: discord.Bot, message: discord.Message, embed
             field_workers = ''
             try:
                 user_settings: users.User = await users.get_user(teamraid_user.id)
-                user_workers = await workers.get_user_workers(teamraid_user.id)
-                for user_worker in user_workers:
-                    if user_worker.worker_name in teamraid_users_workers[teamraid_user.name]:
-                        user_workers_required[user_worker.worker_name] = user_worker.worker_level
+                user_workers = await workers.get_user_workers_power(teamraid_user.id)
+                for worker_name, worker_power in user_workers.items():
+                    if worker_name in teamraid_users_workers[teamraid_user.name]:
+                        user_workers_required[worker_name] = worker_power
             except (exceptions.FirstTimeUserError, exceptions.NoDataFoundError):
                 user_settings = user_workers = None
             if user_settings is not None:
@@ -220,11 +155,7 @@ async def call_teamraid_helper(bot: discord.Bot, message: discord.Message, embed
                     workers_incomplete = True
                     current_worker = f'{worker_emoji} `       ?`{emojis.WORKER_POWER}'
                 else:
-                    worker_power = (
-                        ((strings.WORKER_STATS[worker_type]['speed'] + strings.WORKER_STATS[worker_type]['strength']
-                        + strings.WORKER_STATS[worker_type]['intelligence']))
-                        * (1 + (strings.WORKER_STATS[worker_type]['tier']) / 2.5) * (1 + user_workers_required[worker_type] / 1.25)
-                    )
+                    worker_power = user_workers_required[worker_type]
                     user_workers_power[teamraid_user.name][worker_type] = worker_power
                     worker_power = round(worker_power, 2)
                     worker_power_str = f'{worker_power:,g}'.rjust(8)
@@ -265,8 +196,8 @@ async def call_teamraid_helper(bot: discord.Bot, message: discord.Message, embed
             )
         else:
             next_enemy_power, next_enemy_hp = enemies_power[list(enemies_power.keys())[0]]
-            workers_still_alive = copy.deepcopy(user_workers_power)
-            recommended_worker = await get_recommended_worker((next_enemy_power, next_enemy_hp), workers_still_alive)
+            teamraid_plan = solvers.TeamraidPlan(user_workers_power)
+            recommended_worker = teamraid_plan.recommend_worker((next_enemy_power, next_enemy_hp))
             if recommended_worker:
                 recommended_worker_user = list(recommended_worker.keys())[0]
                 recommended_worker_type = list(recommended_worker[recommended_worker_user].keys())[0]
@@ -285,7 +216,7 @@ async def call_teamraid_helper(bot: discord.Bot, message: discord.Message, embed
                 logs.logger.info(
                     f'--- Teamraid against {enemy_name} ---\n'
                     f'Enemies: {enemies_power}\n'
-                    f'Workers left: {workers_still_alive}\n'
+                    f'Workers left: {teamraid_plan.workers_still_alive}\n'
                     f'Recommendation: {recommended_worker}'
                 )
             else:
@@ -298,7 +229,7 @@ async def call_teamraid_helper(bot: discord.Bot, message: discord.Message, embed
                 logs.logger.info(
                     f'--- Teamraid against {enemy_name} ---\n'
                     f'Enemies: {enemies_power}\n'
-                    f'Workers left: {workers_still_alive}\n'
+                    f'Workers left: {teamraid_plan.workers_still_alive}\n'
                     f'Recommendation: None'
                 )
         embed.insert_field_at(
@@ -313,13 +244,12 @@ async def call_teamraid_helper(bot: discord.Bot, message: discord.Message, embed
             value = '_If a worker power shows as `?`, the player is not using Molly or has not shown me their workers list._',
             inline = False
         )
-        message_helper = await message.reply(embed=embed)
+        message_helper = await outbound.reply(message, embed=embed)
 
-        if not workers_incomplete:
+        async def update_teamraid_guide(session: sessions.Session) -> None:
             while True:
                 try:
-                    payload = await bot.wait_for('raw_message_edit', check=raid_message_check,
-                                                 timeout=settings.INTERACTION_TIMEOUT)
+                    payload = await session.wait_for_edit()
                 except TimeoutError:
                     embed.remove_field(0)
                     embed.insert_field_at(
@@ -328,7 +258,7 @@ async def call_teamraid_helper(bot: discord.Bot, message: discord.Message, embed
                         value = f'_Helper timed out._\n{emojis.BLANK}',
                         inline = False
                     )
-                    await message_helper.edit(embed=embed)
+                    await outbound.edit(message_helper, embed=embed)
                     break
                 active_component = False
                 if 'components' not in payload.data: continue
@@ -338,11 +268,7 @@ async def call_teamraid_helper(bot: discord.Bot, message: discord.Message, embed
                         disabled = component.get('disabled', False)
                         if disabled:
                             worker_name_match = re.search(r'^(.+?)worker', component['emoji']['name'].lower())
-                            try:
-                                del workers_still_alive[component['label']][worker_name_match.group(1)]
-                                if not workers_still_alive[component['label']]: del workers_still_alive[component['label']]
-                            except KeyError:
-                                pass
+                            teamraid_plan.remove_worker(component['label'], worker_name_match.group(1))
                         else:
                             active_component = True
 
@@ -376,7 +302,7 @@ async def call_teamraid_helper(bot: discord.Bot, message: discord.Message, embed
                     for enemy_type, enemy_power_hp in enemies_power.copy().items():
                         if enemy_power_hp[1] == 0: del enemies_power[enemy_type]
                     next_enemy_power, next_enemy_hp = enemies_power[list(enemies_power.keys())[0]]
-                    recommended_worker = await get_recommended_worker((next_enemy_power, next_enemy_hp), workers_still_alive)
+                    recommended_worker = teamraid_plan.recommend_worker((next_enemy_power, next_enemy_hp))
                     if recommended_worker:
                         recommended_worker_user = list(recommended_worker.keys())[0]
                         recommended_worker_type = list(recommended_worker[recommended_worker_user].keys())[0]
@@ -395,7 +321,7 @@ async def call_teamraid_helper(bot: discord.Bot, message: discord.Message, embed
                         logs.logger.info(
                             f'--- Teamraid against {enemy_name} ---\n'
                             f'Enemies: {enemies_power}\n'
-                            f'Workers left: {workers_still_alive}\n'
+                            f'Workers left: {teamraid_plan.workers_still_alive}\n'
                             f'Recommendation: {recommended_worker}'
                         )
                     else:
@@ -408,7 +334,7 @@ async def call_teamraid_helper(bot: discord.Bot, message: discord.Message, embed
                         logs.logger.info(
                             f'--- Teamraid against {enemy_name} ---\n'
                            f'Enemies: {enemies_power}\n'
-                           f'Workers left: {workers_still_alive}\n'
+                           f'Workers left: {teamraid_plan.workers_still_alive}\n'
                            f'Recommendation: None'
                         )
                 if not active_component:
@@ -449,11 +375,14 @@ async def call_teamraid_helper(bot: discord.Bot, message: discord.Message, embed
                         f'Teamraid completed'
                     )
                 try:
-                    await message_helper.edit(embed=embed)
+                    await outbound.edit(message_helper, embed=embed)
                 except discord.NotFound:
-                    return add_reaction
+                    return
                 if not active_component: break
 
+        if not workers_incomplete:
+            sessions.start_session(message, update_teamraid_guide, teamraid_edit_check)
+
 
 
 async def create_clan_reminder(message: discord.Message, embed_data: Dict, clan_settings: Optional[clans.Clan]) -> bool:
@@ -480,7 +409,7 @@ async def create_clan_reminder(message: discord.Message, embed_data: Dict, clan_
         f"{embed_data['field4']['value']}\n"
         f"{embed_data['field5']['value']}"
     )
-    if (any(search_string in embed_data['description'].lower() for search_string in search_strings_description)
+    if (any(search_string in embed_data.lower('description') for search_string in search_strings_description)
         and any(search_string in field_values.lower() for search_string in search_strings_teamraid)):
         if clan_settings is None:
             clan_name_match = None
@@ -7,7 +7,14 @@ import discord
 
 from cache import messages
 from database import upgrades, users
-from resources import exceptions, regex
+from resources import dispatcher, exceptions, regex
+
+
+SIGNATURES = (
+    dispatcher.Signature('description', ('buy an upgrade with `',)),
+    dispatcher.Signature('content', ('` upgraded to level ',)),
+)
+SETTINGS = ('user.helper_upgrades_enabled',)
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -38,7 +45,7 @@ async def track_upgrades_overview(message: discord.Message, embed_data: Dict, us
     search_strings = [
         'buy an upgrade with `', #English
     ]
-    if any(search_string in embed_data['description'].lower() for search_string in search_strings):
+    if any(search_string in embed_data.lower('description') for search_string in search_strings):
         if user is None:
             user_command_message = (
                 await messages.find_message(message.channel.id, regex.COMMAND_UPGRADES_OVERVIEW)
@@ -49,16 +56,14 @@ async def track_upgrades_overview(message: discord.Message, embed_data: Dict, us
         except exceptions.FirstTimeUserError:
             return add_reaction
         if not user_settings.bot_enabled: return add_reaction
+        user_upgrades = {}
         for field in message.embeds[0].fields:
             data_match = re.search(r'^`(\d+)`.+__\*\*(.+?)\*\*.+level\*\*:\s(\d+)\s\|', field.value.lower(), re.DOTALL)
             sort_index = int(data_match.group(1))
             name = data_match.group(2)
             level = int(data_match.group(3))
-            try:
-                upgrade: upgrades.Upgrade = await upgrades.get_upgrade(user.id, name)
-                await upgrade.update(sort_index=sort_index, level=level)
-            except exceptions.NoDataFoundError:
-                await upgrades.insert_upgrade(user.id, name, level, sort_index)
+            user_upgrades[name] = (level, sort_index)
+        if user_upgrades: await upgrades.upsert_upgrades(user.id, user_upgrades)
         if user_settings.reactions_enabled: add_reaction = True
     return add_reaction
 
@@ -9,7 +9,22 @@ from discord import utils
 
 from cache import messages
 from database import clans, reminders, users
-from resources import emojis, exceptions, functions, regex, strings
+from resources import admission, dispatcher, emojis, exceptions, functions, regex, strings
+
+
+SIGNATURES = (
+    dispatcher.Signature('content', (
+        '**energy** was recovered!',
+        'got a new `boost`',
+        'got +10000 max energy',
+        'erngy clover boost #',
+        'timespeeder',
+        'timecompressor',
+        'timedilator',
+        'guild name set to ',
+    )),
+)
+SETTINGS = ()
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -46,6 +61,7 @@ async def call_context_helper_on_energy_item(message: discord.Message, embed_dat
     ]
 
     if any(search_string in message.content.lower() for search_string in search_strings):
+        if admission.shed_helper(): return add_reaction
         if user is None:
             user_name_match = re.search(regex.NAME_FROM_MESSAGE_START, message.content)
             user_name = user_name_match.group(1)
@@ -8,7 +8,13 @@ import discord
 
 from cache import messages
 from database import reminders, users
-from resources import emojis, exceptions, functions, regex, strings
+from resources import dispatcher, emojis, exceptions, functions, regex, strings
+
+
+SIGNATURES = (
+    dispatcher.Signature('description', ('you can vote for idle farm',)),
+)
+SETTINGS = ('user.reminder_vote.enabled',)
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -38,7 +44,7 @@ async def create_vote_reminder(message: discord.Message, embed_data: Dict, user:
     search_strings = [
         'you can vote for idle farm', #All languages
     ]
-    if any(search_string in embed_data['description'].lower() for search_string in search_strings):
+    if any(search_string in embed_data.lower('description') for search_string in search_strings):
         if user is None:
             user_command_message = (
                 await messages.find_message(message.channel.id, regex.COMMAND_VOTE)
@@ -51,8 +57,8 @@ async def create_vote_reminder(message: discord.Message, embed_data: Dict, user:
                 return add_reaction
         if not user_settings.bot_enabled or not user_settings.reminder_vote.enabled: return add_reaction
         user_command = await functions.get_game_command(user_settings, 'vote')
-        timestring_match = re.search(r'cooldown: \*\*(.+?)\*\*\n', embed_data['field0']['value'].lower())
-        energy_refill_amount_match = re.search(r'energy refill\*\*: (\d+)%', embed_data['field0']['value'].lower())
+        timestring_match = re.search(r'cooldown: \*\*(.+?)\*\*\n', embed_data.lower('field0.value'))
+        energy_refill_amount_match = re.search(r'energy refill\*\*: (\d+)%', embed_data.lower('field0.value'))
         energy_refill_amount = int(energy_refill_amount_match.group(1))
         energy_from_vote = ceil(user_settings.energy_max * energy_refill_amount / 100)
         energy_regen_time = await functions.get_energy_regen_time(user_settings)
@@ -9,7 +9,14 @@ from discord import utils
 
 from cache import messages
 from database import clans, users, workers, tracking, workers
-from resources import exceptions, functions, regex, strings
+from resources import dispatcher, exceptions, functions, regex, strings
+
+
+SIGNATURES = (
+    dispatcher.Signature('field0.name', ('hired the',)),
+    dispatcher.Signature('author', ('— worker roll', '— workers')),
+)
+SETTINGS = ()
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
@@ -44,9 +51,9 @@ async def track_worker_hire_event(message: discord.Message, embed_data: Dict, us
     search_strings_2 = [
         'worker**!', #English
     ]
-    if (any(search_string in embed_data['field0']['name'].lower() for search_string in search_strings_1)
-        and any(search_string in embed_data['field0']['name'].lower() for search_string in search_strings_2)):
-        user_name_match = re.search(r'^(.+?) hired', embed_data['field0']['name'].lower())
+    if (any(search_string in embed_data.lower('field0.name') for search_string in search_strings_1)
+        and any(search_string in embed_data.lower('field0.name') for search_string in search_strings_2)):
+        user_name_match = re.search(r'^(.+?) hired', embed_data.lower('field0.name'))
         guild_members = await functions.get_guild_member_by_name(message.guild, user_name_match.group(1), False)
         if len(guild_members) != 1: return add_reaction
         user = guild_members[0]
@@ -61,7 +68,7 @@ async def track_worker_hire_event(message: discord.Message, embed_data: Dict, us
             except exceptions.NoDataFoundError:
                 pass
         if not user_settings.bot_enabled: return add_reaction
-        worker_name_match = re.search(r'<a:(.+?)worker:', embed_data['field0']['name'].lower())
+        worker_name_match = re.search(r'<a:(.+?)worker:', embed_data.lower('field0.name'))
         worker_name = worker_name_match.group(1)
         try:
             user_worker: workers.UserWorker = await workers.get_user_worker(user.id, worker_name)
@@ -92,11 +99,11 @@ async def track_worker_roll(message: discord.Message, embed_data: Dict, user: Op
     search_strings = [
         '— worker roll', #All languages
     ]
-    if any(search_string in embed_data['author']['name'].lower() for search_string in search_strings):
+    if any(search_string in embed_data.lower('author') for search_string in search_strings):
         if user is None:
             if embed_data['embed_user'] is not None:
                 user = embed_data['embed_user']
-                user_settings = embed_data['embed_user_settings']
+                user_settings = await embed_data['context'].get_embed_user_settings()
             else:
                 user_name_match = re.search(regex.USERNAME_FROM_EMBED_AUTHOR, embed_data['author']['name'])
                 user_name = user_name_match.group(1)
@@ -177,7 +184,10 @@ async def track_worker_stats(message: discord.Message, embed_data: Dict,
     search_strings = [
         '— workers', #English
     ]
-    if any(search_string in embed_data['author']['name'].lower() for search_string in search_strings):
+    if any(search_string in embed_data.lower('author') for search_string in search_strings):
+        changed_parts = embed_data['changed_parts']
+        if changed_parts is not None and not any(part.startswith('field') for part in changed_parts):
+            return add_reaction
         if interaction_user is None:
             user_command_message = (
                 await messages.find_message(message.channel.id, regex.COMMAND_WORKER_STATS)
@@ -196,6 +206,8 @@ async def track_worker_stats(message: discord.Message, embed_data: Dict,
             except exceptions.NoDataFoundError:
                 pass
         if not user_settings.bot_enabled: return add_reaction
+        user_workers = {}
+        worker_levels = {}
         for field in message.embeds[0].fields:
             worker_name_match = re.search(r'<a:(.+?)worker:', field.name.lower())
             worker_data_match = re.search(r'level\*\*: ([0-9,]+) `\[([0-9,]+)/([0-9,]+)]`', field.value.lower())
@@ -203,16 +215,10 @@ async def track_worker_stats(message: discord.Message, embed_data: Dict,
             level = int(re.sub(r'\D','', worker_data_match.group(1)))
             amount = int(re.sub(r'\D','', worker_data_match.group(2)))
             workers_required = int(re.sub(r'\D','', worker_data_match.group(3)))
-            try:
-                user_worker = await workers.get_user_worker(interaction_user.id, worker_name)
-                await user_worker.update(worker_level=level, worker_amount=amount)
-            except exceptions.NoDataFoundError:
-                user_worker = await workers.insert_user_worker(interaction_user.id, worker_name, level, amount)
-            try:
-                worker_level = await workers.get_worker_level(level + 1)
-                if worker_level.workers_required != workers_required:
-                    await worker_level.update(workers_required=workers_required)
-            except exceptions.NoDataFoundError:
-                worker_level = await workers.insert_worker_level(level + 1, workers_required)
+            user_workers[worker_name] = (level, amount)
+            worker_levels[level + 1] = workers_required
+        if user_workers:
+            await workers.upsert_user_workers(interaction_user.id, user_workers)
+            await workers.upsert_worker_levels(worker_levels)
         if user_settings.reactions_enabled: add_reaction = True
     return add_reaction
\ No newline at end of file
@@ -8,7 +8,13 @@ import discord
 
 from cache import messages
 from database import reminders, users
-from resources import emojis, exceptions, functions, regex
+from resources import dispatcher, emojis, exceptions, functions, regex
+
+
+SIGNATURES = (
+    dispatcher.Signature('content', ('was blessed with the **christmas spirit**',)),
+)
+SETTINGS = ()
 
 
 async def process_message(bot: discord.Bot, message: discord.Message, embed_data: Dict, user: Optional[discord.User],
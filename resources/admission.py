@@ -0,0 +1,161 @@
+# admission.py
+"""Contains the admission controller for game messages.
+
+Only MAX_ACTIVE game messages are processed at the same time. Everything else waits in a bounded priority queue, so
+screens that create reminders are processed before tracking screens, and those before screens that only trigger
+helpers. While the queue is longer than SHED_QUEUE_DEPTH, Molly is overloaded and sheds low priority work: helper
+processors, context helpers and logo reactions are skipped. If the queue is full, the least important message is
+dropped.
+"""
+
+import asyncio
+import heapq
+import itertools
+from typing import Dict, Optional
+
+from resources import logs
+
+
+PRIORITY_REMINDERS = 0
+PRIORITY_TRACKING = 1
+PRIORITY_HELPERS = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_REMINDERS: 'Reminders',
+    PRIORITY_TRACKING: 'Tracking',
+    PRIORITY_HELPERS: 'Helpers',
+}
+
+MAX_ACTIVE = 100
+MAX_QUEUED = 2_000
+SHED_QUEUE_DEPTH = 200
+
+
+class Slot():
+    """Permission to process a message. Has to be released once, releasing it again does nothing."""
+    __slots__ = ('released',)
+
+    def __init__(self) -> None:
+        self.released = False
+
+    def release(self) -> None:
+        if self.released: return
+        self.released = True
+        _release()
+
+
+_active = 0
+_queue: list = []
+_sequence = itertools.count()
+_stats = {
+    'admitted': {priority: 0 for priority in PRIORITY_NAMES},
+    'queued': {priority: 0 for priority in PRIORITY_NAMES},
+    'shed_messages': {priority: 0 for priority in PRIORITY_NAMES},
+    'shed_helpers': 0,
+    'shed_reactions': 0,
+    'max_queue_depth': 0,
+}
+_overloaded = False
+
+
+def _release() -> None:
+    """Passes a released slot on to the most important queued message"""
+    global _active
+    while _queue:
+        _, _, future = heapq.heappop(_queue)
+        if future.done(): continue
+        future.set_result(True)
+        return
+    _active -= 1
+
+
+def _update_overload() -> None:
+    """Logs when Molly starts or stops shedding work"""
+    global _overloaded
+    overloaded = len(_queue) > SHED_QUEUE_DEPTH
+    if overloaded != _overloaded:
+        _overloaded = overloaded
+        if overloaded:
+            logs.logger.warning(f'Overloaded, {len(_queue)} game messages queued. Shedding helpers and reactions.')
+        else:
+            logs.logger.info('No longer overloaded.')
+
+
+async def acquire(priority: int) -> Optional[Slot]:
+    """Waits until a message with the given priority can be processed.
+
+    Returns
+    -------
+    A Slot that has to be released when the message is processed, or None if the message was shed.
+    """
+    global _active
+    if _active < MAX_ACTIVE and not _queue:
+        _active += 1
+        _stats['admitted'][priority] += 1
+        return Slot()
+    if len(_queue) >= MAX_QUEUED:
+        _queue[:] = [queued for queued in _queue if not queued[2].done()]
+        heapq.heapify(_queue)
+    if len(_queue) >= MAX_QUEUED:
+        least_important = max(_queue)
+        if least_important[0] <= priority:
+            _stats['shed_messages'][priority] += 1
+            return None
+        _queue.remove(least_important)
+        heapq.heapify(_queue)
+        least_important[2].set_result(False)
+        _stats['shed_messages'][least_important[0]] += 1
+    future = asyncio.get_running_loop().create_future()
+    heapq.heappush(_queue, (priority, next(_sequence), future))
+    _stats['queued'][priority] += 1
+    _stats['max_queue_depth'] = max(_stats['max_queue_depth'], len(_queue))
+    _update_overload()
+    try:
+        admitted = await future
+    except asyncio.CancelledError:
+        if future.done() and not future.cancelled() and future.result(): _release()
+        raise
+    finally:
+        _update_overload()
+    if not admitted: return None
+    _stats['admitted'][priority] += 1
+    return Slot()
+
+
+def is_overloaded() -> bool:
+    """Returns True while low priority work is shed"""
+    return _overloaded
+
+
+def shed_helper() -> bool:
+    """Returns True if a helper should be skipped because Molly is overloaded. Counts the skipped helper."""
+    if not _overloaded: return False
+    _stats['shed_helpers'] += 1
+    return True
+
+
+def shed_reaction() -> bool:
+    """Returns True if a logo reaction should be skipped because Molly is overloaded. Counts the skipped reaction."""
+    if not _overloaded: return False
+    _stats['shed_reactions'] += 1
+    return True
+
+
+def get_stats() -> Dict[str, object]:
+    """Returns the active and queued messages and the admitted, queued and shed counters"""
+    return {
+        'active': _active,
+        'queue_depth': len(_queue),
+        'overloaded': _overloaded,
+        'max_queue_depth': _stats['max_queue_depth'],
+        'shed_helpers': _stats['shed_helpers'],
+        'shed_reactions': _stats['shed_reactions'],
+        'priorities': {
+            PRIORITY_NAMES[priority]: {
+                'admitted': _stats['admitted'][priority],
+                'queued': _stats['queued'][priority],
+                'shed': _stats['shed_messages'][priority],
+            }
+            for priority in PRIORITY_NAMES
+        },
+    }
@@ -0,0 +1,159 @@
+# cpu.py
+"""Contains the CPU work pool and the event loop lag probe.
+
+Pure computations (raid solving, big clan tables, tracking consolidation) run in a pool of worker processes, so they
+don't freeze heartbeats and the messages of every other guild. Functions and arguments sent to the pool have to be
+picklable, so only plain data (dicts, tuples, numbers, strings, datetimes) goes in and out, never Discord objects.
+
+The probe measures how late the event loop wakes up from a short sleep. This is the time the loop was blocked.
+"""
+
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import functools
+import multiprocessing
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+from resources import logs
+
+
+MAX_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+MAX_QUEUED = 200 # Work submitted while this many jobs are pending runs inline instead
+TIMEOUT = 10 # Seconds
+
+LOOP_LAG_INTERVAL = 0.5 # Seconds between two probes
+LOOP_LAG_BUDGET = 0.1 # Loop stalls longer than this are counted and logged
+LOOP_LAG_SAMPLES = 1_000
+
+_pool: Optional[ProcessPoolExecutor] = None
+_probe_task: Optional[asyncio.Task] = None
+_pending = 0
+_stats = {
+    'submitted': 0,
+    'inline': 0,
+    'queue_full': 0,
+    'completed': 0,
+    'failed': 0,
+    'cancelled': 0,
+    'timeouts': 0,
+    'pool_restarts': 0,
+}
+_loop_lags = deque(maxlen=LOOP_LAG_SAMPLES)
+_loop_lag_stats = {'max': 0.0, 'over_budget': 0}
+
+
+def _create_pool() -> ProcessPoolExecutor:
+    """Creates the worker processes. Uses spawn, as forking a process with a running event loop, open sockets and a
+    database connection isn't safe.
+    """
+    return ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+
+
+def start() -> None:
+    """Starts the worker pool and the loop lag probe. Does nothing if they are already running."""
+    global _pool, _probe_task
+    if _pool is None: _pool = _create_pool()
+    if _probe_task is None or _probe_task.done():
+        _probe_task = asyncio.get_running_loop().create_task(_probe_loop_lag())
+
+
+def shutdown() -> None:
+    """Stops the loop lag probe and the worker pool. Pending work is cancelled."""
+    global _pool, _probe_task
+    if _probe_task is not None: _probe_task.cancel()
+    _probe_task = None
+    if _pool is not None: _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+async def run(function: Callable, *args: Any, inline: bool = False, timeout: float = TIMEOUT) -> Any:
+    """Runs a function in the worker pool and returns its result.
+    Runs it inline instead if inline is True, the pool isn't started or MAX_QUEUED jobs are pending. Use inline for
+    work that is cheaper than sending it to another process.
+
+    Arguments
+    ---------
+    function: A module level function. It and all args have to be picklable.
+    args: The arguments of the function.
+    inline: If True, the function is called directly.
+    timeout: Seconds until the work is cancelled.
+
+    Returns
+    -------
+    The return value of the function.
+
+    Raises
+    ------
+    asyncio.TimeoutError if the function didn't finish in time.
+    BrokenProcessPool if a worker process died twice in a row. The pool is restarted each time.
+    All errors the function raises.
+    If the awaiting task is cancelled, the work is cancelled as well (if it didn't start yet).
+    """
+    global _pending, _pool
+    if inline or _pool is None or _pending >= MAX_QUEUED:
+        if not inline and _pool is not None: _stats['queue_full'] += 1
+        _stats['inline'] += 1
+        return function(*args)
+    _pending += 1
+    _stats['submitted'] += 1
+    try:
+        for attempt in range(2):
+            pool = _pool
+            try:
+                future = asyncio.get_running_loop().run_in_executor(pool, functools.partial(function, *args))
+                result = await asyncio.wait_for(future, timeout)
+                break
+            except BrokenProcessPool:
+                # Jobs that broke together must only restart the pool once, a second restart would cancel the
+                # retries running in the new pool
+                if pool is _pool:
+                    _stats['pool_restarts'] += 1
+                    logs.logger.error(f'CPU pool broke while running {function.__name__}, restarting it.')
+                    _pool = _create_pool()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                if attempt > 0 or _pool is None: raise
+    except asyncio.TimeoutError:
+        _stats['timeouts'] += 1
+        raise
+    except asyncio.CancelledError:
+        _stats['cancelled'] += 1
+        raise
+    except Exception:
+        _stats['failed'] += 1
+        raise
+    finally:
+        _pending -= 1
+    _stats['completed'] += 1
+    return result
+
+
+async def _probe_loop_lag() -> None:
+    """Sleeps for LOOP_LAG_INTERVAL and records how much later than that the loop woke up"""
+    while True:
+        start_time = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        loop_lag = max(0.0, time.perf_counter() - start_time - LOOP_LAG_INTERVAL)
+        _loop_lags.append(loop_lag)
+        if loop_lag > _loop_lag_stats['max']: _loop_lag_stats['max'] = loop_lag
+        if loop_lag > LOOP_LAG_BUDGET:
+            _loop_lag_stats['over_budget'] += 1
+            logs.logger.warning(f'Event loop was blocked for {loop_lag:.3f} seconds.')
+
+
+def get_stats() -> Dict[str, Any]:
+    """Returns the pool counters and the loop lag percentiles in seconds"""
+    loop_lags = sorted(_loop_lags)
+    return {
+        'running': _pool is not None,
+        'workers': MAX_WORKERS,
+        'pending': _pending,
+        **_stats,
+        'loop_lag_p50': loop_lags[int(len(loop_lags) * 0.5)] if loop_lags else 0,
+        'loop_lag_p99': loop_lags[min(len(loop_lags) - 1, int(len(loop_lags) * 0.99))] if loop_lags else 0,
+        'loop_lag_max': _loop_lag_stats['max'],
+        'loop_lag_over_budget': _loop_lag_stats['over_budget'],
+    }
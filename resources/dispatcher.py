@@ -0,0 +1,340 @@
+# dispatcher.py
+"""Contains the processor registry used by cogs.detection.
+
+Every module in processing declares which message parts identify the messages it handles (SIGNATURES) and which
+settings need to be enabled for it to do anything (SETTINGS). The detection cog classifies each game message in a single
+pass over its parts (see resources.patterns) and then only calls the processors that matched. The context of a message
+(users, clan and guild settings) is only loaded when a processor or a settings check needs it (see MessageContext).
+"""
+
+import asyncio
+from collections import deque
+import re
+import time
+import traceback
+from types import ModuleType
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+import discord
+
+from database import clans, errors, guilds, users
+from resources import admission, embeds, exceptions, functions, logs, patterns, regex, settings
+
+
+# Message parts a signature can look at
+PARTS = (
+    'author',
+    'title',
+    'description',
+    'field0.name', 'field0.value',
+    'field1.name', 'field1.value',
+    'field2.name', 'field2.value',
+    'field3.name', 'field3.value',
+    'field4.name', 'field4.value',
+    'field5.name', 'field5.value',
+    'footer',
+    'content',
+)
+
+# Arguments most processors take, in this order. All arguments are provided by MessageContext.get.
+DEFAULT_ARGUMENTS = ('bot', 'message', 'embed_data', 'interaction_user', 'user_settings')
+CLAN_ARGUMENTS = DEFAULT_ARGUMENTS + ('clan_settings',)
+DEFAULT_TIMEOUT = settings.PROCESSOR_TIMEOUT
+
+LATENCY_SAMPLE_SIZE = 1_000
+
+
+class Signature(NamedTuple):
+    """A message matches a signature if one of the strings is in the lowercased part"""
+    part: str
+    strings: Tuple[str, ...]
+
+
+class Processor(NamedTuple):
+    """A registered processor.
+
+    name: Name used in logs and stats.
+    function: The process_message function of the processor.
+    signatures: The processor is called if any of these signatures match.
+    settings: Settings flags of which at least one has to be enabled (see is_enabled). Empty if always enabled.
+    arguments: Names of the arguments the function takes, in order.
+    timeout: Seconds the processor can take before it is cancelled. None for processors that wait for user
+    interaction (views, raid helpers), these manage their own timeouts.
+    after: Names of processors that have to be finished before this one starts, if they run for the same message.
+    These have to be registered before this processor.
+    priority: Admission priority (see resources.admission). Messages are queued by the most important priority of
+    their processors. Processors with PRIORITY_HELPERS are skipped while Molly is overloaded.
+    """
+    name: str
+    function: Callable[..., Any]
+    signatures: Tuple[Signature, ...]
+    settings: Tuple[str, ...] = ()
+    arguments: Tuple[str, ...] = DEFAULT_ARGUMENTS
+    timeout: Optional[float] = DEFAULT_TIMEOUT
+    after: Tuple[str, ...] = ()
+    priority: int = admission.PRIORITY_TRACKING
+
+
+def register(module: ModuleType, arguments: Tuple[str, ...] = DEFAULT_ARGUMENTS,
+             timeout: Optional[float] = DEFAULT_TIMEOUT, after: Tuple[str, ...] = (),
+             priority: int = admission.PRIORITY_TRACKING) -> Processor:
+    """Creates a Processor from a module in processing, using its process_message, SIGNATURES and SETTINGS"""
+    return Processor(module.__name__.split('.')[-1], module.process_message, module.SIGNATURES, module.SETTINGS,
+                     arguments, timeout, after, priority)
+
+
+class ProcessorRegistry():
+    """Compiles the signatures of all processors into one PatternMatcher, so every message part is scanned exactly
+    once per message, no matter how many processors and search strings there are.
+    """
+    def __init__(self, processors: Iterable[Processor]) -> None:
+        self.processors = tuple(processors)
+        targets: Dict[str, List[Tuple[str, int]]] = {}
+        for processor_index, processor in enumerate(self.processors):
+            for signature in processor.signatures:
+                if signature.part not in PARTS:
+                    raise ValueError(f'Processor {processor.name} has a signature for unknown part {signature.part}.')
+                for search_string in signature.strings:
+                    targets.setdefault(search_string, []).append((signature.part, processor_index))
+            registered_names = {registered_processor.name for registered_processor in self.processors[:processor_index]}
+            for name in processor.after:
+                if name not in registered_names:
+                    raise ValueError(f'Processor {processor.name} has to be registered after {name}.')
+        self.matcher = patterns.PatternMatcher(targets.keys())
+        # Search string -> processors that match if the string is found in a specific part
+        self.targets: Dict[str, Dict[str, Tuple[int, ...]]] = {
+            pattern: {part: tuple(index for target_part, index in targets[pattern] if target_part == part)
+                      for part, _ in targets[pattern]}
+            for pattern in self.matcher.patterns
+        }
+        self.parts = tuple(
+            part for part in PARTS if any(part in pattern_targets for pattern_targets in self.targets.values())
+        )
+
+    def scan(self, embed_data: embeds.EmbedData) -> List[Tuple[str, str]]:
+        """Scans all message parts that have signatures once.
+
+        Returns
+        -------
+        List with all hits as tuples (part, search string). Search strings are only reported for parts they are a
+        signature for.
+        """
+        hits = []
+        for part in self.parts:
+            text = embed_data.lower(part)
+            if not text: continue
+            for pattern_index in self.matcher.search(text):
+                search_string = self.matcher.patterns[pattern_index]
+                if part in self.targets[search_string]: hits.append((part, search_string))
+        return hits
+
+    def classify(self, embed_data: embeds.EmbedData) -> List[Processor]:
+        """Returns the processors with at least one matching signature (see scan), in registration order"""
+        matches = set()
+        for part, search_string in self.scan(embed_data):
+            matches.update(self.targets[search_string][part])
+        return [self.processors[processor_index] for processor_index in sorted(matches)]
+
+
+# --- Context ---
+class MessageContext():
+    """Context of a game message.
+
+    Everything that needs a query or an API call (interaction user, user, clan, guild and embed user settings) is
+    loaded when it is first requested and then shared by all processors of the message. Loads are shielded, so a
+    processor that times out doesn't cancel a load other processors are waiting for.
+    The embed data handed to processors contains 'context' (this object), 'embed_user' and 'changed_parts'.
+    """
+    def __init__(self, bot: discord.Bot, message: discord.Message, embed_data: embeds.EmbedData,
+                 changed_parts: Optional[FrozenSet[str]] = None) -> None:
+        self.bot = bot
+        self.message = message
+        self._loads: Dict[str, asyncio.Future] = {}
+        embed_user = None
+        user_id_match = re.search(regex.USER_ID_FROM_ICON_URL, embed_data['author']['icon_url'])
+        if user_id_match:
+            embed_user = message.guild.get_member(int(user_id_match.group(1)))
+        self.embed_user = embed_user
+        self.embed_data = embed_data.with_context(context=self, embed_user=embed_user, changed_parts=changed_parts)
+
+    async def _load(self, name: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        load = self._loads.get(name, None)
+        if load is None:
+            load = self._loads[name] = asyncio.ensure_future(loader())
+        return await asyncio.shield(load)
+
+    async def get(self, name: str) -> Any:
+        """Returns a processor argument by name (see DEFAULT_ARGUMENTS)"""
+        if name == 'bot': return self.bot
+        if name == 'message': return self.message
+        if name == 'embed_data': return self.embed_data
+        return await getattr(self, f'get_{name}')()
+
+    async def get_interaction_user(self) -> Optional[discord.User]:
+        return await self._load('interaction_user', lambda: functions.get_interaction_user(self.message))
+
+    async def get_user_settings(self) -> Optional[users.User]:
+        """Returns the settings of the interaction user. None if there is no interaction user or if the user is not
+        registered.
+        """
+        async def load_user_settings() -> Optional[users.User]:
+            interaction_user = await self.get_interaction_user()
+            if interaction_user is None: return None
+            try:
+                return await users.get_user(interaction_user.id)
+            except exceptions.FirstTimeUserError:
+                return None
+        return await self._load('user_settings', load_user_settings)
+
+    async def get_clan_settings(self) -> Optional[clans.Clan]:
+        """Returns the clan settings of the interaction user. None if there is no interaction user or no clan."""
+        async def load_clan_settings() -> Optional[clans.Clan]:
+            interaction_user = await self.get_interaction_user()
+            if interaction_user is None: return None
+            try:
+                return await clans.get_clan_by_member_id(interaction_user.id)
+            except exceptions.NoDataFoundError:
+                return None
+        return await self._load('clan_settings', load_clan_settings)
+
+    async def get_guild_settings(self) -> guilds.Guild:
+        return await self._load('guild_settings', lambda: guilds.get_guild(self.message.guild.id))
+
+    async def get_embed_user_settings(self) -> Optional[users.User]:
+        """Returns the settings of the embed user. None if there is no embed user or if the user is not registered."""
+        async def load_embed_user_settings() -> Optional[users.User]:
+            if self.embed_user is None: return None
+            interaction_user = await self.get_interaction_user()
+            if interaction_user is not None and self.embed_user == interaction_user:
+                return await self.get_user_settings()
+            try:
+                return await users.get_user(self.embed_user.id)
+            except exceptions.FirstTimeUserError:
+                return None
+        return await self._load('embed_user_settings', load_embed_user_settings)
+
+    async def is_user_allowed(self) -> bool:
+        """Returns False if there is an interaction user that is not registered or has the bot disabled"""
+        if await self.get_interaction_user() is None: return True
+        user_settings = await self.get_user_settings()
+        return user_settings is not None and user_settings.bot_enabled
+
+
+async def is_enabled(flag: str, context: MessageContext) -> bool:
+    """Checks a settings flag.
+
+    Flags are dotted attribute paths starting with the settings object they belong to, e.g.
+    'user.helper_raid_enabled', 'user.reminder_daily.enabled', 'clan.helper_teamraid_enabled' or
+    'guild.event_energy.enabled'. Only the settings object the flag belongs to is loaded.
+    User flags count as enabled if there are no user settings (the processor checks the user itself), clan and
+    guild flags count as disabled if there are no settings.
+    """
+    owner, *attributes = flag.split('.')
+    settings_object = await context.get(f'{owner}_settings')
+    if settings_object is None: return owner == 'user'
+    for attribute in attributes:
+        settings_object = getattr(settings_object, attribute)
+    return bool(settings_object)
+
+
+async def is_processor_enabled(processor: Processor, context: MessageContext) -> bool:
+    """Returns True if a processor should run for a message. No processor runs for interaction users that are not
+    allowed (see MessageContext.is_user_allowed), processors with settings flags need at least one of them enabled.
+    """
+    if not await context.is_user_allowed(): return False
+    if not processor.settings: return True
+    for flag in processor.settings:
+        if await is_enabled(flag, context): return True
+    return False
+
+
+# --- Execution ---
+_stats: Dict[str, Dict[str, Any]] = {}
+
+
+async def _run_processor(processor: Processor, context: MessageContext) -> bool:
+    """Runs a single processor with its time budget. Errors are logged and never reach other processors."""
+    message = context.message
+    processor_stats = _stats.get(processor.name, None)
+    if processor_stats is None:
+        processor_stats = _stats[processor.name] = {
+            'calls': 0, 'errors': 0, 'timeouts': 0, 'latencies': deque(maxlen=LATENCY_SAMPLE_SIZE),
+        }
+    processor_stats['calls'] += 1
+    start_time = time.monotonic()
+
+    async def call_processor() -> Any:
+        arguments = [await context.get(argument) for argument in processor.arguments]
+        return await processor.function(*arguments)
+
+    try:
+        return bool(await asyncio.wait_for(call_processor(), timeout=processor.timeout))
+    except asyncio.TimeoutError:
+        processor_stats['timeouts'] += 1
+        logs.logger.warning(
+            f'Processor {processor.name} was cancelled after {processor.timeout} seconds. Message: {message.jump_url}'
+        )
+    except discord.errors.Forbidden:
+        pass
+    except Exception as error:
+        processor_stats['errors'] += 1
+        traceback_str = "".join(traceback.format_tb(error.__traceback__))
+        await errors.log_error(
+            f'- Processor: {processor.name}\n- Error: {error}\n- Traceback:\n{traceback_str}', message
+        )
+        if settings.DEBUG_MODE: await functions.add_warning_reaction(message)
+    finally:
+        processor_stats['latencies'].append(time.monotonic() - start_time)
+    return False
+
+
+async def run_processors(processors: List[Processor], context: MessageContext,
+                         on_reaction: Callable[[], Awaitable[None]],
+                         on_settled: Optional[Callable[[], None]] = None) -> None:
+    """Runs processors concurrently, skipping those that are not enabled for the message (see
+    is_processor_enabled) and helpers while Molly is overloaded. A processor with "after" waits until those of its
+    dependencies that run for this message are finished. on_reaction is called once, as soon as the first processor
+    asks for a logo reaction, so fast processors don't have to wait for interactive ones.
+    on_settled is called once all processors with a time budget are finished. Interactive processors may still be
+    running at that point.
+    """
+    async def run_after(processor: Processor, dependencies: List[asyncio.Task]) -> bool:
+        if dependencies: await asyncio.wait(dependencies)
+        if processor.priority >= admission.PRIORITY_HELPERS and admission.shed_helper(): return False
+        try:
+            if not await is_processor_enabled(processor, context): return False
+        except Exception as error:
+            await errors.log_error(error, context.message)
+            return False
+        return await _run_processor(processor, context)
+
+    tasks = {}
+    for processor in processors:
+        dependencies = [tasks[name] for name in processor.after if name in tasks]
+        tasks[processor.name] = asyncio.ensure_future(run_after(processor, dependencies))
+    if on_settled is not None:
+        budgeted_tasks = [tasks[processor.name] for processor in processors if processor.timeout is not None]
+        if budgeted_tasks:
+            asyncio.gather(*budgeted_tasks).add_done_callback(lambda _: on_settled())
+        else:
+            on_settled()
+    reaction_added = False
+    for task in asyncio.as_completed(tasks.values()):
+        if await task and not reaction_added:
+            reaction_added = True
+            await on_reaction()
+
+
+def get_stats() -> Dict[str, Dict[str, Any]]:
+    """Returns calls, errors, timeouts and latencies (in seconds) per processor"""
+    processor_stats = {}
+    for name, stats in _stats.items():
+        latencies = sorted(stats['latencies'])
+        processor_stats[name] = {
+            'calls': stats['calls'],
+            'errors': stats['errors'],
+            'timeouts': stats['timeouts'],
+            'latency_p50': latencies[len(latencies) // 2] if latencies else 0,
+            'latency_p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0,
+        }
+    return processor_stats
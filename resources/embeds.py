@@ -0,0 +1,167 @@
+# embeds.py
+"""Contains EmbedData, the read-only view on a game message that is handed to all processors"""
+
+from collections.abc import Mapping
+from typing import Any, Dict, FrozenSet, Iterator, Optional, Tuple
+
+import discord
+
+
+FIELD_COUNT = 6 # Amount of embed fields that are available as field0, field1, ...
+KEYS = ('author', 'description', *(f'field{index}' for index in range(FIELD_COUNT)), 'footer', 'title')
+
+
+class EmbedData(Mapping):
+    """Immutable view on the first embed and the content of a message.
+
+    It behaves like the dict the old parse_embed returned, e.g. embed_data['author']['name'] or
+    embed_data['field0']['value']. All keys always exist and are empty strings if not set in the embed.
+    Values are only read from the embed when they are first accessed and are then cached.
+
+    Message parts (see resources.dispatcher.PARTS) are also available as plain text with text() and lowercased with
+    lower(). Lowercased parts are cached as well, so every part is only lowercased once per message, no matter how
+    many processors check it.
+
+    Additional values like the embed user are not part of the embed and are added with with_context(). The detection
+    cog always adds 'context' (see resources.dispatcher.MessageContext), 'embed_user' and 'changed_parts' (see
+    get_changed_parts, None if the message is new).
+
+    Two EmbedData objects are equal if their embeds are equal. Context and content are not compared.
+    """
+    __slots__ = ('_content', '_context', '_embed', '_key', '_lower', '_values')
+
+    def __init__(self, message: discord.Message) -> None:
+        self._content: str = message.content
+        self._context: Dict[str, Any] = {}
+        self._embed: Optional[discord.Embed] = message.embeds[0] if message.embeds else None
+        self._key: Optional[Tuple] = None
+        self._lower: Dict[str, str] = {}
+        self._values: Dict[str, Any] = {}
+
+    def _read(self, key: str) -> Any:
+        """Reads a key from the embed"""
+        embed = self._embed
+        if key in ('description', 'title'):
+            if embed is None: return ''
+            value = getattr(embed, key)
+            return value if value is not None else ''
+        if key in ('author', 'footer'):
+            text_attribute = 'name' if key == 'author' else 'text'
+            value = {'icon_url': '', text_attribute: ''}
+            if embed is None: return value
+            embed_part = getattr(embed, key)
+            if embed_part is not None:
+                if embed_part.icon_url is not None: value['icon_url'] = embed_part.icon_url
+                text = getattr(embed_part, text_attribute)
+                if text is not None: value[text_attribute] = text
+            return value
+        if key.startswith('field') and key[5:].isdigit() and int(key[5:]) < FIELD_COUNT:
+            value = {'name': '', 'value': ''}
+            if embed is None: return value
+            field_index = int(key[5:])
+            if field_index < len(embed.fields):
+                field = embed.fields[field_index]
+                value['name'] = field.name
+                value['value'] = field.value
+            return value
+        raise KeyError(key)
+
+    # Mapping
+    def __getitem__(self, key: str) -> Any:
+        if key in self._context: return self._context[key]
+        value = self._values.get(key, None)
+        if value is None:
+            value = self._values[key] = self._read(key)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        yield from KEYS
+        yield from self._context
+
+    def __len__(self) -> int:
+        return len(KEYS) + len(self._context)
+
+    def __contains__(self, key: object) -> bool:
+        return key in KEYS or key in self._context
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, EmbedData): return self.key == other.key
+        if isinstance(other, Mapping): return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __repr__(self) -> str:
+        return f'EmbedData({dict(self.items())!r})'
+
+    @property
+    def key(self) -> Tuple:
+        """Structural key of the embed data, used for equality and hashing"""
+        if self._key is None:
+            key = []
+            for embed_key in KEYS:
+                value = self[embed_key]
+                key.append(tuple(value.values()) if isinstance(value, dict) else value)
+            self._key = tuple(key)
+        return self._key
+
+    # Message parts
+    def text(self, part: str) -> str:
+        """Returns the text of a message part, e.g. 'author', 'field0.value' or 'content'"""
+        if part == 'content': return self._content
+        if part == 'author': return self['author']['name']
+        if part == 'footer': return self['footer']['text']
+        if '.' in part:
+            field, key = part.split('.')
+            return self[field][key]
+        return self[part]
+
+    def lower(self, part: str) -> str:
+        """Returns the lowercased text of a message part"""
+        text = self._lower.get(part, None)
+        if text is None:
+            text = self._lower[part] = self.text(part).lower()
+        return text
+
+    # Context
+    def with_context(self, **values) -> 'EmbedData':
+        """Returns a copy with additional keys that are not part of the embed (e.g. embed_user).
+        The copy shares all cached values with this object.
+        """
+        embed_data = EmbedData.__new__(EmbedData)
+        embed_data._content = self._content
+        embed_data._context = {**self._context, **values}
+        embed_data._embed = self._embed
+        embed_data._key = self._key
+        embed_data._lower = self._lower
+        embed_data._values = self._values
+        return embed_data
+
+
+# --- Fingerprints ---
+def get_fingerprint(message: discord.Message) -> Dict[str, int]:
+    """Returns a hash for every part of a message (see resources.dispatcher.PARTS), including all embed fields and
+    'components'. This only reads the message attributes and is a lot cheaper than parsing the message.
+    """
+    fingerprint = {'content': hash(message.content)}
+    if message.embeds:
+        embed = message.embeds[0]
+        fingerprint['title'] = hash(embed.title)
+        fingerprint['description'] = hash(embed.description)
+        if embed.author is not None: fingerprint['author'] = hash((embed.author.name, embed.author.icon_url))
+        if embed.footer is not None: fingerprint['footer'] = hash((embed.footer.text, embed.footer.icon_url))
+        for field_index, field in enumerate(embed.fields):
+            fingerprint[f'field{field_index}.name'] = hash(field.name)
+            fingerprint[f'field{field_index}.value'] = hash(field.value)
+    if message.components:
+        fingerprint['components'] = hash(repr([row.to_dict() for row in message.components]))
+    return fingerprint
+
+
+def get_changed_parts(fingerprint_before: Dict[str, int], fingerprint_after: Dict[str, int]) -> FrozenSet[str]:
+    """Returns the message parts that differ between two fingerprints. Empty if nothing changed."""
+    return frozenset(
+        part for part in fingerprint_before.keys() | fingerprint_after.keys()
+        if fingerprint_before.get(part, None) != fingerprint_after.get(part, None)
+    )
@@ -1,9 +1,10 @@
 # functions.py
 
 import asyncio
+from collections import OrderedDict
 from datetime import timedelta
 import re
-from typing import Any, Coroutine, List, Optional, Union
+from typing import Any, Coroutine, Dict, List, Optional, Tuple, Union
 
 import discord
 from discord.ext import commands
@@ -11,7 +12,7 @@ from discord import utils
 
 from database import cooldowns, errors, reminders, upgrades, users
 from database import settings as settings_db
-from resources import emojis, exceptions, functions, regex, settings, strings, views
+from resources import emojis, exceptions, functions, outbound, regex, settings, strings, views
 
 
 # --- Get discord data ---
@@ -25,10 +26,54 @@ async def get_interaction(message: discord.Message) -> discord.Interaction:
     return message.interaction
 
 
+# Interaction users (None if there is none). The interaction of a message never changes, so edits of a game message
+# and other game messages replying to the same message can reuse it. There are two kinds of keys:
+# ('message', message id): The result of get_interaction_user for that message. For a reply, this is the user of
+# the referenced message.
+# ('interaction_of', message id): The user of the interaction of that message itself.
+_INTERACTION_USER_CACHE = OrderedDict()
+_INTERACTION_USER_CACHE_SIZE = 10_000
+_interaction_user_cache_stats = {'hits': 0, 'misses': 0, 'fetches': 0}
+
+
 async def get_interaction_user(message: discord.Message) -> discord.User:
-    """Returns the user object if the message was triggered by a slash command. Returns None if no user was found."""
-    interaction = await get_interaction(message)
-    return interaction.user if interaction is not None else None
+    """Returns the user object if the message was triggered by a slash command. Returns None if no user was found.
+    Results are cached by message id and by the id of the message the interaction belongs to, so a referenced message
+    is only fetched once.
+    """
+    if message.reference is not None:
+        interaction_message_id = message.reference.message_id
+    else:
+        interaction_message_id = message.id
+    cache_keys = [('message', message.id)]
+    if interaction_message_id is not None: cache_keys.append(('interaction_of', interaction_message_id))
+    for cache_key in cache_keys:
+        if cache_key in _INTERACTION_USER_CACHE:
+            _interaction_user_cache_stats['hits'] += 1
+            _INTERACTION_USER_CACHE.move_to_end(cache_key)
+            user = _INTERACTION_USER_CACHE[cache_key]
+            break
+    else:
+        _interaction_user_cache_stats['misses'] += 1
+        interaction_message = message
+        if message.reference is not None:
+            interaction_message = message.reference.cached_message
+            if interaction_message is None:
+                interaction_message = await message.channel.fetch_message(message.reference.message_id)
+                _interaction_user_cache_stats['fetches'] += 1
+        interaction = interaction_message.interaction
+        user = interaction.user if interaction is not None else None
+    for cache_key in cache_keys:
+        _INTERACTION_USER_CACHE[cache_key] = user
+        _INTERACTION_USER_CACHE.move_to_end(cache_key)
+    while len(_INTERACTION_USER_CACHE) > _INTERACTION_USER_CACHE_SIZE:
+        _INTERACTION_USER_CACHE.popitem(last=False)
+    return user
+
+
+def get_interaction_user_cache_stats() -> Dict[str, int]:
+    """Returns the size of the interaction user cache, its hits and misses and the messages fetched on misses"""
+    return {'size': len(_INTERACTION_USER_CACHE), **_interaction_user_cache_stats}
 
 
 async def get_discord_user(bot: discord.Bot, user_id: int) -> discord.User:
@@ -66,7 +111,7 @@ async def add_logo_reaction(message: discord.Message) -> None:
         if reaction.emoji == emojis.LOGO:
             reaction_exists = True
             break
-    if not reaction_exists: await message.add_reaction(emojis.LOGO)
+    if not reaction_exists: await outbound.add_reaction(message, emojis.LOGO)
         
 
 async def add_reminder_reaction(message: discord.Message, reminder: reminders.Reminder,  user_settings: users.User) -> None:
@@ -96,6 +141,41 @@ async def get_match_from_patterns(patterns: List[str], string: str) -> re.Match:
     return match
 
 
+# --- Message templates ---
+_TEMPLATE_CACHE = {}
+_TEMPLATE_CACHE_SIZE = 1_000
+_TEMPLATE_PLACEHOLDER = re.compile(r'{([a-z_]+)}')
+
+
+def compile_template(template: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Splits a message template into its text parts and placeholder slots. Compiled templates are cached.
+
+    Returns
+    -------
+    Tuple with the text parts and a tuple with the placeholder names. There is always one more text part than
+    placeholders, the message is text part 0 + placeholder 0 + text part 1 + ...
+    """
+    compiled_template = _TEMPLATE_CACHE.get(template, None)
+    if compiled_template is None:
+        parts = _TEMPLATE_PLACEHOLDER.split(template)
+        compiled_template = (tuple(parts[0::2]), tuple(parts[1::2]))
+        if len(_TEMPLATE_CACHE) >= _TEMPLATE_CACHE_SIZE:
+            del _TEMPLATE_CACHE[next(iter(_TEMPLATE_CACHE))]
+        _TEMPLATE_CACHE[template] = compiled_template
+    return compiled_template
+
+
+def format_template(template: str, values: Dict[str, str]) -> str:
+    """Fills the placeholders of a message template with values. Placeholders without a value are left as they are."""
+    text_parts, placeholders = compile_template(template)
+    message_parts = [text_parts[0]]
+    for placeholder, text_part in zip(placeholders, text_parts[1:]):
+        value = values.get(placeholder, None)
+        message_parts.append(f'{{{placeholder}}}' if value is None else value)
+        message_parts.append(text_part)
+    return ''.join(message_parts)
+
+
 # --- Time calculations ---
 async def get_guild_member_by_name(guild: discord.Guild, user_name: str,
                                    bot_users_only: Optional[bool] = True) -> List[discord.Member]:
@@ -112,6 +192,32 @@ async def get_guild_member_by_name(guild: discord.Guild, user_name: str,
     return members
 
 
+async def get_guild_members_by_names(guild: discord.Guild, user_names: List[str],
+                                     bot_users_only: Optional[bool] = True) -> Dict[str, List[discord.Member]]:
+    """Returns all guild members found by the given names. Goes through the guild members once for all names.
+
+    Returns
+    -------
+    Dict[user_name: List[discord.Member]]. Names without members have an empty list.
+    """
+    encoded_user_names = {}
+    for user_name in user_names:
+        encoded_user_names.setdefault(await encode_text(user_name), []).append(user_name)
+    members = {user_name: [] for user_name in user_names}
+    for member in guild.members:
+        if member.bot: continue
+        matching_user_names = encoded_user_names.get(await encode_text(member.name), None)
+        if matching_user_names is None: continue
+        if bot_users_only:
+            try:
+                await users.get_user(member.id)
+            except exceptions.FirstTimeUserError:
+                continue
+        for user_name in matching_user_names:
+            members[user_name].append(member)
+    return members
+
+
 async def calculate_time_left_from_cooldown(message: discord.Message, user_settings: users.User, activity: str) -> timedelta:
     """Returns the time left for a reminder based on a cooldown."""
     slash_command = True if message.interaction is not None else False
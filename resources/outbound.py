@@ -0,0 +1,369 @@
+# outbound.py
+"""Contains the outbound request scheduler.
+
+Everything Molly sends on her own (reminders, helper replies, helper edits, logo reactions) goes through a per-channel
+priority queue. Each channel has one worker that works through its queue in priority order and paces itself with
+token buckets that mirror the Discord rate limits, so low priority work can't push reminders into a 429 backoff.
+
+Edits are diff-only and debounced: an edit that wouldn't change the message is skipped, and a message is edited at
+most once per EDIT_DEBOUNCE seconds. Edits within that window replace each other, so only the latest one is sent.
+"""
+
+import asyncio
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+import heapq
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import discord
+
+from resources import logs
+
+
+PRIORITY_REMINDER = 0
+PRIORITY_REPLY = 1
+PRIORITY_EDIT = 2
+PRIORITY_REACTION = 3
+
+PRIORITY_NAMES = {
+    PRIORITY_REMINDER: 'Reminders',
+    PRIORITY_REPLY: 'Replies',
+    PRIORITY_EDIT: 'Edits',
+    PRIORITY_REACTION: 'Reactions',
+}
+
+# Rate limits as (amount, seconds). These are a bit below the actual Discord limits to leave some headroom.
+GLOBAL_RATE_LIMIT = (45, 1)
+CHANNEL_RATE_LIMITS = {
+    'send': (5, 5),
+    'edit': (5, 5),
+    'reaction': (4, 1),
+}
+# Global tokens that are kept free for reminders and replies. Edits and reactions wait if there are less left.
+GLOBAL_RESERVE = 10
+# Seconds after which a queued reaction is dropped instead of sent
+REACTION_MAX_AGE = 30
+LATENCY_SAMPLE_SIZE = 1_000
+# Minimum seconds between two edits of the same message
+EDIT_DEBOUNCE = 1.0
+# Amount of messages the last sent payload is remembered for
+EDIT_STATE_CACHE_SIZE = 5_000
+
+
+class _RateBucket():
+    """Token bucket. Allows 'amount' requests per 'per' seconds with bursts up to 'amount'."""
+    def __init__(self, amount: int, per: float) -> None:
+        self.capacity = amount
+        self.tokens = float(amount)
+        self.rate = amount / per
+        self.updated = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def refill_time(self) -> float:
+        """Returns the seconds until the bucket is full again"""
+        self.refill()
+        return (self.capacity - self.tokens) / self.rate
+
+    def wait_time(self, reserve: int = 0) -> float:
+        """Returns the seconds until a token is available while leaving 'reserve' tokens in the bucket"""
+        self.refill()
+        return max(0.0, (1 + reserve - self.tokens) / self.rate)
+
+    def take(self) -> None:
+        """Takes a token. Only call this right after wait_time returned 0."""
+        self.tokens -= 1
+
+
+@dataclass
+class _Request():
+    """Queued outbound request"""
+    bucket_name: str
+    factory: Callable[[], Awaitable[Any]]
+    future: asyncio.Future
+    merge_key: Optional[Tuple[Any, ...]]
+    max_age: Optional[float]
+    priority: int
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+_global_bucket = _RateBucket(*GLOBAL_RATE_LIMIT)
+_channel_buckets: Dict[Tuple[int, str], _RateBucket] = {}
+_channel_queues: Dict[int, list] = {}
+_channel_workers: Dict[int, asyncio.Task] = {}
+_channel_wakeups: Dict[int, asyncio.Event] = {}
+_pending_merges: Dict[Tuple[Any, ...], _Request] = {}
+_sequence = itertools.count()
+
+_stats = {
+    priority: {'queued': 0, 'sent': 0, 'failed': 0, 'merged': 0, 'dropped': 0,
+               'latencies': deque(maxlen=LATENCY_SAMPLE_SIZE)}
+    for priority in PRIORITY_NAMES
+}
+_max_queue_depth = 0
+
+# Message id -> (fingerprint of the last payload sent, monotonic time of the last edit)
+_edit_states = OrderedDict()
+_debounced_edits: Dict[int, asyncio.Task] = {}
+_edit_stats = {'skipped': 0, 'debounced': 0}
+
+
+# --- Internal ---
+def _drop_channel_bucket(bucket_key: Tuple[int, str], bucket: _RateBucket) -> None:
+    """Removes a channel bucket once it is full again, as it holds no information anymore at that point"""
+    if _channel_buckets.get(bucket_key) is bucket and bucket_key[0] not in _channel_workers:
+        del _channel_buckets[bucket_key]
+
+
+def _get_channel_bucket(channel_id: int, bucket_name: str) -> _RateBucket:
+    bucket_key = (channel_id, bucket_name)
+    bucket = _channel_buckets.get(bucket_key, None)
+    if bucket is None:
+        bucket = _channel_buckets[bucket_key] = _RateBucket(*CHANNEL_RATE_LIMITS[bucket_name])
+    return bucket
+
+
+async def _process_channel_queue(channel_id: int) -> None:
+    """Works through the queue of a channel until it is empty.
+    The request at the head of the queue is only taken out once its tokens are available. While it waits, a request
+    with a higher priority that is queued in the meantime becomes the new head and goes first.
+    """
+    queue = _channel_queues[channel_id]
+    wakeup = _channel_wakeups[channel_id] = asyncio.Event()
+    try:
+        while queue:
+            priority, _, request = queue[0]
+            expired = request.max_age is not None and time.monotonic() - request.queued_at > request.max_age
+            if not request.future.done() and not expired:
+                channel_bucket = _get_channel_bucket(channel_id, request.bucket_name)
+                wait_time = max(channel_bucket.wait_time(),
+                                _global_bucket.wait_time(GLOBAL_RESERVE if priority >= PRIORITY_EDIT else 0))
+                if wait_time > 0:
+                    wakeup.clear()
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), wait_time)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+            heapq.heappop(queue)
+            if request.merge_key is not None and _pending_merges.get(request.merge_key) is request:
+                del _pending_merges[request.merge_key]
+            if request.future.done(): continue
+            if expired:
+                _stats[priority]['dropped'] += 1
+                request.future.set_result(None)
+                continue
+            channel_bucket.take()
+            _global_bucket.take()
+            try:
+                result = await request.factory()
+            except Exception as error:
+                _stats[priority]['failed'] += 1
+                if not request.future.done(): request.future.set_exception(error)
+            else:
+                _stats[priority]['sent'] += 1
+                if not request.future.done(): request.future.set_result(result)
+            _stats[priority]['latencies'].append(time.monotonic() - request.queued_at)
+    except Exception as error:
+        logs.logger.error(f'Outbound queue of channel {channel_id} stopped: {error}')
+        for _, _, request in queue:
+            if not request.future.done(): request.future.set_exception(error)
+    finally:
+        _channel_queues.pop(channel_id, None)
+        _channel_workers.pop(channel_id, None)
+        _channel_wakeups.pop(channel_id, None)
+        loop = asyncio.get_running_loop()
+        for bucket_name in CHANNEL_RATE_LIMITS:
+            bucket_key = (channel_id, bucket_name)
+            bucket = _channel_buckets.get(bucket_key, None)
+            if bucket is not None:
+                loop.call_later(bucket.refill_time(), _drop_channel_bucket, bucket_key, bucket)
+
+
+def _get_payload_fingerprint(kwargs: Dict[str, Any]) -> Optional[int]:
+    """Returns a hash of a message payload. Returns None if the payload contains something that can't be compared
+    (e.g. a view), so such edits are never skipped.
+    """
+    payload = []
+    for key, value in sorted(kwargs.items()):
+        if key == 'content':
+            payload.append((key, value))
+        elif key == 'embed':
+            payload.append((key, value.to_dict() if value is not None else None))
+        elif key == 'embeds':
+            payload.append((key, [embed.to_dict() for embed in value]))
+        else:
+            return None
+    return hash(repr(payload))
+
+
+def _remember_payload(message_id: int, fingerprint: Optional[int], edited_at: float = 0) -> None:
+    """Stores the last payload sent to a message"""
+    _edit_states[message_id] = (fingerprint, edited_at)
+    _edit_states.move_to_end(message_id)
+    while len(_edit_states) > EDIT_STATE_CACHE_SIZE:
+        _edit_states.popitem(last=False)
+
+
+def _is_unchanged(message_id: int, fingerprint: Optional[int]) -> bool:
+    """Returns True if the payload is the same as the last one sent to the message"""
+    if fingerprint is None: return False
+    edit_state = _edit_states.get(message_id, None)
+    return edit_state is not None and edit_state[0] == fingerprint
+
+
+async def _edit_if_changed(message: discord.Message, kwargs: Dict[str, Any]) -> Optional[discord.Message]:
+    """Edits a message unless the payload is the same as the last one sent. The payload is compared when the edit
+    is sent, as helpers change their embed in place while the edit is queued.
+    """
+    fingerprint = _get_payload_fingerprint(kwargs)
+    if _is_unchanged(message.id, fingerprint):
+        _edit_stats['skipped'] += 1
+        return message
+    result = await message.edit(**kwargs)
+    _remember_payload(message.id, fingerprint, time.monotonic())
+    return result
+
+
+async def _reply_and_remember(message: discord.Message, kwargs: Dict[str, Any]) -> Optional[discord.Message]:
+    """Replies to a message and remembers the payload of the reply, so a first edit without changes is skipped"""
+    fingerprint = _get_payload_fingerprint(kwargs)
+    reply_message = await message.reply(**kwargs)
+    if fingerprint is not None and reply_message is not None:
+        _remember_payload(reply_message.id, fingerprint)
+    return reply_message
+
+
+async def _submit_edit(message: discord.Message, kwargs: Dict[str, Any]) -> Optional[discord.Message]:
+    if _pending_merges.get(('edit', message.id), None) is None:
+        if _is_unchanged(message.id, _get_payload_fingerprint(kwargs)):
+            _edit_stats['skipped'] += 1
+            return message
+    edit_state = _edit_states.get(message.id, None)
+    if edit_state is not None: _edit_states[message.id] = (edit_state[0], time.monotonic())
+    return await _submit(message.channel.id, PRIORITY_EDIT, 'edit', lambda: _edit_if_changed(message, kwargs),
+                         merge_key=('edit', message.id))
+
+
+async def _send_debounced_edit(message: discord.Message, delay: float, kwargs: Dict[str, Any]) -> None:
+    """Sends an edit once the debounce window of the message is over, unless a newer edit replaced it"""
+    await asyncio.sleep(delay)
+    if _debounced_edits.get(message.id, None) is asyncio.current_task():
+        del _debounced_edits[message.id]
+    try:
+        await _submit_edit(message, kwargs)
+    except (discord.NotFound, discord.Forbidden):
+        pass
+    except Exception as error:
+        logs.logger.error(f'Debounced edit of message {message.id} failed: {error}')
+
+
+async def _submit(channel_id: int, priority: int, bucket_name: str, factory: Callable[[], Awaitable[Any]],
+                  merge_key: Optional[Tuple[Any, ...]] = None, max_age: Optional[float] = None) -> Any:
+    """Queues a request and waits until it was sent.
+
+    Arguments
+    ---------
+    channel_id: ID of the channel the request goes to. Requests are queued and paced per channel.
+    priority: One of the PRIORITY constants. Lower values are sent first.
+    bucket_name: Name of the channel rate limit bucket the request counts against (see CHANNEL_RATE_LIMITS).
+    factory: Callable that returns the awaitable doing the actual request.
+    merge_key: If set, a request with the same key that is still queued is superseded by this one.
+    max_age: If set, the request is dropped if it was queued for longer than this amount of seconds.
+
+    Returns
+    -------
+    The result of the request or None if the request was superseded or dropped.
+
+    Raises
+    ------
+    Any exception the request itself raises (e.g. discord.errors.Forbidden).
+    """
+    global _max_queue_depth
+    loop = asyncio.get_running_loop()
+    request = _Request(bucket_name, factory, loop.create_future(), merge_key, max_age, priority)
+    if merge_key is not None:
+        superseded_request = _pending_merges.get(merge_key, None)
+        if superseded_request is not None and not superseded_request.future.done():
+            _stats[superseded_request.priority]['merged'] += 1
+            superseded_request.future.set_result(None)
+        _pending_merges[merge_key] = request
+    queue = _channel_queues.setdefault(channel_id, [])
+    heapq.heappush(queue, (priority, next(_sequence), request))
+    _stats[priority]['queued'] += 1
+    _max_queue_depth = max(_max_queue_depth, len(queue))
+    wakeup = _channel_wakeups.get(channel_id, None)
+    if wakeup is not None: wakeup.set()
+    if channel_id not in _channel_workers:
+        _channel_workers[channel_id] = loop.create_task(_process_channel_queue(channel_id))
+    return await request.future
+
+
+# --- Requests ---
+async def send(channel: discord.abc.Messageable, priority: int = PRIORITY_REMINDER, **kwargs) -> Optional[discord.Message]:
+    """Sends a message to a channel. Keyword arguments are passed to channel.send."""
+    return await _submit(channel.id, priority, 'send', lambda: channel.send(**kwargs))
+
+
+async def reply(message: discord.Message, priority: int = PRIORITY_REPLY, **kwargs) -> Optional[discord.Message]:
+    """Replies to a message. Keyword arguments are passed to message.reply."""
+    return await _submit(message.channel.id, priority, 'send', lambda: _reply_and_remember(message, kwargs))
+
+
+async def edit(message: discord.Message, **kwargs) -> Optional[discord.Message]:
+    """Edits a message. Keyword arguments are passed to message.edit.
+    The edit is skipped if it wouldn't change the message. If there is still an older edit of the same message queued,
+    that edit is dropped, as this one replaces it anyway.
+    If the message was edited less than EDIT_DEBOUNCE seconds ago, the edit is sent once that time has passed and this
+    returns None right away. Errors of such an edit are logged instead of raised.
+    """
+    debounced_edit = _debounced_edits.pop(message.id, None)
+    if debounced_edit is not None and not debounced_edit.done():
+        debounced_edit.cancel()
+        _edit_stats['debounced'] += 1
+    edit_state = _edit_states.get(message.id, None)
+    delay = edit_state[1] + EDIT_DEBOUNCE - time.monotonic() if edit_state is not None else 0
+    if delay > 0:
+        _debounced_edits[message.id] = asyncio.get_running_loop().create_task(
+            _send_debounced_edit(message, delay, kwargs)
+        )
+        return None
+    return await _submit_edit(message, kwargs)
+
+
+async def add_reaction(message: discord.Message, emoji: Any) -> None:
+    """Adds a reaction to a message. The reaction is dropped if it couldn't be sent within REACTION_MAX_AGE."""
+    await _submit(message.channel.id, PRIORITY_REACTION, 'reaction', lambda: message.add_reaction(emoji),
+                  merge_key=('reaction', message.id, str(emoji)), max_age=REACTION_MAX_AGE)
+
+
+# --- Stats ---
+def get_stats() -> Dict[str, Any]:
+    """Returns the current queue depth, the edits saved and the counters and send latencies (in seconds) per priority
+    class
+    """
+    priorities = {}
+    for priority, priority_stats in _stats.items():
+        latencies = sorted(priority_stats['latencies'])
+        priorities[PRIORITY_NAMES[priority]] = {
+            'queued': priority_stats['queued'],
+            'sent': priority_stats['sent'],
+            'failed': priority_stats['failed'],
+            'merged': priority_stats['merged'],
+            'dropped': priority_stats['dropped'],
+            'latency_p50': latencies[len(latencies) // 2] if latencies else 0,
+            'latency_p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0,
+        }
+    return {
+        'queue_depth': sum(len(queue) for queue in _channel_queues.values()),
+        'active_channels': len(_channel_workers),
+        'max_queue_depth': _max_queue_depth,
+        'edits_skipped': _edit_stats['skipped'],
+        'edits_debounced': _edit_stats['debounced'],
+        'priorities': priorities,
+    }
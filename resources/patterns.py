@@ -0,0 +1,64 @@
+# patterns.py
+"""Contains a multi-pattern string matcher (Aho-Corasick).
+
+The matcher is built once from any amount of search strings and then finds all of them in a text in a single pass,
+so the matching cost only depends on the length of the text, not on how many strings there are.
+"""
+
+from collections import deque
+from typing import Iterable, List, Set, Tuple
+
+
+class PatternMatcher():
+    """Finds all occurences of a fixed set of strings in a text in one pass.
+
+    Arguments
+    ---------
+    patterns: The strings to look for. Duplicates are ignored. Matching is case sensitive, so lowercase both the
+    patterns and the text if you want case insensitive matching.
+    """
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self.patterns: Tuple[str, ...] = tuple(pattern for pattern in dict.fromkeys(patterns) if pattern)
+        self._transitions: List[dict] = [{}]
+        self._fallbacks: List[int] = [0]
+        self._outputs: List[Tuple[int, ...]] = [()]
+        for pattern_index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                next_state = self._transitions[state].get(char, None)
+                if next_state is None:
+                    next_state = len(self._transitions)
+                    self._transitions.append({})
+                    self._fallbacks.append(0)
+                    self._outputs.append(())
+                    self._transitions[state][char] = next_state
+                state = next_state
+            self._outputs[state] += (pattern_index,)
+        # Breadth first, so the fallback of a state is always finished before the states below it need it
+        queue = deque(self._transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._transitions[state].items():
+                queue.append(next_state)
+                fallback = self._fallbacks[state]
+                while fallback and char not in self._transitions[fallback]:
+                    fallback = self._fallbacks[fallback]
+                fallback = self._transitions[fallback].get(char, 0)
+                self._fallbacks[next_state] = fallback
+                self._outputs[next_state] += self._outputs[fallback]
+
+    def search(self, text: str) -> Set[int]:
+        """Returns the indexes (in self.patterns) of all patterns that occur in the text"""
+        transitions = self._transitions
+        fallbacks = self._fallbacks
+        outputs = self._outputs
+        found = set()
+        state = 0
+        for char in text:
+            next_state = transitions[state].get(char, None)
+            while next_state is None and state:
+                state = fallbacks[state]
+                next_state = transitions[state].get(char, None)
+            state = next_state or 0
+            if outputs[state]: found.update(outputs[state])
+        return found
@@ -0,0 +1,61 @@
+# power.py
+"""Contains the worker power table.
+
+Worker power only depends on the worker type and level, so it is calculated once per (worker type, level) at import
+and looked up by every helper. Levels above MAX_TABLE_LEVEL are calculated on demand.
+"""
+
+from typing import Dict, Tuple
+
+from resources import strings
+
+
+MAX_TABLE_LEVEL = 200
+
+
+def _calculate_power(worker_type: str, level: int) -> float:
+    """Returns the power of a worker type at a level"""
+    worker_stats = strings.WORKER_STATS[worker_type]
+    return (
+        ((worker_stats['speed'] + worker_stats['strength'] + worker_stats['intelligence']))
+        * (1 + (worker_stats['tier']) / 2.5) * (1 + level / 1.25)
+    )
+
+
+POWER_TABLE: Dict[Tuple[str, int], float] = {
+    (worker_type, level): _calculate_power(worker_type, level)
+    for worker_type in strings.WORKER_STATS
+    for level in range(MAX_TABLE_LEVEL + 1)
+}
+
+
+def get_power(worker_type: str, level: int) -> float:
+    """Returns the power of a worker type at a level.
+
+    Raises
+    ------
+    KeyError if the worker type doesn't exist.
+    """
+    worker_power = POWER_TABLE.get((worker_type, level), None)
+    if worker_power is None: worker_power = _calculate_power(worker_type, level)
+    return worker_power
+
+
+def score_roster(worker_levels: Dict[str, int]) -> Dict[str, float]:
+    """Returns the power of all workers of a roster.
+
+    Arguments
+    ---------
+    worker_levels: Dict[worker_name: worker_level]
+
+    Returns
+    -------
+    Dict[worker_name: worker_power] in the same order as worker_levels.
+    """
+    table_get = POWER_TABLE.get
+    workers_power = {}
+    for worker_name, worker_level in worker_levels.items():
+        worker_power = table_get((worker_name, worker_level), None)
+        if worker_power is None: worker_power = _calculate_power(worker_name, worker_level)
+        workers_power[worker_name] = worker_power
+    return workers_power
@@ -0,0 +1,101 @@
+# router.py
+"""Contains the front door for all incoming messages.
+
+Every message is classified exactly once (see classify_message) and then handed to the one handler registered for its
+route. Ordinary chat is dropped with a few id and prefix checks, without waking any cog and without a database query
+(guild prefixes are cached, see database.guilds.get_prefix).
+"""
+
+from typing import Awaitable, Callable, Dict, Optional
+
+import discord
+from discord.ext import commands
+
+from database import guilds
+from resources import settings
+
+
+ROUTE_IGNORED = 'ignored'
+ROUTE_GAME = 'game' # Messages sent by the game bot
+ROUTE_GAME_COMMAND = 'game_command' # Commands for the game bot, stored in the message cache
+ROUTE_COMMAND = 'command' # Molly prefix commands, including commands after a mention
+ROUTE_MENTION = 'mention' # Messages that only mention Molly
+
+GAME_BOT_IDS = frozenset((settings.GAME_ID, settings.TESTY_ID))
+GAME_COMMAND_PREFIXES = ('idle ', 'testy ')
+
+_handlers: Dict[str, Callable[[discord.Message], Awaitable[None]]] = {}
+_stats = {
+    ROUTE_GAME: 0,
+    ROUTE_GAME_COMMAND: 0,
+    ROUTE_COMMAND: 0,
+    ROUTE_MENTION: 0,
+    'rejected_bot': 0,
+    'rejected_private': 0,
+    'rejected_empty': 0,
+    'rejected_no_prefix': 0,
+}
+
+
+def register_handler(route: str, handler: Callable[[discord.Message], Awaitable[None]]) -> None:
+    """Sets the handler for a route. Registering a handler again (e.g. after a cog reload) replaces the old one."""
+    _handlers[route] = handler
+
+
+def _get_bot_mention_rest(bot: commands.Bot, content: str) -> Optional[str]:
+    """Returns the content after a leading mention of the bot. Returns None if the content doesn't start with one."""
+    for mention in (f'<@{bot.user.id}>', f'<@!{bot.user.id}>'):
+        if content.startswith(mention): return content[len(mention):]
+    return None
+
+
+async def classify_message(bot: commands.Bot, message: discord.Message) -> str:
+    """Returns the route of a message. Checks are ordered from cheapest to most expensive, the only possible query is
+    the first prefix lookup of a guild.
+    """
+    author = message.author
+    if author.id in GAME_BOT_IDS:
+        return ROUTE_GAME
+    if author.bot:
+        _stats['rejected_bot'] += 1
+        return ROUTE_IGNORED
+    content = message.content
+    if not content:
+        _stats['rejected_empty'] += 1
+        return ROUTE_IGNORED
+    if content.startswith('<@'):
+        mention_rest = _get_bot_mention_rest(bot, content)
+        if mention_rest is not None:
+            # The prefix help also works in DMs
+            if mention_rest.replace('<@!','').replace('<@','').replace('>','').replace(str(bot.user.id),'') == '':
+                return ROUTE_MENTION
+            if message.guild is not None: return ROUTE_COMMAND
+    if message.guild is None:
+        _stats['rejected_private'] += 1
+        return ROUTE_IGNORED
+    content_lower = content.lower()
+    # Game commands are checked first, a guild prefix like "i" would otherwise catch every "idle " command
+    if not message.embeds:
+        if content_lower.startswith(GAME_COMMAND_PREFIXES):
+            return ROUTE_GAME_COMMAND
+        if any(mentioned_user.id == settings.GAME_ID for mentioned_user in message.mentions):
+            return ROUTE_GAME_COMMAND
+    prefix = await guilds.get_prefix(message.guild.id)
+    if content_lower.startswith(prefix.lower()):
+        return ROUTE_COMMAND
+    _stats['rejected_no_prefix'] += 1
+    return ROUTE_IGNORED
+
+
+async def route_message(bot: commands.Bot, message: discord.Message) -> None:
+    """Classifies a message and passes it to the handler of its route"""
+    route = await classify_message(bot, message)
+    if route == ROUTE_IGNORED: return
+    _stats[route] += 1
+    handler = _handlers.get(route, None)
+    if handler is not None: await handler(message)
+
+
+def get_stats() -> Dict[str, int]:
+    """Returns the amount of messages per route and the amount of messages rejected at each stage"""
+    return dict(_stats)
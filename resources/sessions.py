@@ -0,0 +1,142 @@
+# sessions.py
+"""Contains the session manager for interactive helpers (raid and teamraid guides).
+
+A session belongs to one game message and runs detached from the detection pass. Edits of game messages are routed
+to their session with a dict lookup (see route_edit, called by cogs.detection), so every edit event costs the same,
+no matter how many sessions are active.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import discord
+
+from database import errors
+from resources import logs, settings
+
+
+MAX_SESSIONS = 500
+MAX_QUEUED_EDITS = 20 # Older edits are dropped if a session can't keep up, the newest edit has the full state anyway
+
+
+class Session():
+    """An interactive helper session for one game message.
+    The handler reads the edits of the game message with wait_for_edit().
+    """
+    def __init__(self, message_id: int, alias: Optional[Tuple[int, str]],
+                 accept: Optional[Callable[[discord.RawMessageUpdateEvent], bool]]) -> None:
+        self.message_id = message_id
+        self.alias = alias
+        self.accept = accept
+        self.edits: asyncio.Queue = asyncio.Queue(maxsize=MAX_QUEUED_EDITS)
+        self.last_activity = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+
+    async def wait_for_edit(self) -> discord.RawMessageUpdateEvent:
+        """Waits for the next edit of the game message.
+
+        Raises
+        ------
+        TimeoutError if there was no edit for settings.INTERACTION_TIMEOUT seconds.
+        """
+        try:
+            payload = await asyncio.wait_for(self.edits.get(), timeout=settings.INTERACTION_TIMEOUT)
+        except asyncio.TimeoutError:
+            _stats['expired'] += 1
+            raise
+        self.last_activity = time.monotonic()
+        return payload
+
+
+_sessions: Dict[int, Session] = {}
+_aliases: Dict[Tuple[int, str], Session] = {}
+_stats = {
+    'started': 0,
+    'rejected': 0,
+    'expired': 0,
+    'failed': 0,
+    'peak': 0,
+    'edits_routed': 0,
+    'edits_dropped': 0,
+}
+
+
+def _get_alias(channel_id: int, data: Dict[str, Any]) -> Optional[Tuple[int, str]]:
+    """Returns the alias key of an edited message (channel id, embed author name)"""
+    try:
+        return (channel_id, data['embeds'][0]['author']['name'])
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+async def _run_session(session: Session, handler: Callable[[Session], Awaitable[None]]) -> None:
+    try:
+        await handler(session)
+    except (discord.NotFound, discord.Forbidden):
+        pass
+    except Exception as error:
+        _stats['failed'] += 1
+        await errors.log_error(error)
+    finally:
+        _sessions.pop(session.message_id, None)
+        if session.alias is not None and _aliases.get(session.alias) is session:
+            del _aliases[session.alias]
+
+
+def start_session(message: discord.Message, handler: Callable[[Session], Awaitable[None]],
+                  accept: Optional[Callable[[discord.RawMessageUpdateEvent], bool]] = None) -> bool:
+    """Starts a detached session for a game message.
+
+    Arguments
+    ---------
+    message: The game message. Its edits are routed to the session by message id. Edits of other messages in the same
+    channel with the same embed author are routed to it as well.
+    handler: Coroutine function that gets the session and runs until the helper is done.
+    accept: Optional check for edits. Edits it returns False for are not passed to the session.
+
+    Returns
+    -------
+    True if the session was started, False if there already is a session for this message or MAX_SESSIONS are
+    active.
+    """
+    if message.id in _sessions or len(_sessions) >= MAX_SESSIONS:
+        _stats['rejected'] += 1
+        logs.logger.warning(f'Session for message {message.id} rejected, {len(_sessions)} sessions active.')
+        return False
+    alias = None
+    if message.embeds and message.embeds[0].author is not None and message.embeds[0].author.name is not None:
+        alias = (message.channel.id, message.embeds[0].author.name)
+    session = Session(message.id, alias, accept)
+    _sessions[message.id] = session
+    if alias is not None: _aliases[alias] = session
+    session.task = asyncio.get_running_loop().create_task(_run_session(session, handler))
+    _stats['started'] += 1
+    _stats['peak'] = max(_stats['peak'], len(_sessions))
+    return True
+
+
+def route_edit(payload: discord.RawMessageUpdateEvent) -> bool:
+    """Passes an edit to the session of the edited message, if there is one.
+
+    Returns
+    -------
+    True if the edit was passed to a session, False otherwise.
+    """
+    session = _sessions.get(payload.message_id, None)
+    if session is None:
+        if not _aliases: return False
+        session = _aliases.get(_get_alias(payload.channel_id, payload.data), None)
+        if session is None: return False
+    if session.accept is not None and not session.accept(payload): return False
+    if session.edits.full():
+        session.edits.get_nowait()
+        _stats['edits_dropped'] += 1
+    session.edits.put_nowait(payload)
+    _stats['edits_routed'] += 1
+    return True
+
+
+def get_stats() -> Dict[str, int]:
+    """Returns the amount of active sessions and the session counters"""
+    return {'active': len(_sessions), **_stats}
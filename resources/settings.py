@@ -91,5 +91,8 @@ DEFAULT_PREFIX = 'molly '
 EMBED_COLOR = 0xEF6180
 ABORT_TIMEOUT = 60
 INTERACTION_TIMEOUT = 300
+PROCESSOR_TIMEOUT = 30 # Seconds a message processor can take before it is cancelled (see resources.dispatcher)
+REMINDER_DELIVERY_WINDOW = 1 # Seconds to wait for more reminders of the same user and channel before sending
+REMINDER_REHYDRATION_GRACE = 300 # Seconds a reminder can be overdue on startup and still be sent
 
 ENERGY_REGEN_MULTIPLIER_EVENT = 1.4
\ No newline at end of file
@@ -0,0 +1,393 @@
+# solvers.py
+"""Contains the solvers used by the raid and teamraid helpers. They are plain functions without Discord objects, see
+benchmarks/solvers.py for timings and correctness checks.
+
+The raid solver doesn't try every order of the workers. A raid is a state search over (remaining workers, current
+enemy, current enemy HP): the outcome of the remaining attacks only depends on that state, not on the order that led
+to it, so every state is solved once. With 6 workers that is at most a few thousand states instead of 720 orders.
+"""
+
+from bisect import bisect_right
+from collections import OrderedDict
+import sys
+from typing import Dict, List, Optional, Tuple
+
+
+SOLUTION_CACHE_SIZE = 10_000
+SUB_SOLUTION_CACHE_SIZE = 20_000
+
+# Raid fingerprint (see get_raid_fingerprint) -> (killed enemies, hp left, worker names in attack order).
+# Sub solutions are kept apart, so the many sub solutions of a solve can't push out solutions that were asked for.
+# They move to the solution cache when they are used.
+_SOLUTION_CACHE = OrderedDict()
+_SUB_SOLUTION_CACHE = OrderedDict()
+_solution_cache_bytes = {'solutions': 0, 'sub_solutions': 0}
+_solution_cache_stats = {'hits': 0, 'sub_solution_hits': 0, 'misses': 0, 'evicted': 0}
+
+
+def get_raid_fingerprint(workers_power: Dict[str, float], enemies_power: Dict[str, Tuple[float, int]]) -> Tuple:
+    """Returns the key of a raid in the solution cache. The solution only depends on the workers (in order) and the
+    power and HP of the enemies, so players with the same workers and enemies share solutions.
+    """
+    return (tuple(workers_power.items()), tuple(enemies_power.values()))
+
+
+def _solve_raid(workers_power: Dict[str, float], enemies_power: Dict[str, Tuple[float, int]],
+                collect_sub_solutions: bool = False) -> Tuple[Tuple[int, int, Tuple[str, ...]], List[Tuple]]:
+    """Solves a raid, see solve_raid.
+
+    Arguments
+    ---------
+    workers_power: Dict[worker_name: worker_power]
+    enemies_power: Dict[enemy_name: (enemy_power, enemy_hp)]
+    collect_sub_solutions: If True, also returns the solutions of all solved states that start right after a kill.
+    These are the raids a player sees if they kill an enemy with a worker the solution didn't recommend.
+
+    Returns
+    -------
+    Tuple with the solution (killed enemies, hp left, worker names in attack order) and a list of sub solutions
+    (raid fingerprint, solution).
+    """
+    if not workers_power: return ((0, 100, ()), [])
+    worker_names = list(workers_power.keys())
+    worker_count = len(worker_names)
+    enemy_names = list(enemies_power.keys())
+    enemies_dead = [enemies_power[name][1] == 0 for name in enemy_names]
+    alive_enemies = [index for index, dead in enumerate(enemies_dead) if not dead]
+    alive_count = len(alive_enemies)
+    enemies_hp = [enemies_power[enemy_names[index]][1] for index in alive_enemies]
+    damage = [
+        [round(85 * workers_power[worker_name] / enemies_power[enemy_names[index]][0]) for index in alive_enemies]
+        for worker_name in worker_names
+    ]
+
+    def get_hp_left(enemy: int, enemy_hp: int) -> int:
+        """Returns the HP left the way the game shows it: the HP of the last damaged enemy, 100 after a kill"""
+        hp_left = 100
+        alive_index = 0
+        for dead in enemies_dead:
+            if dead:
+                hp_left = 100
+                continue
+            if alive_index < enemy:
+                hp_left = 100
+            elif alive_index == enemy and enemy_hp < enemies_hp[enemy]:
+                hp_left = enemy_hp
+            alive_index += 1
+        return hp_left
+
+    killed_initially = len(enemy_names) - alive_count
+    memo: Dict[Tuple[int, int, int], Tuple[int, int, int]] = {}
+
+    def solve(remaining: int, enemy: int, enemy_hp: int) -> Tuple[int, int, int]:
+        """Returns the best outcome from a state as (killed enemies, -hp left, -used workers), higher is better"""
+        used = worker_count - bin(remaining).count('1')
+        if enemy == alive_count:
+            return (killed_initially + alive_count, -100, -used)
+        if not remaining:
+            return (killed_initially + enemy, -get_hp_left(enemy, enemy_hp), -used)
+        state = (remaining, enemy, enemy_hp)
+        outcome = memo.get(state, None)
+        if outcome is not None: return outcome
+        upper_bound = (killed_initially + alive_count, -100, -(used + 1))
+        outcome = None
+        for worker in range(worker_count):
+            if not remaining & (1 << worker): continue
+            child_outcome = solve(remaining & ~(1 << worker), *attack(worker, enemy, enemy_hp))
+            if outcome is None or child_outcome > outcome:
+                outcome = child_outcome
+                if outcome == upper_bound: break
+        memo[state] = outcome
+        return outcome
+
+    def attack(worker: int, enemy: int, enemy_hp: int) -> Tuple[int, int]:
+        """Returns the current enemy and its HP after an attack"""
+        enemy_hp -= damage[worker][enemy]
+        if enemy_hp > 0: return (enemy, enemy_hp)
+        enemy += 1
+        return (enemy, enemies_hp[enemy] if enemy < alive_count else 0)
+
+    def get_solution(remaining: int, enemy: int, enemy_hp: int) -> Tuple[int, int, Tuple[str, ...]]:
+        """Returns the solution of a state. If several orders are equally good, this picks the order with the
+        highest worker indexes first, which is the order the reversed permutations would have found first.
+        """
+        best_outcome = solve(remaining, enemy, enemy_hp)
+        solution = []
+        while remaining and enemy < alive_count:
+            for worker in reversed(range(worker_count)):
+                if not remaining & (1 << worker): continue
+                if solve(remaining & ~(1 << worker), *attack(worker, enemy, enemy_hp)) == best_outcome: break
+            remaining &= ~(1 << worker)
+            enemy, enemy_hp = attack(worker, enemy, enemy_hp)
+            solution.append(worker_names[worker])
+        killed_enemies, hp_left, _ = best_outcome
+        return (killed_enemies, -hp_left, tuple(solution))
+
+    all_workers = (1 << worker_count) - 1
+    raid_solution = get_solution(all_workers, 0, enemies_hp[0] if alive_count else 0)
+    sub_solutions = []
+    if collect_sub_solutions:
+        enemies = list(enemies_power.values())
+        for remaining, enemy, enemy_hp in list(memo.keys()):
+            if remaining == all_workers or enemy == 0 or enemy_hp != enemies_hp[enemy]: continue
+            sub_workers = tuple(
+                (worker_names[worker], workers_power[worker_names[worker]])
+                for worker in range(worker_count) if remaining & (1 << worker)
+            )
+            sub_enemies = tuple(
+                (0.0, 0) if alive_index < enemy else enemies[index]
+                for alive_index, index in enumerate(alive_enemies)
+            )
+            if killed_initially:
+                sub_enemies = list(sub_enemies)
+                for index, dead in enumerate(enemies_dead):
+                    if dead: sub_enemies.insert(index, enemies[index])
+                sub_enemies = tuple(sub_enemies)
+            sub_solutions.append(((sub_workers, sub_enemies), get_solution(remaining, enemy, enemy_hp)))
+    return (raid_solution, sub_solutions)
+
+
+def solve_raid(workers_power: Dict[str, float],
+               enemies_power: Dict[str, Tuple[float, int]]) -> Tuple[int, int, Dict[str, float]]:
+    """Calculates the best order of workers for a raid.
+
+    Workers attack the first enemy that is still alive and deal round(85 * worker power / enemy power) HP. The best
+    order kills the most enemies, then leaves the next enemy with the least HP, then uses the fewest workers. If
+    several orders are equally good, the order that comes first in the reversed permutations of workers_power is
+    returned, same as in the old brute force solver.
+
+    Arguments
+    ---------
+    workers_power: Dict[worker_name: worker_power]
+    enemies_power: Dict[enemy_name: (enemy_power, enemy_hp)]
+
+    Returns
+    -------
+    Tuple with the amount of killed enemies (int), the HP left of the next enemy (int, 100 if it wasn't attacked)
+    and the used workers in attack order (Dict[worker_name: worker_power]).
+    """
+    (killed_enemies, hp_left, solution), _ = _solve_raid(workers_power, enemies_power)
+    return (killed_enemies, hp_left, {worker_name: workers_power[worker_name] for worker_name in solution})
+
+
+def solve_raid_with_sub_solutions(workers_power: Dict[str, float], enemies_power: Dict[str, Tuple[float, int]]
+                                  ) -> Tuple[Tuple[int, int, Tuple[str, ...]], List[Tuple]]:
+    """Solves a raid and returns the solution and its sub solutions for add_solutions. Only takes and returns plain
+    data, so it can run in the CPU pool (see resources.cpu).
+    """
+    return _solve_raid(workers_power, enemies_power, collect_sub_solutions=True)
+
+
+def get_cached_solution(fingerprint: Tuple) -> Optional[Tuple[int, int, Tuple[str, ...]]]:
+    """Returns a solution from the solution cache (killed enemies, hp left, worker names in attack order) or None if
+    the raid wasn't solved yet. Counts a miss in that case.
+    """
+    raid_solution = _SOLUTION_CACHE.get(fingerprint, None)
+    if raid_solution is not None:
+        _solution_cache_stats['hits'] += 1
+        _SOLUTION_CACHE.move_to_end(fingerprint)
+        return raid_solution
+    raid_solution = _SUB_SOLUTION_CACHE.pop(fingerprint, None)
+    if raid_solution is not None:
+        _solution_cache_stats['sub_solution_hits'] += 1
+        _solution_cache_bytes['sub_solutions'] -= _get_entry_size(fingerprint, raid_solution)
+        _add_solution(_SOLUTION_CACHE, 'solutions', SOLUTION_CACHE_SIZE, fingerprint, raid_solution)
+        return raid_solution
+    _solution_cache_stats['misses'] += 1
+    return None
+
+
+def add_solutions(fingerprint: Tuple, raid_solution: Tuple[int, int, Tuple[str, ...]],
+                  sub_solutions: List[Tuple]) -> None:
+    """Adds a solution and its sub solutions (see solve_raid_with_sub_solutions) to the solution cache"""
+    for sub_fingerprint, sub_solution in sub_solutions:
+        if sub_fingerprint in _SOLUTION_CACHE or sub_fingerprint in _SUB_SOLUTION_CACHE: continue
+        _add_solution(_SUB_SOLUTION_CACHE, 'sub_solutions', SUB_SOLUTION_CACHE_SIZE, sub_fingerprint, sub_solution)
+    _add_solution(_SOLUTION_CACHE, 'solutions', SOLUTION_CACHE_SIZE, fingerprint, raid_solution)
+
+
+def solve_raid_cached(workers_power: Dict[str, float],
+                      enemies_power: Dict[str, Tuple[float, int]]) -> Tuple[int, int, Dict[str, float]]:
+    """Same as solve_raid, but looks the raid up in the solution cache first. Solving a raid also caches the
+    solutions of the raids that follow if the player kills an enemy with a worker that wasn't recommended, so later
+    edits of the same raid are usually cache hits as well.
+    """
+    fingerprint = get_raid_fingerprint(workers_power, enemies_power)
+    raid_solution = get_cached_solution(fingerprint)
+    if raid_solution is None:
+        raid_solution, sub_solutions = solve_raid_with_sub_solutions(workers_power, enemies_power)
+        add_solutions(fingerprint, raid_solution, sub_solutions)
+    killed_enemies, hp_left, solution = raid_solution
+    return (killed_enemies, hp_left, {worker_name: workers_power[worker_name] for worker_name in solution})
+
+
+def _get_entry_size(fingerprint: Tuple, raid_solution: Tuple) -> int:
+    """Returns the approximate memory use of a solution cache entry in bytes"""
+    workers, enemies = fingerprint
+    size = sys.getsizeof(fingerprint) + sys.getsizeof(workers) + sys.getsizeof(enemies) + sys.getsizeof(raid_solution)
+    size += sum(sys.getsizeof(worker) for worker in workers) + sum(sys.getsizeof(enemy) for enemy in enemies)
+    return size + sys.getsizeof(raid_solution[2])
+
+
+def _add_solution(cache: OrderedDict, cache_name: str, max_size: int, fingerprint: Tuple, raid_solution: Tuple) -> None:
+    """Adds a solution to a solution cache and removes the least recently used ones if the cache is full"""
+    cache[fingerprint] = raid_solution
+    _solution_cache_bytes[cache_name] += _get_entry_size(fingerprint, raid_solution)
+    while len(cache) > max_size:
+        old_fingerprint, old_solution = cache.popitem(last=False)
+        _solution_cache_bytes[cache_name] -= _get_entry_size(old_fingerprint, old_solution)
+        _solution_cache_stats['evicted'] += 1
+
+
+def get_solution_cache_stats() -> Dict[str, int]:
+    """Returns the size and approximate memory use of the raid solution caches and their hits, misses and evictions"""
+    return {
+        'solutions': len(_SOLUTION_CACHE),
+        'sub_solutions': len(_SUB_SOLUTION_CACHE),
+        'bytes': _solution_cache_bytes['solutions'] + _solution_cache_bytes['sub_solutions'],
+        **_solution_cache_stats,
+    }
+
+
+class TeamraidPlan():
+    """The workers of all users of a teamraid, scored once when the teamraid starts and reused for all its edits.
+
+    Damage only goes up with power, so the workers are sorted by power once. For every enemy, a sorted two pointer
+    search finds the least damage a pair or triple can kill it with, then the first combination (in the original
+    combination order) with exactly that damage is looked up by value. This gives the same recommendation as trying
+    every combination.
+    """
+    def __init__(self, workers_power: Dict[str, Dict[str, float]]) -> None:
+        """
+        Arguments
+        ---------
+        workers_power: Dict[user_name: Dict[worker_type: worker_power]]
+        """
+        self.workers_still_alive = {
+            user_name: dict(worker_data) for user_name, worker_data in workers_power.items()
+        }
+        self._workers: Optional[List[Tuple[str, str, float]]] = None
+        self._power_order: Optional[List[int]] = None
+
+    def remove_worker(self, user_name: str, worker_type: str) -> bool:
+        """Removes a worker that already attacked. Returns False if the worker was already removed."""
+        try:
+            del self.workers_still_alive[user_name][worker_type]
+        except KeyError:
+            return False
+        if not self.workers_still_alive[user_name]: del self.workers_still_alive[user_name]
+        self._workers = self._power_order = None
+        return True
+
+    def _get_workers(self) -> Tuple[List[Tuple[str, str, float]], List[int]]:
+        """Returns the workers still alive as (user_name, worker_type, worker_power) and their indexes sorted by power"""
+        if self._workers is None:
+            self._workers = [
+                (user_name, worker_type, worker_power)
+                for user_name, worker_data in self.workers_still_alive.items()
+                for worker_type, worker_power in worker_data.items()
+            ]
+            self._power_order = sorted(range(len(self._workers)), key=lambda index: self._workers[index][2])
+        return (self._workers, self._power_order)
+
+    def recommend_worker(self, next_enemy_power_hp: Tuple[float, int]) -> Dict[str, Dict[str, float]]:
+        """Returns the worker that should attack the next enemy. See recommend_teamraid_worker."""
+        next_enemy_power, next_enemy_hp = next_enemy_power_hp
+        if len(self.workers_still_alive) == 1:
+            user_name, worker_data = next(iter(self.workers_still_alive.items()))
+            if len(worker_data) == 1: return {user_name: dict(worker_data)}
+        workers, power_order = self._get_workers()
+        damages = [round(100 * worker_power / next_enemy_power) for _, _, worker_power in workers]
+        # The weakest worker that kills the enemy alone, the first one if several have the same power
+        for index in power_order:
+            if next_enemy_hp - damages[index] <= 0:
+                user_name, worker_type, worker_power = workers[index]
+                return {user_name: {worker_type: worker_power}}
+        sorted_damages = [damages[index] for index in power_order]
+        best_combination = _find_best_pair(damages, sorted_damages, next_enemy_hp)
+        if best_combination is None:
+            best_combination = _find_best_triple(damages, sorted_damages, next_enemy_hp)
+        if best_combination is None: return {}
+        best_worker_powers = [workers[index][2] for index in best_combination]
+        recommended_worker = {}
+        for user_name, worker_type, worker_power in workers:
+            if worker_power in best_worker_powers: recommended_worker[user_name] = {worker_type: worker_power}
+        return recommended_worker
+
+
+def _get_damage_indexes(damages: List[int]) -> Dict[int, List[int]]:
+    """Returns the indexes of all workers per damage, sorted"""
+    damage_indexes = {}
+    for index, damage in enumerate(damages):
+        damage_indexes.setdefault(damage, []).append(index)
+    return damage_indexes
+
+
+def _find_best_pair(damages: List[int], sorted_damages: List[int], enemy_hp: int) -> Optional[Tuple[int, int]]:
+    """Returns the indexes of the first pair of workers that does the least damage that still kills the enemy.
+    Returns None if no pair kills the enemy.
+    """
+    best_damage = None
+    low, high = 0, len(sorted_damages) - 1
+    while low < high:
+        summed_damage = sorted_damages[low] + sorted_damages[high]
+        if summed_damage >= enemy_hp:
+            if best_damage is None or summed_damage < best_damage: best_damage = summed_damage
+            high -= 1
+        else:
+            low += 1
+    if best_damage is None: return None
+    damage_indexes = _get_damage_indexes(damages)
+    for first_index, first_damage in enumerate(damages):
+        indexes = damage_indexes.get(best_damage - first_damage, None)
+        if indexes is not None and indexes[-1] > first_index:
+            return (first_index, indexes[bisect_right(indexes, first_index)])
+    return None
+
+
+def _find_best_triple(damages: List[int], sorted_damages: List[int],
+                      enemy_hp: int) -> Optional[Tuple[int, int, int]]:
+    """Returns the indexes of the first three workers that do the least damage that still kills the enemy.
+    Returns None if no three workers kill the enemy.
+    """
+    best_damage = None
+    worker_count = len(sorted_damages)
+    for first in range(worker_count - 2):
+        # Every later triple does at least this much damage
+        if best_damage is not None and sorted_damages[first] * 3 >= best_damage: break
+        low, high = first + 1, worker_count - 1
+        while low < high:
+            summed_damage = sorted_damages[first] + sorted_damages[low] + sorted_damages[high]
+            if summed_damage >= enemy_hp:
+                if best_damage is None or summed_damage < best_damage: best_damage = summed_damage
+                high -= 1
+            else:
+                low += 1
+        if best_damage == enemy_hp: break
+    if best_damage is None: return None
+    damage_indexes = _get_damage_indexes(damages)
+    for first_index in range(worker_count - 2):
+        for second_index in range(first_index + 1, worker_count - 1):
+            indexes = damage_indexes.get(best_damage - damages[first_index] - damages[second_index], None)
+            if indexes is not None and indexes[-1] > second_index:
+                return (first_index, second_index, indexes[bisect_right(indexes, second_index)])
+    return None
+
+
+def recommend_teamraid_worker(next_enemy_power_hp: Tuple[float, int],
+                              workers_still_alive: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """Returns the worker that should attack the next enemy in a teamraid. This is the weakest worker that kills the
+    enemy alone. If no worker can do that, it's the pair of workers (or if there is none, the three workers) that kill
+    the enemy with the least overkill.
+    Use a TeamraidPlan instead if there is more than one recommendation per teamraid.
+
+    Arguments
+    ---------
+    next_enemy_power_hp: Tuple with the power and the HP of the next enemy
+    workers_still_alive: Dict[user_name: Dict[worker_type: worker_power]]
+
+    Returns
+    -------
+    Dict with the recommended workers (Dict[user_name: Dict[worker_type: worker_power]])
+    """
+    return TeamraidPlan(workers_still_alive).recommend_worker(next_enemy_power_hp)